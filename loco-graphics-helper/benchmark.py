@@ -0,0 +1,334 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+
+import bpy
+
+from .cli import render_operators, _ensure_registered
+
+# End-to-end benchmark of the render pipeline on fixed synthetic scenes, so changes to the renderer can be compared on
+# the same work:
+#
+#   blender -b --factory-startup --python-exit-code 1 --python-expr "import importlib; importlib.import_module('loco-graphics-helper.benchmark').main()" -- --baseline benchmark.json
+#
+# Every scene is built from scratch, initialized and rendered with the render settings of a new scene. The frames per
+# second and the time spent in every stage are read from the timings.json of the render. When a baseline file is
+# given the results are compared against it and Blender exits with code 1 when a scene got slower than the threshold
+# allows. Run with --update-baseline to store the results as the new baseline.
+
+baseline_version = 1
+
+# Width of a tile in Blender units at the camera scale set up by Initialize
+tile_size = 16
+
+# Stages that differ less than this many seconds from the baseline are not reported, short stages are mostly noise
+min_stage_difference = 0.1
+
+
+def main(argv=None):
+    if argv == None:
+        argv = []
+        if "--" in sys.argv:
+            argv = sys.argv[sys.argv.index("--") + 1:]
+
+    parser = argparse.ArgumentParser(
+        prog="benchmark", description="Benchmarks the render pipeline on synthetic scenes.")
+    parser.add_argument("--scenes", default=",".join(scenes.keys()),
+                        help="Comma separated scenes to run: {}".format(", ".join(scenes.keys())))
+    parser.add_argument("--runs", type=int, default=1,
+                        help="Number of times each scene is rendered, the fastest run is kept")
+    parser.add_argument("--output", default=None,
+                        help="Folder to render to, a temporary folder is used and removed by default")
+    parser.add_argument("--results", default=None,
+                        help="File to write the results to")
+    parser.add_argument("--baseline", default=None,
+                        help="Baseline file to compare the results against")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="Store the results in the baseline file instead of comparing them")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="Allowed slowdown compared to the baseline, 0.1 allows a scene to be 10%% slower")
+    parser.add_argument("--post-processing", choices=["MAGICK", "NUMPY"], default=None,
+                        help="Post processing backend to render with, the default of a new scene is used when not given")
+    args = parser.parse_args(argv)
+
+    scene_names = [name.strip() for name in args.scenes.split(",") if name.strip() != ""]
+    for name in scene_names:
+        if not name in scenes:
+            parser.error("Unknown scene \"{}\". Expected one of: {}".format(
+                name, ", ".join(scenes.keys())))
+
+    if args.update_baseline and args.baseline == None:
+        parser.error("--update-baseline requires --baseline")
+
+    output_folder = args.output
+    if output_folder == None:
+        output_folder = tempfile.mkdtemp(prefix="loco_benchmark_")
+
+    try:
+        results = run_benchmarks(scene_names, os.path.abspath(
+            output_folder), args.runs, args.post_processing)
+    finally:
+        if args.output == None:
+            shutil.rmtree(output_folder, ignore_errors=True)
+
+    print_results(results)
+
+    if args.results != None:
+        write_results(args.results, results)
+
+    if args.baseline == None:
+        return
+
+    if args.update_baseline or not os.path.exists(args.baseline):
+        if not args.update_baseline:
+            print("No baseline found at {}, storing the results as the baseline".format(args.baseline))
+        write_results(args.baseline, results)
+        return
+
+    with open(args.baseline, "r") as baseline_file:
+        baseline = json.load(baseline_file)
+
+    if baseline.get("version") != baseline_version:
+        print("The baseline {} was made by a different version of the benchmark, run with --update-baseline".format(
+            args.baseline))
+        sys.exit(1)
+
+    # Comparing the backends is done by storing a baseline with one and running the other against it
+    if baseline.get("post_processing") != results["post_processing"]:
+        print("Comparing the {} post processing against the {} baseline".format(
+            results["post_processing"] or "default", baseline.get("post_processing") or "default"))
+
+    regressions = compare_results(results, baseline, args.threshold)
+    if len(regressions) > 0:
+        print("{} regressions compared to {}:".format(
+            len(regressions), args.baseline))
+        for regression in regressions:
+            print("  " + regression)
+        sys.exit(1)
+
+    print("No regressions compared to {}".format(args.baseline))
+
+
+# Renders every scene the given number of times and returns the results of the fastest run of each scene
+def run_benchmarks(scene_names, output_folder, runs, post_processing=None):
+    results = OrderedDict()
+    results["version"] = baseline_version
+    results["blender"] = bpy.app.version_string
+    results["post_processing"] = post_processing
+    results["scenes"] = OrderedDict()
+
+    for name in scene_names:
+        best = None
+        for run in range(runs):
+            print("Benchmarking {} (run {} of {})".format(name, run + 1, runs))
+            result = run_scene(name, os.path.join(
+                output_folder, name), post_processing)
+            if best == None or result["fps"] > best["fps"]:
+                best = result
+        results["scenes"][name] = best
+
+    return results
+
+
+# Builds the scene, renders it and returns its measurements
+def run_scene(name, output_folder, post_processing=None):
+    render_mode, build = scenes[name]
+
+    # Every run starts from the same state, sprites of a previous run would be picked up by incremental rendering
+    if os.path.exists(output_folder):
+        shutil.rmtree(output_folder)
+
+    _reset_scene()
+
+    scene = bpy.context.scene
+    bpy.ops.render.loco_init()
+
+    general_properties = scene.loco_graphics_helper_general_properties
+    general_properties.render_mode = render_mode
+    general_properties.output_directory = output_folder
+    if post_processing != None:
+        general_properties.post_processing_backend = post_processing
+
+    build(scene)
+
+    operator = getattr(bpy.ops.render, render_operators[render_mode])
+
+    general_properties.rendering = False
+    start = time.perf_counter()
+    result = operator()
+    wall = time.perf_counter() - start
+
+    if not "FINISHED" in result or general_properties.rendering:
+        general_properties.rendering = False
+        raise Exception("The {} benchmark did not complete.".format(name))
+
+    with open(os.path.join(output_folder, "timings.json"), "r") as timings_file:
+        summary = json.load(timings_file)["summary"]
+
+    stages = OrderedDict()
+    for group in ["frame_stages", "task_stages"]:
+        for stage, totals in summary[group].items():
+            stages[stage] = totals["wall"]
+
+    measurement = OrderedDict()
+    measurement["frames"] = summary["frames"]
+    measurement["wall"] = wall
+    measurement["fps"] = summary["frames"] / wall if wall > 0 else 0
+    measurement["subprocesses"] = summary["subprocesses"]
+    measurement["stages"] = stages
+    return measurement
+
+
+# Compares the results with the baseline and returns a description of every regression
+def compare_results(results, baseline, threshold):
+    regressions = []
+
+    for name, result in results["scenes"].items():
+        if not name in baseline["scenes"]:
+            print("{} is not in the baseline".format(name))
+            continue
+
+        expected = baseline["scenes"][name]
+
+        # A different number of frames means the scene changed, the timings can not be compared
+        if result["frames"] != expected["frames"]:
+            regressions.append("{}: rendered {} frames instead of {}, the baseline has to be updated".format(
+                name, result["frames"], expected["frames"]))
+            continue
+
+        if result["fps"] < expected["fps"] * (1 - threshold):
+            regressions.append("{}: {:.2f} frames/s instead of {:.2f}".format(
+                name, result["fps"], expected["fps"]))
+
+        for stage, wall in result["stages"].items():
+            expected_wall = expected["stages"].get(stage)
+            if expected_wall == None or wall - expected_wall < min_stage_difference:
+                continue
+
+            if wall > expected_wall * (1 + threshold):
+                regressions.append("{}: {} took {:.2f}s instead of {:.2f}s".format(
+                    name, stage, wall, expected_wall))
+
+    return regressions
+
+
+def print_results(results):
+    for name, result in results["scenes"].items():
+        print("{}: {} frames in {:.2f}s, {:.2f} frames/s, {} subprocesses".format(
+            name, result["frames"], result["wall"], result["fps"], result["subprocesses"]))
+        for stage, wall in result["stages"].items():
+            print("    {:<32} {:8.2f}s".format(stage, wall))
+
+
+def write_results(path, results):
+    with open(path, "w") as results_file:
+        json.dump(results, results_file, indent=4)
+    print("Wrote the benchmark results to {}".format(path))
+
+
+# Starts from an empty scene with the default settings
+def _reset_scene():
+    bpy.ops.wm.read_factory_settings()
+
+    # Loading the factory settings also disables the add-ons of the user preferences
+    _ensure_registered()
+
+    for object in list(bpy.data.objects):
+        bpy.data.objects.remove(object, do_unlink=True)
+
+
+def _add_box(scene, name, size, location=(0, 0, 0), parent=None):
+    bpy.ops.mesh.primitive_cube_add(location=(0, 0, 0))
+    object = scene.objects.active
+    object.name = name
+    object.scale = (size[0] / 2, size[1] / 2, size[2] / 2)
+    object.location = location
+    object.parent = parent
+    return object
+
+
+def _add_empty(scene, name, location=(0, 0, 0)):
+    object = bpy.data.objects.new(name, None)
+    object.location = location
+    scene.objects.link(object)
+    return object
+
+
+# A single tile object
+def build_tiles_1x1(scene):
+    tiles_properties = scene.loco_graphics_helper_static_properties
+    tiles_properties.object_width = 1
+    tiles_properties.object_length = 1
+
+    _add_box(scene, "Building", (tile_size * 0.75, tile_size * 0.75, tile_size),
+             (0, 0, tile_size / 2))
+
+
+# An oversized object that covers three by three tiles
+def build_tiles_3x3(scene):
+    tiles_properties = scene.loco_graphics_helper_static_properties
+    tiles_properties.object_width = 3
+    tiles_properties.object_length = 3
+
+    _add_box(scene, "Building", (tile_size * 2.75, tile_size * 2.75, tile_size * 1.5),
+             (0, 0, tile_size * 0.75))
+
+
+# A double sided, sloped wall with a doorway
+def build_walls(scene):
+    walls_properties = scene.loco_graphics_helper_walls_properties
+    walls_properties.double_sided = True
+    walls_properties.sloped = True
+    walls_properties.doorway = True
+
+    _add_box(scene, "Wall", (tile_size / 8, tile_size, tile_size / 2),
+             (-tile_size * 7 / 16, 0, tile_size / 4))
+
+
+# A vehicle of two cars, each with a body, a bogie and braking lights, rendered on flat track and gentle and steep slopes
+def build_vehicle(scene):
+    for index in range(2):
+        car = _add_empty(scene, "Car {}".format(index + 1),
+                         (tile_size * (index - 0.5), 0, 0))
+        car.loco_graphics_helper_object_properties.object_type = "CAR"
+
+        body = _add_box(scene, "Body {}".format(index + 1),
+                        (tile_size * 0.9, tile_size * 0.3, tile_size * 0.3), (0, 0, tile_size * 0.25), car)
+        bogie = _add_box(scene, "Bogie {}".format(index + 1),
+                         (tile_size * 0.2, tile_size * 0.25, tile_size * 0.1), (0, 0, tile_size * 0.05), car)
+
+        for object, object_type in [(body, "BODY"), (bogie, "BOGIE")]:
+            object.loco_graphics_helper_object_properties.object_type = object_type
+
+            vehicle_properties = object.loco_graphics_helper_vehicle_properties
+            vehicle_properties.index = index
+            vehicle_properties.sprite_track_flags = (True, True, True)
+            vehicle_properties.braking_lights = object_type == "BODY"
+
+        # The braking lights are rendered from the second scene layer
+        lights = _add_box(scene, "Braking Lights {}".format(index + 1),
+                          (tile_size * 0.05, tile_size * 0.2, tile_size * 0.05), (-tile_size * 0.45, 0, tile_size * 0.3), car)
+        lights.layers = [layer == 1 for layer in range(20)]
+
+
+# The benchmark scenes with their render mode
+scenes = OrderedDict([
+    ("tiles_1x1", ("TILES", build_tiles_1x1)),
+    ("tiles_3x3", ("TILES", build_tiles_3x3)),
+    ("walls", ("WALLS", build_walls)),
+    ("vehicle", ("VEHICLE", build_vehicle))
+])
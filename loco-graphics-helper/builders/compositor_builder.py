@@ -44,11 +44,22 @@ class CompositorBuilder(NodesBuilder):
 
         combine_node = self.create_metadata_image(input_layers_node)
 
+        self.next_process()
+
+        silhouette_threshold_node = self.create_silhouette_threshold(
+            input_layers_node)
+
         # Move to the final output column
         self.exit_branch_point()
 
         self.link(aa_mask, 0, combine_node, 3)
 
+        # Meta image masked by the hard silhouette, saves rendering the frame again without anti-aliasing
+        silhouette_node = self.create_node("CompositorNodeSetAlpha")
+
+        self.link(combine_node, 0, silhouette_node, 0)
+        self.link(silhouette_threshold_node, 0, silhouette_node, 1)
+
         # Main output node
         output_composite_node = self.create_node("CompositorNodeComposite")
 
@@ -61,9 +72,22 @@ class CompositorBuilder(NodesBuilder):
         meta_output_node.format.file_format = "OPEN_EXR"
         meta_output_node.format.color_mode = "RGBA"
         meta_output_node.format.color_depth = "16"
+        # A codec the built-in EXR reader supports, so post processing workers can decode the meta renders
+        meta_output_node.format.exr_codec = "ZIP"
         meta_output_node.file_slots[0].path = "meta_mask"
+        meta_output_node.file_slots.new("silhouette")
+
+        # Depth of the render at full precision, the tile indices of multi-tile objects can be reconstructed from it
+        depth_slot = meta_output_node.file_slots.new("depth")
+        depth_slot.use_node_format = False
+        depth_slot.format.file_format = "OPEN_EXR"
+        depth_slot.format.color_mode = "RGB"
+        depth_slot.format.color_depth = "32"
+        depth_slot.format.exr_codec = "ZIP"
 
         self.link(combine_node, 0, meta_output_node, 0)
+        self.link(silhouette_node, 0, meta_output_node, 1)
+        self.link(input_layers_node, "Z", meta_output_node, 2)
 
         return
 
@@ -106,6 +130,17 @@ class CompositorBuilder(NodesBuilder):
 
         return aa_w_bg_switch, alpha_masking_node
 
+    # Thresholds the anti-aliased alpha to approximate the silhouette of a render without anti-aliasing
+    def create_silhouette_threshold(self, layers_node):
+        threshold_node = self.create_node("CompositorNodeMath")
+        threshold_node.label = "silhouette_threshold"
+        threshold_node.operation = "GREATER_THAN"
+        threshold_node.inputs[1].default_value = 0.5
+
+        self.link(layers_node, 1, threshold_node, 0)
+
+        return threshold_node
+
     def create_metadata_image(self, layers_node):
         map_range_node = self.create_node("CompositorNodeMapRange")
         map_range_node.inputs[1].default_value = 0
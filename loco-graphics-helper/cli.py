@@ -0,0 +1,208 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import json
+import os
+import sys
+import traceback
+
+import bpy
+
+# Headless entry point for rendering without the UI panel, for example on build machines:
+#
+#   blender -b scene.blend --python-exit-code 1 --python-expr "import importlib; importlib.import_module('loco-graphics-helper.cli').main()" -- job.json
+#
+# The job file describes one render, or a list of renders under "jobs". Keys at the top level apply to every job:
+#
+#   {
+#       "blend_file": "vehicles/tram.blend",        (optional, opened before rendering)
+#       "initialize": false,                         (optional, runs Initialize / Repair first)
+#       "render_mode": "VEHICLE",
+#       "output_directory": "output/tram",
+#       "build_gx": true,
+#       "build_parkobj": false,
+#       "properties": {
+#           "general": { "number_of_recolorables": 1 },
+#           "tiles": { "object_width": 2 }
+#       }
+#   }
+#
+# Relative paths are resolved against the folder of the job file. TOML job files are supported when a TOML parser
+# is available. Blender exits with code 1 when any of the jobs failed.
+
+render_operators = {
+    "TILES": "loco_static",
+    "VEHICLE": "loco_vehicle",
+    "WALLS": "loco_walls",
+    "TRACK": "loco_track"
+}
+
+property_groups = {
+    "general": "loco_graphics_helper_general_properties",
+    "tiles": "loco_graphics_helper_static_properties",
+    "walls": "loco_graphics_helper_walls_properties",
+    "track": "loco_graphics_helper_track_properties"
+}
+
+
+def main(argv=None):
+    if argv == None:
+        argv = []
+        if "--" in sys.argv:
+            argv = sys.argv[sys.argv.index("--") + 1:]
+
+    if len(argv) != 1:
+        print("Usage: blender -b [scene.blend] --python-expr \"...\" -- job.json")
+        sys.exit(2)
+
+    job_path = os.path.abspath(argv[0])
+
+    try:
+        jobs = load_jobs(job_path)
+    except Exception:
+        traceback.print_exc()
+        print("Failed to read the job file {}".format(job_path))
+        sys.exit(2)
+
+    _ensure_registered()
+
+    failed_jobs = []
+    for i, job in enumerate(jobs):
+        print("Starting job {} of {}".format(i + 1, len(jobs)))
+        try:
+            run_job(job, os.path.dirname(job_path))
+        except Exception:
+            traceback.print_exc()
+            failed_jobs.append(i + 1)
+
+    if len(failed_jobs) > 0:
+        print("{} of {} jobs failed: {}".format(len(failed_jobs), len(jobs),
+                                                 ", ".join(str(job) for job in failed_jobs)))
+        sys.exit(1)
+
+    print("All {} jobs completed".format(len(jobs)))
+
+
+# Reads the job file and returns the list of jobs, with the shared top level keys applied to each of them
+def load_jobs(path):
+    if path.endswith(".toml"):
+        data = _load_toml(path)
+    else:
+        with open(path, "r") as job_file:
+            data = json.load(job_file)
+
+    if not "jobs" in data:
+        return [data]
+
+    shared = {}
+    for key, value in data.items():
+        if key != "jobs":
+            shared[key] = value
+
+    jobs = []
+    for job in data["jobs"]:
+        merged = dict(shared)
+        merged.update(job)
+
+        # Property overrides are merged per group
+        properties = {}
+        for group, values in shared.get("properties", {}).items():
+            properties[group] = dict(values)
+        for group, values in job.get("properties", {}).items():
+            properties.setdefault(group, {}).update(values)
+        merged["properties"] = properties
+
+        jobs.append(merged)
+    return jobs
+
+
+# Runs a single job, raises an exception when the render fails
+def run_job(job, base_folder):
+    if "blend_file" in job:
+        bpy.ops.wm.open_mainfile(filepath=_resolve_path(
+            job["blend_file"], base_folder))
+
+    scene = bpy.context.scene
+
+    if job.get("initialize", False):
+        bpy.ops.render.loco_init()
+
+    if not "Rig" in scene.objects:
+        raise Exception(
+            "The scene has not been initialized, set \"initialize\" to create the render setup.")
+
+    general_properties = scene.loco_graphics_helper_general_properties
+
+    if "render_mode" in job:
+        general_properties.render_mode = job["render_mode"]
+
+    if "output_directory" in job:
+        general_properties.output_directory = _resolve_path(
+            job["output_directory"], base_folder)
+
+    for key in ["build_gx", "build_parkobj"]:
+        if key in job:
+            setattr(general_properties, key, job[key])
+
+    for group, values in job.get("properties", {}).items():
+        if not group in property_groups:
+            raise Exception("Unknown property group \"{}\". Expected one of: {}".format(
+                group, ", ".join(property_groups.keys())))
+
+        properties = getattr(scene, property_groups[group])
+        for key, value in values.items():
+            if not key in properties.bl_rna.properties:
+                raise Exception(
+                    "Unknown {} property \"{}\".".format(group, key))
+            setattr(properties, key, value)
+
+    render_mode = general_properties.render_mode
+    operator = getattr(bpy.ops.render, render_operators[render_mode])
+
+    general_properties.rendering = False
+    result = operator()
+
+    # The rendering flag is only reset once the render task has been completed
+    if not "FINISHED" in result or general_properties.rendering:
+        general_properties.rendering = False
+        raise Exception("The {} render did not complete.".format(
+            render_mode.lower()))
+
+
+def _resolve_path(path, base_folder):
+    if path.startswith("//") or os.path.isabs(path):
+        return path
+    return os.path.normpath(os.path.join(base_folder, path))
+
+
+def _load_toml(path):
+    try:
+        import tomllib
+        with open(path, "rb") as job_file:
+            return tomllib.load(job_file)
+    except ImportError:
+        pass
+
+    try:
+        import toml
+    except ImportError:
+        raise Exception(
+            "Reading TOML job files requires Python 3.11 or the toml package, use a JSON job file instead.")
+
+    with open(path, "r") as job_file:
+        return toml.load(job_file)
+
+
+# The add-on may not be enabled in the user preferences of the build machine
+def _ensure_registered():
+    if hasattr(bpy.types.Scene, property_groups["general"]):
+        return
+
+    import addon_utils
+    addon_utils.enable(__package__, default_set=True)
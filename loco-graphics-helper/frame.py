@@ -11,6 +11,8 @@ import bpy
 import math
 import os
 
+from .visibility_manager import VisibilityManager
+
 # Representation of a frame that is to be rendered
 
 
@@ -51,13 +53,32 @@ class Frame:
 
         self.target_object = None
 
-    def get_meta_render_output_path(self, suffix=""):
+        # Sprites produced for this frame by the post processor
+        self.output_info = []
+
+        # Merged meta image as an RGBA uint8 array, handed from the merge masks processor to the post processor
+        self.meta = None
+
+        # Meta renders by path that were decoded on the main thread, because the built-in EXR reader can not read them
+        self.decoded_meta_renders = {}
+
+        # Camera of the main render, set when the tile indices are reconstructed from its depth
+        self.camera_projection = None
+
+        # Part of the frame that is rendered, None renders the full frame
+        self.render_region = None
+
+        # Fingerprint of the inputs of the frame, and whether its sprites were restored from the previous build
+        self.fingerprint = None
+        self.cached = False
+
+    def get_meta_render_output_path(self, suffix="", extension="mpc"):
         file_name = self.get_meta_render_output_file_name(suffix)
         if suffix != "":
             appended_frame_index = str(self.animation_frame_index).zfill(4)
             return os.path.join(self.task.get_temporary_output_folder(), "{}{}.exr".format(file_name, appended_frame_index))
         else:
-            return os.path.join(self.task.get_temporary_output_folder(), "{}.mpc".format(file_name))
+            return os.path.join(self.task.get_temporary_output_folder(), "{}.{}".format(file_name, extension))
 
     def get_meta_render_output_file_name(self, suffix=""):
         if suffix != "":
@@ -68,8 +89,14 @@ class Frame:
     def get_base_render_output_path(self):
         return os.path.join(self.task.get_temporary_output_folder(), "render_{}.png".format(self.frame_index))
 
-    def get_quantized_render_output_path(self):
-        return os.path.join(self.task.get_temporary_output_folder(), "quantized_{}.png".format(self.frame_index))
+    # Gets the path of the merged meta image. It is stored as a PNG when it is read back in-process
+    def get_merged_meta_output_path(self, in_process):
+        if in_process:
+            return self.get_meta_render_output_path(extension="png")
+        return self.get_meta_render_output_path()
+
+    def get_quantized_render_output_path(self, suffix=""):
+        return os.path.join(self.task.get_temporary_output_folder(), "quantized_{}{}.png".format(self.frame_index, suffix))
 
     def get_final_output_paths(self):
         if self.oversized or self.occlusion_layers > 0:
@@ -81,31 +108,27 @@ class Frame:
         else:
             return [os.path.join(self.task.get_output_folder(), "sprites", "sprite_{}.png".format(self.frame_index))]
 
-    def prepare_scene(self):
+    # Sets up the rig and the object visibility for the frame. Pass the visibility manager of the render to only
+    # change the visibility of the objects that differ from the previous frame
+    def prepare_scene(self, visibility_manager=None):
         object = bpy.data.objects['Rig']
         if object is None:
             return
-        if not self.target_object is None:
-            for o in bpy.data.scenes[0].objects:
-                if o == self.target_object:
-                    continue
-                if o.loco_graphics_helper_object_properties.object_type == 'NONE':
-                    continue
-                o.hide_render = True
-                for c in o.children:
-                    c.hide_render = True
-
-            self.target_object.hide_render = False
-            for c in self.target_object.children:
-                c.hide_render = False
 
-            object.location = self.target_object.matrix_world.translation
+        if visibility_manager == None:
+            visibility_manager = VisibilityManager()
+        visibility_manager.prepare(self.target_object, self.layer)
 
-        # This is a little hacky...
-        if self.layer == 'Top Down Shadow':
-            bpy.data.objects['AirplaneShadowLight'].hide_render = False
-        else:
-            bpy.data.objects['AirplaneShadowLight'].hide_render = True
+        self.prepare_rig()
+
+    # Moves the rig to the target object and rotates it to the angles of the frame
+    def prepare_rig(self):
+        object = bpy.data.objects['Rig']
+        if object is None:
+            return
+
+        if not self.target_object is None:
+            object.location = self.target_object.matrix_world.translation
 
         object.rotation_euler = (math.radians(self.bank_angle),
                                  math.radians(self.vertical_angle), math.radians(self.mid_angle))
@@ -0,0 +1,68 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+# Orders the frames of a render task so consecutive frames share as much scene state as possible. Switching the target
+# object toggles the visibility of the scene objects, switching the layer updates the render layers and compositor,
+# and switching the animation frame re-evaluates the animation and drivers of the whole scene. The output indices of
+# the frames are not changed, so the order only affects the order in which the frames are rendered.
+
+
+# Gets the scene state a frame needs, from the most to the least expensive to change
+def get_frame_state(frame):
+    target_name = ""
+    if frame.target_object != None:
+        target_name = frame.target_object.name
+
+    return (target_name, frame.layer, frame.animation_frame_index)
+
+
+def get_schedule_key(frame):
+    return get_frame_state(frame) + (frame.view_angle,)
+
+
+# Counts the changes of target object, layer and animation frame when rendering the frames in the given order
+def count_transitions(frames):
+    transitions = 0
+    previous_state = None
+
+    for frame in frames:
+        state = get_frame_state(frame)
+
+        if previous_state != None:
+            for previous, current in zip(previous_state, state):
+                if previous != current:
+                    transitions += 1
+
+        previous_state = state
+
+    return transitions
+
+
+class FrameScheduler:
+    def __init__(self):
+        self.transitions_before = 0
+        self.transitions_after = 0
+
+    @property
+    def transitions_saved(self):
+        return self.transitions_before - self.transitions_after
+
+    # Returns the frames in render order. The sort is stable, so frames with the same state keep their order
+    def schedule(self, frames):
+        scheduled_frames = sorted(frames, key=get_schedule_key)
+
+        self.transitions_before = count_transitions(frames)
+        self.transitions_after = count_transitions(scheduled_frames)
+
+        # Never make it worse than the order of the task builder
+        if self.transitions_after > self.transitions_before:
+            self.transitions_after = self.transitions_before
+            return list(frames)
+
+        return scheduled_frames
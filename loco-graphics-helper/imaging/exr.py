@@ -0,0 +1,207 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import struct
+import zlib
+
+import numpy as np
+
+# Minimal OpenEXR reader for the meta images written by the compositor, see https://openexr.com/en/latest/OpenEXRFileLayout.html
+# Supports single part scanline images with NONE, RLE, ZIPS and ZIP compression, which covers what Blender's file
+# output node writes by default
+
+exr_magic = b"\x76\x2f\x31\x01"
+
+# Bytes and NumPy type per pixel type (UINT, HALF, FLOAT)
+exr_pixel_types = {
+    0: (4, "<u4"),
+    1: (2, "<f2"),
+    2: (4, "<f4")
+}
+
+# Number of scanlines per chunk for each supported compression
+exr_lines_per_chunk = {
+    0: 1,   # NONE
+    1: 1,   # RLE
+    2: 1,   # ZIPS
+    3: 16   # ZIP
+}
+
+
+class UnsupportedExrException(Exception):
+    pass
+
+
+# Checks whether read_exr can decode the file, without decoding the pixels
+def is_supported_exr(path):
+    with open(path, "rb") as exr_file:
+        data = exr_file.read()
+
+    try:
+        _read_layout(data, path)
+    except UnsupportedExrException:
+        return False
+    return True
+
+
+# Reads an EXR file and returns a float32 RGBA array of shape (height, width, 4), rows from top to bottom.
+# Raises an UnsupportedExrException for files using features that are not supported
+def read_exr(path):
+    with open(path, "rb") as exr_file:
+        data = exr_file.read()
+
+    compression, y_min, width, height, channels, position = _read_layout(
+        data, path)
+
+    lines_per_chunk = exr_lines_per_chunk[compression]
+    chunk_count = (height + lines_per_chunk - 1) // lines_per_chunk
+
+    offsets = struct.unpack("<{}Q".format(chunk_count),
+                            data[position:position + chunk_count * 8])
+
+    bytes_per_line = sum(exr_pixel_types[pixel_type][0]
+                         for _, pixel_type, _, _ in channels) * width
+
+    planes = {}
+    for name, pixel_type, _, _ in channels:
+        planes[name] = np.empty((height, width), np.float32)
+
+    for offset in offsets:
+        y, size = struct.unpack("<ii", data[offset:offset + 8])
+        first_line = y - y_min
+        lines = min(lines_per_chunk, height - first_line)
+
+        expected_size = bytes_per_line * lines
+        chunk = data[offset + 8:offset + 8 + size]
+
+        # Chunks that did not get smaller by compressing them are stored as is
+        if size < expected_size:
+            if compression == 1:
+                chunk = _reconstruct(_decode_rle(chunk, expected_size))
+            elif compression in (2, 3):
+                chunk = _reconstruct(np.frombuffer(zlib.decompress(chunk), np.uint8))
+
+        chunk = np.frombuffer(chunk, np.uint8)[:expected_size].reshape(
+            lines, bytes_per_line)
+
+        # Within a scanline the channels are stored one after another, in alphabetical order
+        column = 0
+        for name, pixel_type, _, _ in channels:
+            size, dtype = exr_pixel_types[pixel_type]
+            values = chunk[:, column:column + size * width].copy().view(dtype)
+            planes[name][first_line:first_line + lines] = values
+            column += size * width
+
+    rgba = np.zeros((height, width, 4), np.float32)
+    for index, name in enumerate(["R", "G", "B", "A"]):
+        if name in planes:
+            rgba[:, :, index] = planes[name]
+        elif name == "A":
+            rgba[:, :, index] = 1
+
+    return rgba
+
+
+# Reads the header and returns the compression, the first line, the size, the channels and the position of the offset
+# table. Raises an UnsupportedExrException for files using features that are not supported
+def _read_layout(data, path):
+    if data[:4] != exr_magic:
+        raise Exception("{} is not an EXR file.".format(path))
+
+    version = struct.unpack("<I", data[4:8])[0]
+    if version & 0x1e00 != 0:
+        raise UnsupportedExrException(
+            "Tiled, deep and multi-part EXR files are not supported ({}).".format(path))
+
+    header, position = _read_header(data, 8)
+
+    compression = header["compression"][0]
+    if not compression in exr_lines_per_chunk:
+        raise UnsupportedExrException(
+            "EXR compression {} is not supported ({}).".format(compression, path))
+
+    x_min, y_min, x_max, y_max = struct.unpack("<iiii", header["dataWindow"])
+    width = x_max - x_min + 1
+    height = y_max - y_min + 1
+
+    channels = _read_channels(header["channels"])
+    for name, pixel_type, x_sampling, y_sampling in channels:
+        if x_sampling != 1 or y_sampling != 1:
+            raise UnsupportedExrException(
+                "Subsampled EXR channels are not supported ({}).".format(path))
+
+    return compression, y_min, width, height, channels, position
+
+
+def _read_header(data, position):
+    header = {}
+    while data[position] != 0:
+        name_end = data.index(b"\0", position)
+        type_end = data.index(b"\0", name_end + 1)
+        name = data[position:name_end].decode("utf-8")
+        size = struct.unpack("<i", data[type_end + 1:type_end + 5])[0]
+
+        value_start = type_end + 5
+        header[name] = data[value_start:value_start + size]
+        position = value_start + size
+
+    return header, position + 1
+
+
+def _read_channels(value):
+    channels = []
+    position = 0
+    while value[position] != 0:
+        name_end = value.index(b"\0", position)
+        name = value[position:name_end].decode("utf-8")
+        pixel_type, _, x_sampling, y_sampling = struct.unpack(
+            "<iB3xii", value[name_end + 1:name_end + 17])
+
+        if not pixel_type in exr_pixel_types:
+            raise UnsupportedExrException(
+                "Unknown EXR pixel type {}.".format(pixel_type))
+
+        channels.append((name, pixel_type, x_sampling, y_sampling))
+        position = name_end + 17
+
+    return channels
+
+
+def _decode_rle(chunk, expected_size):
+    decoded = bytearray()
+    position = 0
+    while position < len(chunk) and len(decoded) < expected_size:
+        count = struct.unpack("b", chunk[position:position + 1])[0]
+        position += 1
+
+        if count < 0:
+            decoded += chunk[position:position - count]
+            position -= count
+        else:
+            decoded += chunk[position:position + 1] * (count + 1)
+            position += 1
+
+    return np.frombuffer(bytes(decoded), np.uint8)
+
+
+# Undoes the byte delta predictor and the splitting of the bytes in two halves that RLE and ZIP compression apply
+def _reconstruct(predicted):
+    if len(predicted) == 0:
+        return b""
+
+    deltas = predicted.astype(np.int64) - 128
+    deltas[0] = predicted[0]
+    values = (np.cumsum(deltas) & 0xff).astype(np.uint8)
+
+    half = (len(values) + 1) // 2
+    interleaved = np.empty(len(values), np.uint8)
+    interleaved[0::2] = values[:half]
+    interleaved[1::2] = values[half:]
+
+    return interleaved.tobytes()
@@ -0,0 +1,52 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import numpy as np
+
+# Offsets of the neighbours that are sampled when dilating, direct neighbours come first so they take precedence
+neighbour_offsets = [(0, -1), (0, 1), (-1, 0), (1, 0),
+                     (-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+# Spreads values from the known pixels into the target pixels, one ring of pixels at a time, so every target pixel
+# takes the value of a nearby known pixel. values is a (height, width, channels) array, known and target are boolean
+# masks. Returns the dilated values and the mask of pixels that have a value
+def dilate_nearest(values, known, target, max_iterations=16):
+    height, width = known.shape
+
+    values = values.copy()
+    known = known.copy()
+
+    for _ in range(max_iterations):
+        missing = target & ~known
+        if not np.any(missing):
+            break
+
+        filled = np.zeros((height, width), bool)
+
+        for dy, dx in neighbour_offsets:
+            # Pixels of which the neighbour at (dy, dx) is known
+            source = np.zeros((height, width), bool)
+            source[max(0, -dy):height - max(0, dy), max(0, -dx):width - max(0, dx)] = \
+                known[max(0, dy):height - max(0, -dy), max(0, dx):width - max(0, -dx)]
+
+            update = missing & source & ~filled
+            if not np.any(update):
+                continue
+
+            rows, columns = np.nonzero(update)
+            values[rows, columns] = values[rows + dy, columns + dx]
+            filled |= update
+
+        if not np.any(filled):
+            break
+
+        known |= filled
+
+    return values, known
@@ -0,0 +1,110 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from ..res.res import res_path
+
+# Precomputed RGB to palette index lookup tables. The RGB cube is divided into cells and every cell stores the index
+# of the palette color closest to the center of the cell, so finding the nearest color is a single gather.
+# Values are rounded to whole color values before they are divided into cells, which are the same cells the dither
+# caches its nearest colors in, see Quantizer.dither.
+# Tables are persisted per palette, keyed by the hash of the palette colors, and memory-mapped when loaded.
+
+lookup_table_cache_path = os.path.join(res_path, "cache", "lookup_tables")
+
+# Number of bits per channel, 6 bits gives a 64x64x64 cube
+lookup_table_bits = 6
+
+# Part of the cache key, changes when tables are built differently so older tables are not loaded
+lookup_table_version = 2
+
+loaded_lookup_tables = {}
+loaded_lookup_tables_lock = threading.Lock()
+
+
+class PaletteLookupTable:
+    def __init__(self, indices, bits):
+        self.indices = indices
+        self.bits = bits
+        self.shift = 8 - bits
+
+    # Returns the cell of each row of RGB values
+    def get_cells(self, values):
+        return (np.clip(values, 0, 255) + 0.5).astype(np.intp) >> self.shift
+
+    # Returns the palette index of the closest color for each row of RGB values
+    def find_nearest(self, values):
+        cells = self.get_cells(values)
+        return self.indices[cells[:, 0], cells[:, 1], cells[:, 2]]
+
+
+# Gets the lookup table for the opaque colors (Nx3) of a palette. The table is loaded from the cache or built and
+# stored when it does not exist yet
+def get_palette_lookup_table(colors, bits=lookup_table_bits):
+    colors = np.ascontiguousarray(colors, np.uint8).reshape(-1, 3)
+
+    key = "{}_{}_v{}".format(hashlib.sha1(
+        colors.tobytes()).hexdigest(), bits, lookup_table_version)
+
+    with loaded_lookup_tables_lock:
+        if not key in loaded_lookup_tables:
+            path = os.path.join(lookup_table_cache_path, key + ".npy")
+
+            if not os.path.exists(path):
+                _save_lookup_table(path, build_lookup_table(colors, bits))
+
+            loaded_lookup_tables[key] = PaletteLookupTable(
+                np.load(path, mmap_mode="r"), bits)
+
+        return loaded_lookup_tables[key]
+
+
+# Builds the table by finding the closest color for the center of every cell
+def build_lookup_table(colors, bits=lookup_table_bits):
+    if len(colors) > 256:
+        raise Exception("Lookup tables support palettes of up to 256 colors, got {}.".format(len(colors)))
+
+    size = 1 << bits
+    cell_size = 256 / size
+
+    # A cell holds the values that round to its whole color values, so its center is half a value below the middle
+    centers = (np.arange(size) + 0.5) * cell_size - 0.5
+    grid = np.stack(np.meshgrid(centers, centers, centers,
+                                indexing="ij"), axis=-1).reshape(-1, 3)
+
+    colors = colors.astype(np.float64)
+    color_lengths = np.einsum("ij,ij->i", colors, colors)
+
+    indices = np.empty(len(grid), np.uint8)
+
+    # Work in chunks to bound the size of the distance matrix
+    chunk_size = 16384
+    for start in range(0, len(grid), chunk_size):
+        chunk = grid[start:start + chunk_size]
+        distances = color_lengths[np.newaxis, :] - 2 * chunk.dot(colors.T)
+        indices[start:start + chunk_size] = np.argmin(distances, axis=1)
+
+    return indices.reshape(size, size, size)
+
+
+def _save_lookup_table(path, indices):
+    folder = os.path.dirname(path)
+    if not os.path.exists(folder):
+        os.makedirs(folder, exist_ok=True)
+
+    # Write to a temporary file first so a partially written table is never loaded
+    temporary_path = "{}.{}.tmp".format(path, os.getpid())
+    with open(temporary_path, "wb") as table_file:
+        np.save(table_file, indices)
+    os.replace(temporary_path, path)
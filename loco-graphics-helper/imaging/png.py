@@ -0,0 +1,248 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import struct
+import zlib
+
+import numpy as np
+
+# Minimal PNG reader and writer so images can be processed in-process without ImageMagick
+
+png_signature = b"\x89PNG\r\n\x1a\n"
+
+channels_per_color_type = {
+    0: 1,  # Grayscale
+    2: 3,  # RGB
+    3: 1,  # Palette
+    4: 2,  # Grayscale with alpha
+    6: 4   # RGBA
+}
+
+
+# Reads a non-interlaced PNG file and returns an RGBA array of shape (height, width, 4).
+# 8-bit images are returned as uint8, 16-bit images as uint16
+def read_png(path):
+    with open(path, "rb") as png_file:
+        data = png_file.read()
+
+    if data[:8] != png_signature:
+        raise Exception("{} is not a PNG file.".format(path))
+
+    width = height = bit_depth = color_type = interlace = 0
+    palette = None
+    transparency = None
+    compressed = []
+
+    position = 8
+    while position < len(data):
+        length, chunk_type = struct.unpack(">I4s", data[position:position + 8])
+        chunk = data[position + 8:position + 8 + length]
+        position += length + 12
+
+        if chunk_type == b"IHDR":
+            width, height, bit_depth, color_type, _, _, interlace = struct.unpack(
+                ">IIBBBBB", chunk)
+        elif chunk_type == b"PLTE":
+            palette = np.frombuffer(chunk, np.uint8).reshape(-1, 3)
+        elif chunk_type == b"tRNS":
+            transparency = chunk
+        elif chunk_type == b"IDAT":
+            compressed.append(chunk)
+        elif chunk_type == b"IEND":
+            break
+
+    if interlace != 0:
+        raise Exception("Interlaced PNG files are not supported ({}).".format(path))
+
+    if color_type not in channels_per_color_type:
+        raise Exception("Unknown PNG color type {} ({}).".format(color_type, path))
+
+    channels = channels_per_color_type[color_type]
+    bits_per_pixel = bit_depth * channels
+    stride = (width * bits_per_pixel + 7) // 8
+    filter_unit = max(1, bits_per_pixel // 8)
+
+    raw = zlib.decompress(b"".join(compressed))
+    scanlines = _unfilter(raw, height, stride, filter_unit)
+
+    if bit_depth == 16:
+        samples = scanlines.view(">u2").astype(np.uint16).reshape(
+            height, width, channels)
+    elif bit_depth == 8:
+        samples = scanlines.reshape(height, width, channels)
+    else:
+        bits = np.unpackbits(scanlines, axis=1).reshape(height, -1, bit_depth)
+        weights = (1 << np.arange(bit_depth - 1, -1, -1)).astype(np.uint8)
+        samples = (bits * weights).sum(axis=2).astype(np.uint8)[:, :width]
+        samples = samples.reshape(height, width, 1)
+        if color_type == 0:
+            samples = (samples * (255 // ((1 << bit_depth) - 1))).astype(np.uint8)
+
+    return _to_rgba(samples, color_type, bit_depth, palette, transparency)
+
+
+# Converts a 16-bit image to 8-bit with rounding, 8-bit images are returned as is
+def to_8_bit(image):
+    if image.dtype == np.uint8:
+        return image
+    return ((image.astype(np.uint32) * 255 + 32767) // 65535).astype(np.uint8)
+
+
+# Writes an RGBA uint8 image as a true color PNG
+def write_png(path, image, compression=6):
+    height, width = image.shape[:2]
+    _write_chunks(path, width, height, 6, image.astype(np.uint8), None, None, compression)
+
+
+# Writes an RGBA uint8 image as an indexed PNG, the equivalent of ImageMagick's PNG8 output.
+# Falls back to a true color PNG when the image contains more than 256 colors
+def write_png8(path, image, compression=6):
+    height, width = image.shape[:2]
+    image = np.ascontiguousarray(image, dtype=np.uint8)
+
+    packed = image.view(np.uint32).reshape(height, width)
+    colors, indices = np.unique(packed, return_inverse=True)
+
+    if len(colors) > 256:
+        write_png(path, image, compression)
+        return
+
+    palette = colors.view(np.uint8).reshape(-1, 4)
+    indices = indices.astype(np.uint8).reshape(height, width, 1)
+
+    transparency = None
+    if np.any(palette[:, 3] != 255):
+        transparency = palette[:, 3].tobytes()
+
+    _write_chunks(path, width, height, 3, indices, palette[:, :3].tobytes(),
+                  transparency, compression)
+
+
+def _write_chunks(path, width, height, color_type, samples, palette, transparency, compression):
+    scanlines = np.zeros((height, samples.shape[1] * samples.shape[2] + 1), np.uint8)
+    scanlines[:, 1:] = samples.reshape(height, -1)
+
+    with open(path, "wb") as png_file:
+        png_file.write(png_signature)
+        _write_chunk(png_file, b"IHDR", struct.pack(
+            ">IIBBBBB", width, height, 8, color_type, 0, 0, 0))
+        if palette is not None:
+            _write_chunk(png_file, b"PLTE", palette)
+        if transparency is not None:
+            _write_chunk(png_file, b"tRNS", transparency)
+        _write_chunk(png_file, b"IDAT", zlib.compress(
+            scanlines.tobytes(), compression))
+        _write_chunk(png_file, b"IEND", b"")
+
+
+def _write_chunk(png_file, chunk_type, data):
+    png_file.write(struct.pack(">I", len(data)))
+    png_file.write(chunk_type)
+    png_file.write(data)
+    png_file.write(struct.pack(">I", zlib.crc32(chunk_type + data) & 0xffffffff))
+
+
+# Reverses the per scanline filters, see https://www.w3.org/TR/png/#9Filters
+def _unfilter(raw, height, stride, unit):
+    filtered = np.frombuffer(raw, np.uint8)[:height * (stride + 1)].reshape(
+        height, stride + 1)
+    result = np.zeros((height, stride), np.uint8)
+    previous = np.zeros(stride, np.uint8)
+
+    for y in range(height):
+        filter_type = filtered[y, 0]
+        line = filtered[y, 1:]
+
+        if filter_type == 0:
+            current = line.copy()
+        elif filter_type == 1:
+            # Sub is a running sum per byte lane, which can be done in one go
+            padded = np.zeros(((stride + unit - 1) // unit) * unit, np.uint8)
+            padded[:stride] = line
+            current = np.cumsum(padded.reshape(-1, unit), axis=0,
+                                dtype=np.uint8).reshape(-1)[:stride]
+        elif filter_type == 2:
+            current = line + previous
+        elif filter_type == 3:
+            current = _unfilter_average(line, previous, unit)
+        elif filter_type == 4:
+            current = _unfilter_paeth(line, previous, unit)
+        else:
+            raise Exception("Unknown PNG filter type {}.".format(filter_type))
+
+        result[y] = current
+        previous = result[y]
+
+    return result
+
+
+def _unfilter_average(line, previous, unit):
+    current = bytearray(line.tobytes())
+    above = previous.tobytes()
+    for x in range(len(current)):
+        left = current[x - unit] if x >= unit else 0
+        current[x] = (current[x] + ((left + above[x]) >> 1)) & 0xff
+    return np.frombuffer(bytes(current), np.uint8)
+
+
+def _unfilter_paeth(line, previous, unit):
+    current = bytearray(line.tobytes())
+    above = previous.tobytes()
+    for x in range(len(current)):
+        if x >= unit:
+            a = current[x - unit]
+            c = above[x - unit]
+        else:
+            a = c = 0
+        b = above[x]
+        p = a + b - c
+        pa = abs(p - a)
+        pb = abs(p - b)
+        pc = abs(p - c)
+        if pa <= pb and pa <= pc:
+            predictor = a
+        elif pb <= pc:
+            predictor = b
+        else:
+            predictor = c
+        current[x] = (current[x] + predictor) & 0xff
+    return np.frombuffer(bytes(current), np.uint8)
+
+
+def _to_rgba(samples, color_type, bit_depth, palette, transparency):
+    height, width = samples.shape[:2]
+    dtype = np.uint16 if bit_depth == 16 else np.uint8
+    opaque = 65535 if bit_depth == 16 else 255
+
+    rgba = np.empty((height, width, 4), dtype)
+
+    if color_type == 3:
+        lookup = np.full((256, 4), 255, np.uint8)
+        lookup[:len(palette), :3] = palette
+        if transparency is not None:
+            alphas = np.frombuffer(transparency, np.uint8)
+            lookup[:len(alphas), 3] = alphas
+        return lookup[samples[:, :, 0]]
+
+    if color_type in (0, 4):
+        rgba[:, :, :3] = samples[:, :, :1]
+    else:
+        rgba[:, :, :3] = samples[:, :, :3]
+
+    if color_type in (4, 6):
+        rgba[:, :, 3] = samples[:, :, -1]
+    else:
+        rgba[:, :, 3] = opaque
+        if transparency is not None:
+            # A single transparent color key
+            key = struct.unpack(">" + "H" * (len(transparency) // 2), transparency)
+            matches = np.all(samples == np.array(key, dtype), axis=2)
+            rgba[matches, 3] = 0
+
+    return rgba
@@ -0,0 +1,277 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import threading
+
+import numpy as np
+
+from .png import read_png, to_8_bit
+from .palette_lookup import get_palette_lookup_table
+
+# Floyd-Steinberg error diffusion weights for the right, bottom left, bottom and bottom right neighbours
+floyd_steinberg_weights = (7 / 16, 3 / 16, 5 / 16, 1 / 16)
+
+# Quantizers by palette and settings, shared by the frames of a render and kept for the lifetime of the process
+loaded_quantizers = {}
+loaded_quantizers_lock = threading.Lock()
+
+# In-process replacement for "-dither FloydSteinberg -remap palette". Works on RGBA uint8 arrays
+
+
+class Quantizer:
+    def __init__(self, colors, diffusion_amount, lookup_table=None):
+        colors = np.asarray(colors, np.uint8).reshape(-1, 4)
+
+        self.colors = colors
+        self.opaque_colors = colors[colors[:, 3] == 255]
+        self.opaque_colors_float = self.opaque_colors[:, :3].astype(np.float64)
+
+        # The squared distance to a color c is |c|^2 - 2 c.v + |v|^2, the last term is the same for every color. Used to
+        # find the nearest color of a single value without building a distance matrix
+        self.color_lengths = np.einsum(
+            "ij,ij->i", self.opaque_colors_float, self.opaque_colors_float)
+        self.color_factors = np.ascontiguousarray(-2 * self.opaque_colors_float.T)
+
+        # The alpha is thresholded at half coverage: pixels below it are mapped straight to the transparent palette
+        # entry, the others are dithered as fully opaque. This is lossy for anti-aliased renders, the fractional alpha
+        # of their edge pixels is dropped
+        transparent_colors = colors[colors[:, 3] == 0]
+        if len(transparent_colors) > 0:
+            self.transparent_color = transparent_colors[0]
+        else:
+            self.transparent_color = np.zeros(4, np.uint8)
+
+        # Same meaning as ImageMagick's dither:diffusion-amount, given in percent
+        self.diffusion = diffusion_amount / 100
+
+        # Optional precomputed lookup table for the opaque colors, trades exactness for speed. The dither uses the
+        # table as its cache of nearest colors, flattened to a list because it is read one pixel at a time
+        self.lookup_table = lookup_table
+        self.cell_bits = 6
+        self.cell_lookup = None
+        if lookup_table != None:
+            self.cell_bits = lookup_table.bits
+            self.cell_lookup = np.asarray(lookup_table.indices).ravel().tolist()
+
+    # Dithers the image to the palette and returns the quantized RGBA image
+    def quantize(self, image):
+        height, width = image.shape[:2]
+
+        opaque = image[:, :, 3] >= 128
+
+        result = np.empty((height, width, 4), np.uint8)
+        result[:] = self.transparent_color
+
+        if len(self.opaque_colors) == 0 or not np.any(opaque):
+            return result
+
+        indices = self.dither(image[:, :, :3].astype(np.float64), opaque)
+
+        result[opaque] = self.opaque_colors[indices[opaque]]
+        return result
+
+    # Dithers only the pixels within the region, error is diffused between region pixels only. Only the bounding box
+    # of the region is processed. Returns the quantized RGBA colors of the region pixels, in the order of image[region]
+    def quantize_region(self, image, region):
+        rows, columns = np.nonzero(region)
+
+        if len(self.opaque_colors) == 0 or len(rows) == 0:
+            result = np.empty((len(rows), 4), np.uint8)
+            result[:] = self.transparent_color
+            return result
+
+        top, bottom = rows.min(), rows.max() + 1
+        left, right = columns.min(), columns.max() + 1
+
+        window = image[top:bottom, left:right]
+        window_region = region[top:bottom, left:right]
+
+        opaque = window_region & (window[:, :, 3] >= 128)
+
+        window_result = np.empty(window.shape, np.uint8)
+        window_result[:] = self.transparent_color
+
+        if np.any(opaque):
+            indices = self.dither(window[:, :, :3].astype(np.float64), opaque)
+            window_result[opaque] = self.opaque_colors[indices[opaque]]
+
+        return window_result[window_region]
+
+    # Returns the palette index of the closest opaque color for each row of values
+    def find_nearest(self, values):
+        if self.lookup_table != None:
+            return self.lookup_table.find_nearest(values)
+
+        distances = values[:, np.newaxis, :] - \
+            self.opaque_colors_float[np.newaxis, :, :]
+        distances = np.einsum("ijk,ijk->ij", distances, distances)
+        return np.argmin(distances, axis=1)
+
+    # Returns the palette index of the closest opaque color for a single value
+    def find_nearest_color(self, red, green, blue):
+        if self.lookup_table != None:
+            return int(self.lookup_table.find_nearest(np.array([[red, green, blue]]))[0])
+
+        return int((self.color_lengths + np.dot((red, green, blue), self.color_factors)).argmin())
+
+    # Floyd-Steinberg error diffusion in the same order as ImageMagick's FloydSteinbergDither. Rows are scanned in
+    # serpentine order, left to right on even rows and right to left on odd rows, and the kernel is mirrored with the
+    # scan direction. The error pushed down from the previous row is added to the whole row at once, only the error
+    # passed on to the next pixel in the row has to be carried in a loop.
+    # Like ImageMagick, the nearest color is cached per cell of the RGB cube with 6 bits per channel, after rounding
+    # the value to whole color values. Without a lookup table the first pixel that falls in a cell decides the color
+    # for the whole cell, with a lookup table the table is the cache. ImageMagick only searches the part of its color
+    # cube around the pixel, so pixels close to the middle between two palette colors can still end up differently
+    def dither(self, pixels, region):
+        height, width = region.shape
+
+        indices = np.zeros((height, width), np.intp)
+
+        # Without diffusion no error is carried between pixels, so the whole region is matched in one go
+        if self.diffusion == 0:
+            indices[region] = self.find_nearest(pixels[region])
+            return indices
+
+        red_colors, green_colors, blue_colors = self.opaque_colors_float.T.tolist()
+
+        right, bottom_left, bottom, bottom_right = [
+            weight * self.diffusion for weight in floyd_steinberg_weights]
+
+        cell_shift = 8 - self.cell_bits
+        red_cell_shift = 2 * self.cell_bits
+        green_cell_shift = self.cell_bits
+
+        cells = self.cell_lookup
+        if cells == None:
+            cells = [-1] * (1 << (3 * self.cell_bits))
+
+        # Error of the previous row, padded with a column on both sides so the kernel never has to check the edges
+        previous = np.zeros((width + 2, 3))
+
+        for y in range(height):
+            columns = np.flatnonzero(region[y])
+
+            if y % 2 == 0:
+                direction = 1
+                row = pixels[y] + bottom_right * previous[2:] + \
+                    bottom * previous[1:-1] + bottom_left * previous[:-2]
+            else:
+                direction = -1
+                columns = columns[::-1]
+                row = pixels[y] + bottom_right * previous[:-2] + \
+                    bottom * previous[1:-1] + bottom_left * previous[2:]
+
+            red_row, green_row, blue_row = row.T.tolist()
+            red_errors = [0.0] * width
+            green_errors = [0.0] * width
+            blue_errors = [0.0] * width
+            row_indices = [0] * width
+
+            # Pixels outside of the region neither take nor pass on error
+            red_error = green_error = blue_error = 0.0
+            carry_column = -2
+
+            for u in columns.tolist():
+                red = red_row[u]
+                green = green_row[u]
+                blue = blue_row[u]
+
+                if u - direction == carry_column:
+                    red += right * red_error
+                    green += right * green_error
+                    blue += right * blue_error
+
+                if red < 0.0:
+                    red = 0.0
+                elif red > 255.0:
+                    red = 255.0
+                if green < 0.0:
+                    green = 0.0
+                elif green > 255.0:
+                    green = 255.0
+                if blue < 0.0:
+                    blue = 0.0
+                elif blue > 255.0:
+                    blue = 255.0
+
+                cell = (int(red + 0.5) >> cell_shift) << red_cell_shift | \
+                    (int(green + 0.5) >> cell_shift) << green_cell_shift | int(blue + 0.5) >> cell_shift
+                index = cells[cell]
+                if index < 0:
+                    index = self.find_nearest_color(red, green, blue)
+                    cells[cell] = index
+
+                row_indices[u] = index
+
+                red_error = red - red_colors[index]
+                green_error = green - green_colors[index]
+                blue_error = blue - blue_colors[index]
+                red_errors[u] = red_error
+                green_errors[u] = green_error
+                blue_errors[u] = blue_error
+                carry_column = u
+
+            indices[y] = row_indices
+            previous[1:-1] = np.array([red_errors, green_errors, blue_errors]).T
+
+        return indices
+
+
+# Compares two RGBA images and returns the number of pixels that differ. Fully transparent pixels are considered
+# equal regardless of their color
+def count_differing_pixels(image_a, image_b):
+    if image_a.shape != image_b.shape:
+        return image_a.shape[0] * image_a.shape[1]
+
+    transparent = (image_a[:, :, 3] == 0) & (image_b[:, :, 3] == 0)
+    differing = np.any(image_a != image_b, axis=2) & ~transparent
+    return int(np.count_nonzero(differing))
+
+
+# Gets the quantizer for the RGBA colors of a palette. The lookup table is built the first time a palette is used
+def get_quantizer(colors, diffusion_amount, lookup_tables):
+    colors = np.asarray(colors, np.uint8).reshape(-1, 4)
+
+    key = (colors.tobytes(), diffusion_amount, lookup_tables)
+
+    with loaded_quantizers_lock:
+        if not key in loaded_quantizers:
+            lookup_table = None
+            if lookup_tables:
+                lookup_table = get_palette_lookup_table(
+                    colors[colors[:, 3] == 255][:, :3])
+
+            loaded_quantizers[key] = Quantizer(
+                colors, diffusion_amount, lookup_table)
+
+        return loaded_quantizers[key]
+
+
+# Dithers the render of a frame to its palette and forces the recolorables to a palette that only contains the
+# recolorable color. Only the pixels of a recolorable are dithered to its palette, so the rest of the frame does not
+# bleed error into them. The material index is read from the red channel of the merged meta image.
+# Only needs NumPy and plain arguments, so it can run in a post processing worker process
+def quantize_render(render_path, meta, colors, recolor_colors, diffusion_amount, lookup_tables, maintain_aliased_silhouette):
+    render = to_8_bit(read_png(render_path))
+
+    material_indices = meta[:, :, 0]
+    meta_opaque = meta[:, :, 3] == 255
+
+    quantized = get_quantizer(
+        colors, diffusion_amount, lookup_tables).quantize(render)
+
+    for i, palette_colors in enumerate(recolor_colors):
+        mask = (material_indices == i + 1) & meta_opaque
+        quantized[mask] = get_quantizer(
+            palette_colors, diffusion_amount, lookup_tables).quantize_region(render, mask)
+
+    if maintain_aliased_silhouette:
+        quantized[:, :, 3] = meta[:, :, 3]
+
+    return quantized
@@ -0,0 +1,88 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import numpy as np
+
+# Reconstructs the tile index meta image from the depth pass of the main render. Replicates the WorldPosition material
+# (mapping with a translation of 8 and a scale of 0.25, clamped to 0..16) followed by the tile index calculation of
+# the compositor (create_calculate_axis and create_metadata_image)
+
+world_position_translation = 8
+world_position_scale = 0.25
+world_position_max = 16
+
+
+# Orthographic camera of a render. Captured on the main thread so the reconstruction can run on any thread
+class CameraProjection:
+    def __init__(self, matrix_world, ortho_scale, shift_x, shift_y, clip_end):
+        self.matrix_world = np.array(matrix_world, np.float64).reshape(4, 4)
+        self.ortho_scale = ortho_scale
+        self.shift_x = shift_x
+        self.shift_y = shift_y
+        self.clip_end = clip_end
+
+    # Returns the world position of every pixel given the depth along the view direction, and the mask of pixels
+    # that hit geometry
+    def get_world_positions(self, depth):
+        height, width = depth.shape
+
+        # The camera fits the view horizontally, shifts are relative to the fitted size
+        view_width = self.ortho_scale
+        view_height = self.ortho_scale * height / width
+
+        x = (np.arange(width) + 0.5) / width * view_width - view_width / \
+            2 + self.shift_x * self.ortho_scale
+        y = view_height / 2 - (np.arange(height) + 0.5) / height * view_height + \
+            self.shift_y * self.ortho_scale
+
+        camera_positions = np.empty((height, width, 4))
+        camera_positions[:, :, 0] = x[np.newaxis, :]
+        camera_positions[:, :, 1] = y[:, np.newaxis]
+        camera_positions[:, :, 2] = -depth
+        camera_positions[:, :, 3] = 1
+
+        world_positions = camera_positions.dot(self.matrix_world.T)[:, :, :3]
+
+        return world_positions, depth < self.clip_end
+
+
+# Gets the tile index along one axis of a mapped world position, see CompositorBuilder.create_calculate_axis
+def get_axis_tile_index(mapped_position, size):
+    low = world_position_translation - size * 0.5
+    high = world_position_translation + size * 0.5
+
+    to_low = -0.49999
+    to_high = size - 0.50001
+
+    mapped = to_low + (mapped_position - low) / (high - low) * (to_high - to_low)
+
+    # The compositor's round operation rounds halves up
+    return np.floor(np.clip(mapped, to_low, to_high) + 0.5)
+
+
+# Builds the RGBA tile index meta image of a multi-tile object from a depth pass. The tile index is stored in the
+# green channel in the same way as the rendered tile index image. Only pixels within the mask are set
+def get_tile_index_image(depth, projection, width, length, mask):
+    world_positions, hits = projection.get_world_positions(depth)
+
+    mapped = np.clip(world_positions[:, :, :2] * world_position_scale + world_position_translation,
+                     0, world_position_max)
+
+    # The x axis of the tile grid follows the world y axis
+    rounded_x = get_axis_tile_index(mapped[:, :, 1], width)
+    rounded_y = get_axis_tile_index(mapped[:, :, 0], length)
+
+    tile_indices = rounded_x + width * rounded_y
+
+    visible = hits & mask
+
+    image = np.zeros(depth.shape + (4,), np.float32)
+    image[:, :, 1] = np.where(visible, tile_indices / 255, 0)
+    image[:, :, 3] = visible
+    return image
@@ -0,0 +1,81 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import numpy as np
+
+# In-process replacement for "-trim" followed by writing the page offsets with "info:"
+
+
+# Returns the bounding box (left, top, right, bottom) of all pixels with a non-zero alpha, right and bottom are
+# exclusive. Returns None when the image has no visible pixels
+def get_alpha_bounds(image):
+    visible = image[:, :, 3] != 0
+
+    rows = np.flatnonzero(visible.any(axis=1))
+    if len(rows) == 0:
+        return None
+
+    columns = np.flatnonzero(visible.any(axis=0))
+    return columns[0], rows[0], columns[-1] + 1, rows[-1] + 1
+
+
+# Trims the image down to its visible pixels. Returns the cropped image, which is a view on the given image, and the
+# offset of the crop relative to the center of the image, the same value as "page.x-page.width/2"
+def trim(image):
+    height, width = image.shape[:2]
+
+    bounds = get_alpha_bounds(image)
+    if bounds == None:
+        return _get_empty_trim(image, width, height)
+
+    left, top, right, bottom = bounds
+    return image[top:bottom, left:right], left - width / 2, top - height / 2
+
+
+# Splits the image into one trimmed sprite per id in a single pass over the pixels. ids is a (height, width) array
+# that assigns every pixel to a sprite, for example a channel of the meta image. Returns a list with a
+# (cropped image, offset x, offset y) tuple for every value in id_values
+def split_by_id(image, ids, id_values):
+    height, width = image.shape[:2]
+
+    rows, columns = np.nonzero(image[:, :, 3] != 0)
+    pixel_ids = ids[rows, columns].astype(np.intp)
+
+    # Bounding box of every id, ids without visible pixels keep an empty box
+    size = max(int(np.max(ids)), max(id_values)) + 1
+    lefts = np.full(size, width, np.intp)
+    tops = np.full(size, height, np.intp)
+    rights = np.zeros(size, np.intp)
+    bottoms = np.zeros(size, np.intp)
+
+    np.minimum.at(lefts, pixel_ids, columns)
+    np.minimum.at(tops, pixel_ids, rows)
+    np.maximum.at(rights, pixel_ids, columns + 1)
+    np.maximum.at(bottoms, pixel_ids, rows + 1)
+
+    sprites = []
+    for id_value in id_values:
+        left, top, right, bottom = lefts[id_value], tops[id_value], rights[id_value], bottoms[id_value]
+
+        if left >= right:
+            sprites.append(_get_empty_trim(image, width, height))
+            continue
+
+        # Only the bounding box is copied, pixels of other ids within it are made transparent
+        sprite = image[top:bottom, left:right].copy()
+        sprite[ids[top:bottom, left:right] != id_value] = 0
+
+        sprites.append((sprite, left - width / 2, top - height / 2))
+
+    return sprites
+
+
+def _get_empty_trim(image, width, height):
+    # ImageMagick keeps a single transparent pixel just outside of the (1 pixel bordered) canvas
+    return np.zeros((1, 1, 4), image.dtype), -1 - (width + 2) / 2, -1 - (height + 2) / 2
@@ -1,5 +1,13 @@
 # Class for building magick commands
 import os
+import subprocess
+import threading
+import time
+
+from .timings import count_subprocess, trace_span, add_trace_span
+
+# Format of the offsets that are written by a trim operation
+trim_info_format = "%[fx:page.x-page.width/2] %[fx:page.y-page.height/2]"
 
 
 class MagickCommand(object):
@@ -36,7 +44,7 @@ class MagickCommand(object):
     def trim(self):
         self.use_repage = True
         self.full_command += \
-            " -bordercolor none -compose Copy -border 1 -trim  -format \"%[fx:page.x-page.width/2] %[fx:page.y-page.height/2]\" -write info:"
+            " -bordercolor none -compose Copy -border 1 -trim  -format \"" + trim_info_format + "\" -write info:"
 
     # Sets a number of channels (Red, Green, Blue) to 0
     def nullify_channels(self, channels_to_nullify):
@@ -108,6 +116,18 @@ class MagickCommand(object):
             final_command = final_command.replace("(", "\(").replace(")", "\)")
         return final_command
 
+    # Gets the command as a statement in a magick script. The result is written to the output and the image list is
+    # cleared afterwards so the next statement starts fresh. Trim offsets are prefixed with the info tag
+    def get_script_string(self, output, info_tag):
+        command = self.full_command
+        if self.use_repage:
+            command = command + " +repage"
+        command = command + " -write \"" + output + "\" -delete 0--1"
+        if os.name == "nt":
+            # Backslashes are escape characters in magick scripts
+            command = command.replace("\\", "/")
+        return command.replace(trim_info_format, info_tag + " " + trim_info_format + "\\n")
+
     def __stringify_input(self, input):
         if type(input) is str:
             if input.startswith("mpr:"):
@@ -115,3 +135,142 @@ class MagickCommand(object):
             return "\"" + input + "\""
         self.use_repage = self.use_repage or input.use_repage
         return "( " + input.full_command + " )"
+
+
+# Collects magick commands and runs them in a single ImageMagick invocation, either through a script file or by
+# streaming them to one long-lived magick process over stdin
+
+
+class MagickBatch(object):
+    def __init__(self, magick_path, script_path, use_stdin=False):
+        self.magick_path = magick_path
+        self.script_path = script_path
+        self.use_stdin = use_stdin
+
+        self.statements = []
+        self.callbacks = []
+        self.command_count = 0
+
+        self.process = None
+        self.process_output = []
+        self.output_reader = None
+
+        # Traced with the magick process, in characters
+        self.command_size = 0
+        self.process_start = 0
+
+    # Queues a command. The callback receives the info output (trim offsets) of the command once the batch has run
+    def add(self, command, output, callback=None):
+        info_tag = "command_{}".format(self.command_count)
+        self.command_count += 1
+
+        statement = command.get_script_string(output, info_tag)
+        self.callbacks.append((info_tag, callback))
+
+        self.command_size += len(statement)
+
+        if self.use_stdin:
+            if self.process is None:
+                self._start_process()
+            self.process.stdin.write((statement + "\n").encode("utf-8"))
+            self.process.stdin.flush()
+        else:
+            self.statements.append(statement)
+
+    # Runs all queued commands and hands the results to their callbacks
+    def execute(self):
+        if len(self.callbacks) == 0:
+            return
+
+        if self.use_stdin:
+            output = self._finish_process()
+        else:
+            output = self._run_script()
+
+        results = {}
+        for line in output.splitlines():
+            parts = line.strip().split(" ", 1)
+            if len(parts) == 2:
+                results[parts[0]] = parts[1]
+
+        callbacks = self.callbacks
+        self.callbacks = []
+
+        for info_tag, callback in callbacks:
+            if callback != None:
+                callback(results.get(info_tag, ""))
+
+    # Drops the queued commands and stops the magick process without waiting for it, used when a render fails.
+    # Safe to call more than once
+    def close(self):
+        self.statements = []
+        self.callbacks = []
+        self.command_size = 0
+
+        process = self.process
+        self.process = None
+        if process is None:
+            return
+
+        process.kill()
+        process.wait()
+        self.output_reader.join()
+
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+
+    def _run_script(self):
+        script_folder = os.path.dirname(self.script_path)
+        os.makedirs(script_folder, exist_ok=True)
+
+        with open(self.script_path, "w") as script_file:
+            script_file.write("\n".join(self.statements))
+
+        trace_args = {"commands": len(self.statements),
+                      "command_size": self.command_size}
+
+        self.statements = []
+        self.command_size = 0
+
+        count_subprocess()
+        with trace_span("magick -script", "magick", trace_args):
+            return subprocess.check_output(
+                [self.magick_path, "-script", self.script_path]).decode("utf-8")
+
+    def _start_process(self):
+        self.process_start = time.perf_counter()
+
+        count_subprocess()
+        self.process = subprocess.Popen(
+            [self.magick_path, "-script", "-"], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.process_output = []
+
+        # Drain stdout while commands are being streamed so the process never blocks on a full pipe
+        def read_output(stream, lines):
+            for line in stream:
+                lines.append(line.decode("utf-8"))
+
+        self.output_reader = threading.Thread(
+            target=read_output, args=(self.process.stdout, self.process_output))
+        self.output_reader.daemon = True
+        self.output_reader.start()
+
+    def _finish_process(self):
+        process = self.process
+        self.process = None
+
+        process.stdin.close()
+        self.output_reader.join()
+        return_code = process.wait()
+
+        add_trace_span("magick -script -", "magick", self.process_start, {
+            "commands": len(self.callbacks), "command_size": self.command_size})
+        self.command_size = 0
+
+        if return_code != 0:
+            raise subprocess.CalledProcessError(
+                return_code, self.magick_path + " -script -")
+
+        return "".join(self.process_output)
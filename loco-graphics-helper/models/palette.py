@@ -9,9 +9,13 @@ RCT Graphics Helper is licensed under the GNU General Public License version 3.
 
 import subprocess
 import os
+import numpy as np
 
 from ..magick_command import MagickCommand
 from ..res.res import res_path
+from ..imaging.png import read_png
+from .palette_cache import PaletteCache
+from ..timings import count_subprocess, trace_span
 
 palette_colors = [
     "black",
@@ -167,6 +171,19 @@ palette_colors_details = {
 palette_base_path = os.path.join(res_path, "palettes")
 palette_groups_path = os.path.join(palette_base_path, "groups")
 
+palette_cache = PaletteCache(os.path.join(
+    res_path, "cache", "palettes"), palette_groups_path)
+
+# Colors of each color group image, loaded on first use
+color_group_colors = {}
+
+
+def get_color_group_colors(color):
+    if not color in color_group_colors:
+        pixels = read_png(os.path.join(palette_groups_path, color + ".png"))
+        color_group_colors[color] = pixels.reshape(-1, 4)
+    return color_group_colors[color]
+
 # Collection of color groups to create a palette from
 
 
@@ -208,10 +225,27 @@ class Palette:
         copied_palette.path = self.path
         return copied_palette
 
-    # Prepares the palette for use by the render process. The palette image file is regenerated if necessary
+    # Gets the unique RGBA colors of the palette in order, as they appear in the generated palette image
+    def get_colors(self):
+        colors = []
+        seen = set()
+        for color in self.colors:
+            for rgba in get_color_group_colors(color):
+                key = tuple(rgba)
+                if key in seen:
+                    continue
+                seen.add(key)
+                colors.append(rgba)
+        return np.array(colors, np.uint8).reshape(-1, 4)
+
+    # Prepares the palette for use by the render process. The palette image is taken from the palette cache, and only
+    # generated when the cache has no image for the colors of the palette
     def prepare(self, renderer):
         if (not self.generated) or self.invalidated:
-            self.generate_output(renderer, self.path)
+            self.path = palette_cache.get_palette_image(
+                self.colors, lambda output_path: self.generate_output(renderer, output_path))
+            self.generated = True
+            self.invalidated = False
 
     # Generates a palette image file
     def generate_output(self, renderer, output_path):
@@ -224,8 +258,12 @@ class Palette:
 
         cmd.as_montage(color_paths)
 
-        subprocess.check_output(cmd.get_command_string(
-            renderer.magick_path, output_path), shell=True)
+        command_string = cmd.get_command_string(
+            renderer.magick_path, output_path)
+
+        count_subprocess()
+        with trace_span("Palette generation", "palette", {"colors": len(self.colors), "command_size": len(command_string)}):
+            subprocess.check_output(command_string, shell=True)
         
         print(output_path)
 
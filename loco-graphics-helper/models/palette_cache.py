@@ -0,0 +1,109 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import hashlib
+import json
+import os
+import threading
+
+# Content addressed cache for generated palette images. Images are keyed by the ordered list of color groups they are
+# made of, and stay valid for as long as the color group images they were generated from are unchanged. A small index
+# file keeps track of the entries so images are reused across renders and Blender sessions.
+
+
+class PaletteCache:
+    def __init__(self, cache_path, groups_path):
+        self.cache_path = cache_path
+        self.groups_path = groups_path
+        self.index_path = os.path.join(cache_path, "index.json")
+
+        self.index = None
+        self.lock = threading.Lock()
+
+    # Gets the path of the palette image for the ordered list of color groups. The generate function is called with
+    # the output path when there is no valid cached image
+    def get_palette_image(self, colors, generate):
+        with self.lock:
+            if self.index == None:
+                self._load_index()
+
+            key = self.get_key(colors)
+            path = os.path.join(self.cache_path, key + ".png")
+            group_mtimes = self._get_group_mtimes(colors)
+
+            entry = self.index.get(key)
+            if entry != None and entry["mtimes"] == group_mtimes and os.path.exists(path):
+                return path
+
+            if not os.path.exists(self.cache_path):
+                os.makedirs(self.cache_path, exist_ok=True)
+
+            # Generate to a temporary file first, render shards may generate the same palette at the same time
+            temporary_path = "{}.{}.png".format(path[:-4], os.getpid())
+            generate(temporary_path)
+            os.replace(temporary_path, path)
+
+            self.index[key] = {
+                "colors": list(colors),
+                "mtimes": group_mtimes
+            }
+            self._save_index()
+
+            return path
+
+    @staticmethod
+    def get_key(colors):
+        return hashlib.sha1("\n".join(colors).encode("utf-8")).hexdigest()
+
+    def _get_group_mtimes(self, colors):
+        mtimes = {}
+        for color in colors:
+            mtimes[color] = os.path.getmtime(
+                os.path.join(self.groups_path, color + ".png"))
+        return mtimes
+
+    # Loads the index and evicts the entries whose color groups have changed or whose image is missing
+    def _load_index(self):
+        self.index = {}
+
+        if not os.path.exists(self.index_path):
+            return
+
+        try:
+            with open(self.index_path, "r") as index_file:
+                index = json.load(index_file)
+        except (OSError, ValueError):
+            index = {}
+
+        evicted = False
+        for key, entry in index.items():
+            path = os.path.join(self.cache_path, key + ".png")
+
+            try:
+                valid = os.path.exists(path) and entry["mtimes"] == self._get_group_mtimes(
+                    entry["colors"])
+            except (OSError, KeyError):
+                valid = False
+
+            if valid:
+                self.index[key] = entry
+                continue
+
+            evicted = True
+            if os.path.exists(path):
+                os.remove(path)
+
+        if evicted:
+            self._save_index()
+
+    def _save_index(self):
+        temporary_path = "{}.{}.tmp".format(self.index_path, os.getpid())
+        with open(temporary_path, "w") as index_file:
+            json.dump(self.index, index_file, indent=4)
+        os.replace(temporary_path, self.index_path)
@@ -8,6 +8,7 @@ RCT Graphics Helper is licensed under the GNU General Public License version 3.
 '''
 
 import bpy
+import json
 import math
 import os
 
@@ -21,6 +22,19 @@ from ..renderer import Renderer
 
 from ..models.palette import palette_colors
 
+from ..sharding import ShardCoordinator, apply_shard_spec, write_shard_result
+
+from ..resolution_planner import ResolutionPlanner
+
+
+# Sets the camera to the orthographic scale and horizontal shift that belong to the render resolution
+def set_camera_for_resolution(resolution):
+    bpy.data.cameras["Camera"].ortho_scale = 169.72 / \
+        (1920 / resolution)
+
+    bpy.data.cameras["Camera"].shift_x = -0.000345 * \
+        128 / resolution
+
 
 def rotate_rig(angle, verAngle=0, bankedAngle=0, midAngle=0):
     object = bpy.data.objects['Rig']
@@ -33,6 +47,12 @@ def rotate_rig(angle, verAngle=0, bankedAngle=0, midAngle=0):
 
 
 class RCTRender(object):
+    # Set when the operator runs inside a render shard worker, points to the json file describing the shard
+    shard_spec = bpy.props.StringProperty(
+        name="Shard Spec",
+        default="",
+        options={'HIDDEN', 'SKIP_SAVE'})
+
     def __init__(self):
         self.context = None
 
@@ -40,6 +60,9 @@ class RCTRender(object):
 
         self.palette_manager = PaletteManager()
 
+        # Processor of the running render, shut down when the render ends
+        self.render_task_processor = None
+
     @classmethod
     def poll(cls, context):
         return 'Rig' in bpy.data.objects is not None
@@ -52,15 +75,20 @@ class RCTRender(object):
         general_props = context.scene.loco_graphics_helper_general_properties
 
         rotate_rig(0, 0, 0, 0)
-        bpy.data.cameras["Camera"].ortho_scale = 169.72 / \
-            (1920 / context.scene.render.resolution_x)
+        set_camera_for_resolution(context.scene.render.resolution_x)
 
-        bpy.data.cameras["Camera"].shift_x = -0.000345 * \
-            128 / context.scene.render.resolution_x
+        original_resolution = None
 
         def finish():
+            # Stops the post processing workers and magick processes a failed render leaves behind
+            if self.render_task_processor != None:
+                self.render_task_processor.shutdown()
+                self.render_task_processor = None
+
             general_props.rendering = False
             rotate_rig(0, 0, 0, 0)
+            if original_resolution != None:
+                self._set_resolution(context, original_resolution)
             print("Loco render has been completed")
 
         general_props.rendering = True
@@ -75,11 +103,100 @@ class RCTRender(object):
                 i += 1
             self.palette_manager.set_custom_palette(colors)
 
-        render_task_processor = RenderTaskProcessor(
-            context, self.palette_manager)
+        if self.shard_spec != "":
+            return self._execute_shard(context, finish)
+
+        # The scene is restored when the render fails, so the resolution, the camera and the render button are not
+        # left in their rendering state
+        try:
+            task = self.create_task(context)
+
+            # Render shards open a copy of the scene that already has the resolution of the task
+            if general_props.auto_resolution:
+                original_resolution = (
+                    context.scene.render.resolution_x, context.scene.render.resolution_y)
+                self._fit_resolution(context, task)
+
+            if general_props.render_shards > 1:
+                return self._execute_sharded(context, task, finish)
+
+            # The renderer takes the lens shift offset from the resolution, so it is created after the resolution is set
+            self.render_task_processor = RenderTaskProcessor(
+                context, self.palette_manager)
+
+            self.render_task_processor.process(task, finish)
+        except Exception as e:
+            finish()
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        return {'FINISHED'}
+
+    # Sets the smallest resolution that contains the objects in every frame of the task
+    def _fit_resolution(self, context, task):
+        render = context.scene.render
+        original_resolution = (render.resolution_x, render.resolution_y)
+
+        resolution = ResolutionPlanner(context.scene).get_resolution(task.frames)
+        rotate_rig(0, 0, 0, 0)
+
+        self._set_resolution(context, (resolution, resolution))
+
+        original_pixels = original_resolution[0] * original_resolution[1]
+        saved = 1 - resolution * resolution / original_pixels
+        print("Auto resolution: rendering at {}x{} instead of {}x{}, {}% fewer pixels per frame".format(
+            resolution, resolution, original_resolution[0], original_resolution[1], round(saved * 100)))
+
+    def _set_resolution(self, context, resolution):
+        context.scene.render.resolution_x = resolution[0]
+        context.scene.render.resolution_y = resolution[1]
+        set_camera_for_resolution(resolution[0])
+
+    # Renders the sprites in background Blender processes and builds the remaining files once they are done
+    def _execute_sharded(self, context, task, finish):
+        general_props = context.scene.loco_graphics_helper_general_properties
+
+        coordinator = ShardCoordinator(
+            context, self.bl_idname, general_props.render_shards, general_props.shard_mode)
+
+        try:
+            with task.timings.measure_task(type(coordinator).__name__):
+                coordinator.render_sprites(task)
+        except Exception as e:
+            finish()
+            self.report({'ERROR'}, str(e))
+            return {'CANCELLED'}
+
+        self.render_task_processor = RenderTaskProcessor(
+            context, self.palette_manager, render_sprites=False)
+
+        self.render_task_processor.process(task, finish)
+
+        return {'FINISHED'}
+
+    # Renders the sprites of a single shard and reports them back to the coordinator
+    def _execute_shard(self, context, finish):
+        with open(self.shard_spec, "r") as spec_file:
+            spec = json.load(spec_file)
+
+        print("Rendering shard {} with {} frames".format(
+            spec["shard"], len(spec["frames"])))
 
         task = self.create_task(context)
+        apply_shard_spec(task, spec)
+
+        def finish_shard():
+            write_shard_result(task, spec)
+            finish()
+
+        self.render_task_processor = RenderTaskProcessor(
+            context, self.palette_manager, build_files=False)
 
-        render_task_processor.process(task, finish)
+        # The coordinator sees the failure from the exit code of the shard
+        try:
+            self.render_task_processor.process(task, finish_shard)
+        except Exception:
+            finish()
+            raise
 
         return {'FINISHED'}
@@ -0,0 +1,72 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import os
+import pickle
+import sys
+import traceback
+import types
+
+# Worker process for the CPU heavy parts of post processing, see worker_processes.py. Started as a script with the
+# Python interpreter that ships with Blender, so it can not import bpy. The add-on's __init__ registers the add-on
+# with Blender, so the package is made importable without running it.
+#
+# Jobs are read from stdin as pickled (function name, arguments) tuples and answered on stdout with a pickled
+# (status, result) tuple. The worker exits when stdin is closed.
+
+package_name = "loco_graphics_helper"
+
+
+def _load_functions():
+    if not package_name in sys.modules:
+        package = types.ModuleType(package_name)
+        package.__path__ = [os.path.dirname(os.path.abspath(__file__))]
+        sys.modules[package_name] = package
+
+    from loco_graphics_helper.imaging.quantizer import quantize_render
+
+    return {
+        "quantize_render": quantize_render
+    }
+
+
+def main():
+    input = sys.stdin.buffer
+    output = sys.stdout.buffer
+
+    # Anything printed by a job goes to the console, stdout only carries results
+    sys.stdout = sys.stderr
+
+    try:
+        functions = _load_functions()
+    except Exception:
+        pickle.dump(("error", traceback.format_exc()), output)
+        output.flush()
+        return
+
+    pickle.dump(("ready", None), output)
+    output.flush()
+
+    while True:
+        try:
+            function_name, arguments = pickle.load(input)
+        except EOFError:
+            return
+
+        try:
+            response = ("done", functions[function_name](*arguments))
+        except Exception:
+            response = ("error", traceback.format_exc())
+
+        pickle.dump(response, output, pickle.HIGHEST_PROTOCOL)
+        output.flush()
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,7 @@ from collections import OrderedDict
 from .sub_processes.sub_processor import SubProcessor
 
 from ..renderer import Renderer
+from ..timings import no_measurement
 
 # Context container for a process
 
@@ -44,6 +45,10 @@ class BaseProcessor(SubProcessor):
         process_context = self.create_context(finalize)
         self._step(process_context)
 
+    def shutdown(self):
+        for process in self.processes:
+            process.shutdown()
+
     def _step(self, process_context):
         while process_context.sub_process_index < len(self.processes):
             current_process = self.processes[process_context.sub_process_index]
@@ -63,7 +68,8 @@ class BaseProcessor(SubProcessor):
 
             print("Starting subprocess: {}".format(
                 type(current_process).__name__))
-            current_process.process(process_context, sub_process_callback)
+            with self._measure(process_context, current_process):
+                current_process.process(process_context, sub_process_callback)
             print("Finished subprocess: {}".format(
                 type(current_process).__name__))
 
@@ -76,5 +82,9 @@ class BaseProcessor(SubProcessor):
         if process_context.final_callback != None:
             process_context.final_callback()
 
+    # Measures a sub process, processors that keep timings override this
+    def _measure(self, process_context, process):
+        return no_measurement()
+
     def _proceed_process_context(self, process_context):
         process_context.sub_process_index += 1
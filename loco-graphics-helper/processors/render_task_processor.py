@@ -9,9 +9,12 @@ RCT Graphics Helper is licensed under the GNU General Public License version 3.
 
 
 import bpy
+import os
 from .sub_processes.parkobj_processor import ParkobjProcessor
 from .sub_processes.gx_processor import GXProcessor
 from .sub_processes.sprites_manifest_processor import SpritesManifestProcessor
+from .sub_processes.render_cache_processor import RenderCacheProcessor
+from .sub_processes.sprite_dedup_processor import SpriteDedupProcessor
 from .base_processor import BaseProcessor, BaseProcessorContext
 
 from .sub_processes.sprite_processor import SpriteProcessor
@@ -29,24 +32,52 @@ class RenderTaskProcessContext(BaseProcessorContext):
 
 
 class RenderTaskProcessor(BaseProcessor):
-    def __init__(self, context, palette_manager):
+    # The sprites and the files built from them (deduplication, render cache, manifest, GX and parkobj) can be processed separately, render shards
+    # only render sprites while the shard coordinator only builds the files
+    def __init__(self, context, palette_manager, render_sprites=True, build_files=True):
         super().__init__(context)
         self.renderer = Renderer(context, palette_manager)
 
-        self.processes = [
-            SpriteProcessor(self.renderer),
-            SpritesManifestProcessor(self.renderer),
-            GXProcessor(self.renderer),
-            ParkobjProcessor(self.renderer)
-        ]
+        self.processes = []
+
+        # Timings are written next to the sprites manifest, render shards hand them to the coordinator instead
+        self.write_timings = build_files
+
+        if render_sprites:
+            self.processes.append(SpriteProcessor(self.renderer))
+
+        if build_files:
+            self.processes += [
+                SpriteDedupProcessor(self.renderer),
+                RenderCacheProcessor(self.renderer),
+                SpritesManifestProcessor(self.renderer),
+                GXProcessor(self.renderer),
+                ParkobjProcessor(self.renderer)
+            ]
 
     def create_context(self, finalize_callback, task):
         return RenderTaskProcessContext(task, finalize_callback)
 
     def process(self, task, callback):
         def finalize():
+            if self.write_timings:
+                self._write_timings(task)
+
             if callback != None:
                 callback()
 
         task_process_context = self.create_context(finalize, task)
         self._step(task_process_context)
+
+    def _measure(self, process_context, process):
+        return process_context.task.timings.measure_task(type(process).__name__)
+
+    def _write_timings(self, task):
+        task.timings.write(os.path.join(
+            task.get_output_folder(), "timings.json"))
+        task.timings.write_trace(os.path.join(
+            task.get_output_folder(), "trace.json"))
+
+        summary = task.timings.get_summary()
+        print("Render task took {:.2f}s ({:.2f}s CPU) for {} frames and started {} subprocesses".format(
+            summary["wall"], summary["cpu"], summary["frames"], summary["subprocesses"]))
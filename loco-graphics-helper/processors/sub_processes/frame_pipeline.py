@@ -0,0 +1,139 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from ...magick_command import MagickBatch
+from .worker_processes import WorkerProcesses
+
+# Runs the post processing of rendered frames on a bounded set of workers while the next frames are being rendered.
+# Worker threads are used as Blender's embedded interpreter can not start multiprocessing workers reliably. Waiting on
+# magick subprocesses releases the interpreter lock, the pure Python parts of post processing, like reading PNGs and
+# the dithering loop, do not. With the NumPy backend those run in worker processes instead, see worker_processes.py,
+# and the worker threads only wait for them.
+#
+# Whether the magick subprocesses and worker processes run while a frame renders has only been measured outside of
+# Blender. The trace.json of a render shows the renders and the post processing spans per thread, so the overlap can
+# be checked there.
+#
+# Workers must not touch bpy.data, anything that needs Blender is done in the prepare step on the main thread.
+
+
+class FramePipeline:
+    def __init__(self, renderer, workers):
+        self.renderer = renderer
+
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+
+        if renderer.post_processing_backend == "NUMPY":
+            renderer.worker_processes = self._start_worker_processes(
+                workers)
+
+        # Limit the number of rendered frames that are waiting to be post processed
+        self.max_pending = workers * 2
+        self.futures = []
+
+        # Magick batches of the frames that are being post processed, so they can be stopped when the render fails
+        self.magick_batches = []
+        self.magick_batches_lock = threading.Lock()
+
+    # Hands the frame to a worker which runs the given processes on it in order
+    def submit(self, frame, processes):
+        for process in processes:
+            with frame.task.timings.measure_frame(frame, type(process).__name__ + ".prepare"):
+                process.prepare(frame)
+
+        self._wait_for_capacity()
+
+        self.futures.append(self.executor.submit(
+            self._process_frame, frame, processes))
+
+    # Waits for all frames to finish. Raises the first error that occurred on a worker
+    def finish(self):
+        try:
+            for future in self.futures:
+                future.result()
+        finally:
+            self.shutdown()
+
+    # Stops the workers. Frames that have not started are dropped and the magick processes and worker processes of
+    # the running frames are killed. Safe to call more than once
+    def shutdown(self):
+        for future in self.futures:
+            future.cancel()
+
+        running = False
+        for future in self.futures:
+            running = running or not future.done()
+
+        with self.magick_batches_lock:
+            for magick_batch in self.magick_batches:
+                magick_batch.close()
+
+        if self.renderer.worker_processes != None:
+            self.renderer.worker_processes.close(running)
+
+        self.executor.shutdown()
+        self.futures = []
+        self.renderer.worker_processes = None
+
+    # Starts the worker processes, or returns None to post process on the worker threads when they can not be started
+    def _start_worker_processes(self, workers):
+        if not self.renderer.python_path:
+            return None
+
+        try:
+            return WorkerProcesses(self.renderer.python_path, workers)
+        except Exception as e:
+            print("Post processing on threads, the worker processes could not be started: {}".format(e))
+            return None
+
+    def _wait_for_capacity(self):
+        while True:
+            running = []
+            for future in self.futures:
+                if not future.done():
+                    running.append(future)
+                elif future.exception() != None:
+                    raise future.exception()
+
+            if len(running) < self.max_pending:
+                return
+
+            wait(running, return_when=FIRST_COMPLETED)
+
+    def _process_frame(self, frame, processes):
+        magick_batch = None
+        if self.renderer.magick_execution != "SEPARATE":
+            magick_batch = MagickBatch(self.renderer.magick_path, os.path.join(
+                frame.task.get_temporary_output_folder(), "batch_{}.mgk".format(frame.frame_index)), self.renderer.magick_execution == "STDIN")
+
+            with self.magick_batches_lock:
+                self.magick_batches.append(magick_batch)
+
+        self.renderer.magick_batch = magick_batch
+
+        try:
+            for process in processes:
+                with frame.task.timings.measure_frame(frame, type(process).__name__):
+                    process.process(frame)
+
+            self.renderer.flush_magick_batch()
+        finally:
+            self.renderer.magick_batch = None
+
+            if magick_batch != None:
+                magick_batch.close()
+
+                with self.magick_batches_lock:
+                    self.magick_batches.remove(magick_batch)
+
+        print("Post processed frame {}".format(frame.frame_index))
@@ -7,10 +7,21 @@ Interested in contributing? Visit https://github.com/oli414/Blender-RCT-Graphics
 RCT Graphics Helper is licensed under the GNU General Public License version 3.
 '''
 
-import subprocess
+import bpy
+import os
+import threading
+import numpy as np
+
 from ....magick_command import MagickCommand
+from ....imaging.exr import read_exr, is_supported_exr, UnsupportedExrException
+from ....imaging.png import write_png
+from ....imaging.masks import dilate_nearest
+from ....imaging.tile_indices import get_tile_index_image
 from ..sub_processor import SubProcessor
 
+# Meta renders that are read in-process
+meta_render_suffixes = ["aa_", "naa_", "ti_naa_", "ti_aa_", "depth_"]
+
 # Frame processor for merging the tile index meta images with the material index meta image
 
 
@@ -23,6 +34,20 @@ class MergeMasksProcessor(SubProcessor):
     def applicable(self, frame):
         return True
 
+    # Meta renders are decoded with the built-in EXR reader, which is safe on post processing workers. Files it does
+    # not support, such as renders of scenes whose output node uses another EXR codec, are decoded by Blender. That
+    # changes bpy.data, which is only safe on the main thread, so those files are decoded here before the frame is
+    # handed to a worker
+    def prepare(self, frame):
+        if not self.renderer.reads_meta_in_process(frame):
+            return
+
+        for suffix in meta_render_suffixes:
+            path = frame.get_meta_render_output_path(suffix)
+            if os.path.exists(path) and not is_supported_exr(path):
+                frame.decoded_meta_renders[path] = self._read_with_blender(
+                    path)
+
     def process(self, frame, callback=None):
         tile_index_naa_meta_output = frame.get_meta_render_output_path(
             "ti_naa_")
@@ -31,6 +56,13 @@ class MergeMasksProcessor(SubProcessor):
         main_meta_input = frame.get_meta_render_output_path("aa_")
         main_meta_output = frame.get_meta_render_output_path()
 
+        if self.renderer.reads_meta_in_process(frame):
+            try:
+                self._merge_in_process(frame)
+            finally:
+                frame.decoded_meta_renders = {}
+            return
+
         material_indices = MagickCommand(main_meta_input)
 
         material_indices.nullify_channels(["Green"])
@@ -57,5 +89,134 @@ class MergeMasksProcessor(SubProcessor):
                     "naa_")
                 material_indices.copy_alpha(naa_meta_output)
 
-        result = str(subprocess.check_output(material_indices.get_command_string(
-            self.renderer.magick_path, main_meta_output), shell=True))
+        self.renderer.run_magick_command(material_indices, main_meta_output)
+
+    # Performs the same merge as the ImageMagick command on the EXR renders directly. The result is handed to the post
+    # processor through the frame, it is only written to disk when ImageMagick still needs to read it
+    def _merge_in_process(self, frame):
+        meta = self._read_meta_render(frame, frame.get_meta_render_output_path("aa_"))
+
+        meta[:, :, 1] = 0
+
+        if frame.oversized:
+            if frame.camera_projection != None:
+                tile_indices_naa = self._get_tile_indices_from_depth(frame)
+            else:
+                tile_indices_naa = self._read_meta_render(
+                    frame, frame.get_meta_render_output_path("ti_naa_"))
+            tile_indices = tile_indices_naa
+
+            if frame.use_anti_aliasing:
+                if self.renderer.anti_aliased_tile_indices == "RENDER":
+                    tile_indices_aa = self._read_meta_render(
+                        frame, frame.get_meta_render_output_path("ti_aa_"))
+                else:
+                    tile_indices_aa = self._derive_anti_aliased_tile_indices(
+                        frame, tile_indices_naa, meta[:, :, 3])
+
+                tile_indices = self._over(tile_indices_aa, tile_indices_naa)
+
+            tile_indices[:, :, 0] = 0
+            tile_indices[:, :, 2] = 0
+
+            meta = self._plus(meta, tile_indices)
+
+            if frame.maintain_aliased_silhouette:
+                meta[:, :, 3] = tile_indices_naa[:, :, 3]
+        elif frame.maintain_aliased_silhouette:
+            meta[:, :, 3] = self._read_meta_render(
+                frame, frame.get_meta_render_output_path("naa_"))[:, :, 3]
+
+        frame.meta = np.rint(np.clip(meta, 0, 1) * 255).astype(np.uint8)
+
+        if self.renderer.post_processing_backend == "MAGICK" or self.renderer.validate_post_processing:
+            write_png(frame.get_merged_meta_output_path(True), frame.meta)
+
+    # Builds the anti-aliased tile index image from the aliased one. Pixels in the anti-aliased fringe take the tile
+    # index of the nearest pixel of the aliased silhouette
+    def _derive_anti_aliased_tile_indices(self, frame, tile_indices_naa, anti_aliased_alpha):
+        coverage = anti_aliased_alpha > 0
+
+        values, known = dilate_nearest(
+            tile_indices_naa[:, :, :3], tile_indices_naa[:, :, 3] > 0, coverage)
+
+        tile_indices_aa = np.zeros(tile_indices_naa.shape, np.float32)
+        tile_indices_aa[:, :, :3] = values
+        tile_indices_aa[:, :, 3] = coverage & known
+
+        if self.renderer.anti_aliased_tile_indices == "VALIDATE":
+            rendered = self._read_meta_render(
+                frame, frame.get_meta_render_output_path("ti_aa_"))
+
+            derived_indices = np.rint(tile_indices_aa[:, :, 1] * 255)
+            rendered_indices = np.rint(rendered[:, :, 1] * 255)
+
+            compared = (tile_indices_aa[:, :, 3] > 0) | (rendered[:, :, 3] > 0)
+            differing = compared & ((derived_indices != rendered_indices) | (
+                (tile_indices_aa[:, :, 3] > 0) != (rendered[:, :, 3] > 0)))
+
+            print("Validation frame {}: {} of {} anti-aliased tile index pixels differ from the rendered mask".format(
+                frame.frame_index, np.count_nonzero(differing), np.count_nonzero(compared)))
+
+        return tile_indices_aa
+
+    # Reconstructs the aliased tile index image from the depth and the hard silhouette of the main render
+    def _get_tile_indices_from_depth(self, frame):
+        depth = self._read_meta_render(
+            frame, frame.get_meta_render_output_path("depth_"))[:, :, 0]
+        silhouette = self._read_meta_render(
+            frame, frame.get_meta_render_output_path("naa_"))[:, :, 3] > 0
+
+        return get_tile_index_image(depth, frame.camera_projection, frame.width, frame.length, silhouette)
+
+    def _read_meta_render(self, frame, path):
+        if path in frame.decoded_meta_renders:
+            return frame.decoded_meta_renders[path]
+
+        try:
+            return read_exr(path)
+        except UnsupportedExrException:
+            if threading.current_thread() != threading.main_thread():
+                raise Exception(
+                    "{} was not decoded before post processing the frame on a worker.".format(path))
+            return self._read_with_blender(path)
+
+    # Lets Blender decode the file, must only be called on the main thread
+    def _read_with_blender(self, path):
+        image = bpy.data.images.load(path)
+        try:
+            width, height = image.size
+            pixels = np.empty(width * height * 4, np.float32)
+            image.pixels.foreach_get(pixels)
+
+            # Blender stores the pixels bottom to top
+            return pixels.reshape(height, width, 4)[::-1].copy()
+        finally:
+            bpy.data.images.remove(image)
+
+    # Composites source over destination, the equivalent of ImageMagick's default Over composite
+    @staticmethod
+    def _over(source, destination):
+        source_alpha = source[:, :, 3:]
+        destination_alpha = destination[:, :, 3:] * (1 - source_alpha)
+
+        alpha = source_alpha + destination_alpha
+
+        result = np.zeros(source.shape, np.float32)
+        result[:, :, :3] = source[:, :, :3] * source_alpha + \
+            destination[:, :, :3] * destination_alpha
+        np.divide(result[:, :, :3], alpha, out=result[:, :, :3], where=alpha > 0)
+        result[:, :, 3:] = alpha
+        return result
+
+    # Adds source and destination together, the equivalent of ImageMagick's Plus composite
+    @staticmethod
+    def _plus(source, destination):
+        alpha = np.minimum(source[:, :, 3:] + destination[:, :, 3:], 1)
+
+        result = np.zeros(source.shape, np.float32)
+        result[:, :, :3] = source[:, :, :3] * source[:, :, 3:] + \
+            destination[:, :, :3] * destination[:, :, 3:]
+        np.divide(result[:, :, :3], alpha, out=result[:, :, :3], where=alpha > 0)
+        result[:, :, 3:] = alpha
+        return result
@@ -8,10 +8,12 @@ RCT Graphics Helper is licensed under the GNU General Public License version 3.
 '''
 
 import os
-import subprocess
 from unicodedata import ucnhash_CAPI
 
 from ....magick_command import MagickCommand
+from ....imaging.png import read_png, write_png8, to_8_bit
+from ....imaging.quantizer import get_quantizer, quantize_render, count_differing_pixels
+from ....imaging.trim import trim, split_by_id
 from ..sub_processor import SubProcessor
 
 
@@ -31,10 +33,51 @@ class PostProcessor(SubProcessor):
 
         self.renderer = renderer
 
+    # Palette images are generated on the main thread, so post processing workers only read them
+    def prepare(self, frame):
+        self.renderer.get_palette_path(frame.base_palette)
+
+        for i in range(frame.recolorables):
+            self.renderer.get_palette_path(
+                self.renderer.palette_manager.get_recolor_palette(i))
+
+        # Same for the lookup tables, which are built the first time a palette is used. Worker processes build their
+        # own when they first quantize a frame
+        if self.renderer.post_processing_backend == "NUMPY" and self.renderer.worker_processes == None:
+            for colors in self._get_palette_colors(frame):
+                get_quantizer(colors, self.renderer.floyd_steinberg_diffusion,
+                              self.renderer.palette_lookup_tables)
+
     def process(self, frame, callback=None):
-        main_render_path = frame.get_base_render_output_path()
+        try:
+            self._process(frame)
+        finally:
+            # Release the merged meta image, the frame is done
+            frame.meta = None
+
+    def _process(self, frame):
+        if self.renderer.post_processing_backend == "NUMPY":
+            quantized, meta = self._quantize_in_process(frame)
+
+            if frame.oversized:
+                self._split_tiles(frame, quantized, meta)
+            elif frame.occlusion_layers > 0:
+                self._split_layers(frame, quantized, meta)
+            else:
+                self._write_trimmed(frame, quantized, frame.output_indices[0],
+                                    frame.get_final_output_paths()[0])
+            return
+
+        magick_command = self._get_quantize_command(
+            frame, self._get_mask_path(frame))
+
+        if not frame.oversized:
+            self._process_default(magick_command, frame)
+        else:
+            self._process_oversized(magick_command, frame)
 
-        mask_path = frame.get_meta_render_output_path()
+    def _get_quantize_command(self, frame, mask_path):
+        main_render_path = frame.get_base_render_output_path()
 
         magick_command = MagickCommand(mask_path)
         magick_command.write_to_cache("meta", True, main_render_path)
@@ -62,128 +105,191 @@ class PostProcessor(SubProcessor):
         if frame.maintain_aliased_silhouette:
             magick_command.copy_alpha("mpr:meta")
 
-        if not frame.oversized:
-            self._process_default(magick_command, frame)
+        return magick_command
+
+    # Performs the same dithering, recoloring and alpha masking as the ImageMagick command, but in-process. Runs in a
+    # worker process when the frame pipeline started them. Returns the quantized image and the meta image
+    def _quantize_in_process(self, frame):
+        mask_path = self._get_mask_path(frame)
+
+        meta = self._get_meta(frame)
+
+        palette_colors = self._get_palette_colors(frame)
+        arguments = (frame.get_base_render_output_path(), meta, palette_colors[0], palette_colors[1:],
+                     self.renderer.floyd_steinberg_diffusion, self.renderer.palette_lookup_tables,
+                     frame.maintain_aliased_silhouette)
+
+        if self.renderer.worker_processes != None:
+            quantized = self.renderer.worker_processes.run(
+                "quantize_render", *arguments)
         else:
-            self._process_oversized(magick_command, frame)
+            quantized = quantize_render(*arguments)
 
-    def _process_default(self, magick_command, frame):
-        quantized_output_path = frame.get_quantized_render_output_path()
-        mask_path = frame.get_meta_render_output_path()
+        if self.renderer.validate_post_processing:
+            self._validate_in_process_result(frame, quantized, mask_path)
 
-        if frame.occlusion_layers > 0:
-            # If we are using occlusion layers, then render each seperately.
-            result = str(subprocess.check_output(magick_command.get_command_string(
-                self.renderer.magick_path, quantized_output_path), shell=True))
+        return quantized, meta
 
-            magick_command = MagickCommand(quantized_output_path)
+    # Gets the colors of the base palette followed by the colors of the recolor palettes
+    def _get_palette_colors(self, frame):
+        palettes = [frame.base_palette]
+        for i in range(frame.recolorables):
+            palettes.append(
+                self.renderer.palette_manager.get_recolor_palette(i))
 
-        layers = frame.occlusion_layers
+        return [palette.get_colors() for palette in palettes]
+
+    # Runs the ImageMagick command on the same inputs and reports how many pixels differ from the in-process result
+    def _validate_in_process_result(self, frame, quantized, mask_path):
+        reference_path = frame.get_quantized_render_output_path("_reference")
 
-        if layers == 0:
-            layers = 1
+        magick_command = self._get_quantize_command(frame, mask_path)
+        self.renderer.run_magick_command(magick_command, reference_path)
+        self.renderer.flush_magick_batch()
 
-        layer_command = magick_command
+        reference = to_8_bit(read_png(reference_path))
 
-        for i in range(layers):
-            output_index = frame.output_indices[i]
+        differing_pixels = count_differing_pixels(quantized, reference)
+        total_pixels = quantized.shape[0] * quantized.shape[1]
+
+        print("Validation frame {}: {} of {} pixels differ from the ImageMagick result".format(
+            frame.frame_index, differing_pixels, total_pixels))
+
+    # Splits the frame into a sprite per occlusion layer in one pass over the quantized image and the layer ids
+    def _split_layers(self, frame, quantized, meta):
+        layers = frame.occlusion_layers
+
+        # The occlusion layer id is stored in the blue channel of the meta image
+        sprites = split_by_id(quantized, meta[:, :, 2], [
+            layers - i - 1 for i in range(layers)])
+
+        for i, (cropped, offset_x, offset_y) in enumerate(sprites):
             output_path = frame.get_final_output_paths()[i]
+            write_png8(output_path, cropped)
 
-            if frame.occlusion_layers > 0:
-                layer_command = magick_command.clone()
+            frame.output_info.append(self._create_output(
+                frame, frame.output_indices[i], output_path, offset_x, offset_y))
 
-                # Mask the occlusion layer
-                mask = MagickCommand(mask_path)
-                mask.nullify_channels(["Red", "Green"])
-                mask.id_mask(0, 0, frame.occlusion_layers - i - 1)
-                layer_command.mask_mix_self(mask)
+    # Splits the frame into a sprite per tile in one pass over the quantized image and the tile indices
+    def _split_tiles(self, frame, quantized, meta):
+        num_frames = frame.width * frame.length
 
-            layer_command.trim()
+        tiles = []
+        for i in range(frame.width):
+            for j in range(frame.length):
+                tiles.append((i, j, j * frame.width + i))
 
-            result = str(subprocess.check_output(layer_command.get_command_string(
-                self.renderer.magick_path, output_path), shell=True))
+        # The inverse tile index is stored in the green channel of the meta image
+        sprites = split_by_id(quantized, meta[:, :, 1], [
+            num_frames - tile_index - 1 for _, _, tile_index in tiles])
 
-            output_info = self._get_output_info_from_results(
-                result, output_index, output_path)
+        for (i, j, tile_index), (cropped, offset_x, offset_y) in zip(tiles, sprites):
+            dx, dy = self._get_tile_offset(frame, i, j)
 
-            output_info.offset_y -= self.renderer.lens_shift_y_offset
-            output_info.offset_y += self.renderer.context.scene.loco_graphics_helper_general_properties.y_offset
+            output_path = frame.get_final_output_paths()[tile_index]
+            write_png8(output_path, cropped)
 
-            output_info.offset_x += frame.offset_x
-            output_info.offset_y += frame.offset_y
+            frame.output_info.append(self._create_output(
+                frame, frame.output_indices[tile_index], output_path, offset_x, offset_y, dx, dy))
 
-            frame.task.output_info.append(output_info)
+    def _write_trimmed(self, frame, image, output_index, output_path):
+        cropped, offset_x, offset_y = trim(image)
 
-    def _process_oversized(self, magick_command, frame):
-        quantized_output_path = frame.get_quantized_render_output_path()
+        write_png8(output_path, cropped)
 
-        mask_path = frame.get_meta_render_output_path()
+        frame.output_info.append(self._create_output(
+            frame, output_index, output_path, offset_x, offset_y))
 
-        result = str(subprocess.check_output(magick_command.get_command_string(
-            self.renderer.magick_path, quantized_output_path), shell=True))
+    def _process_default(self, magick_command, frame):
+        if frame.occlusion_layers > 0:
+            quantized, meta = self._read_magick_result(magick_command, frame)
+            self._split_layers(frame, quantized, meta)
+            return
 
-        output_infos = []
+        output_index = frame.output_indices[0]
+        output_path = frame.get_final_output_paths()[0]
 
-        num_frames = frame.width * frame.length
-        for i in range(frame.width):
-            for j in range(frame.length):
-                tile_index = j * frame.width + i
-                final_output_index = frame.output_indices[tile_index]
-                final_output_path = frame.get_final_output_paths()[tile_index]
-                tile_magic_command = MagickCommand(quantized_output_path)
+        magick_command.trim()
 
-                inverse_tile_index = num_frames - tile_index - 1
-                mask = MagickCommand(mask_path)
-                mask.nullify_channels(["Red", "Blue"])
-                mask.id_mask(0, inverse_tile_index, 0)
+        def add_output_info(result):
+            frame.output_info.append(self._get_output_info_from_results(
+                frame, result, output_index, output_path))
 
-                tile_magic_command.mask_mix_self(mask)
+        self.renderer.run_magick_command(
+            magick_command, output_path, add_output_info)
 
-                tile_magic_command.trim()
+    def _process_oversized(self, magick_command, frame):
+        quantized, meta = self._read_magick_result(magick_command, frame)
+        self._split_tiles(frame, quantized, meta)
+
+    # Runs the quantize command and reads the result back together with the merged meta image
+    def _read_magick_result(self, magick_command, frame):
+        quantized_output_path = frame.get_quantized_render_output_path()
 
-                result = str(subprocess.check_output(tile_magic_command.get_command_string(
-                    self.renderer.magick_path, final_output_path), shell=True))
+        self.renderer.run_magick_command(
+            magick_command, quantized_output_path)
+        self.renderer.flush_magick_batch()
 
-                output_info = self._get_output_info_from_results(
-                    result, final_output_index, final_output_path)
+        quantized = to_8_bit(read_png(quantized_output_path))
 
-                # Modify the output offsets for the sub tile we're processing
-                x, y = (i - (frame.width - 1) /
-                        2), (j - (frame.length - 1) / 2)
+        return quantized, self._get_meta(frame)
 
-                rot = round(frame.view_angle / 90) % 4
+    # Gets the merged meta image, which is normally handed over in memory by the merge masks processor
+    def _get_meta(self, frame):
+        if frame.meta is None:
+            # The merged meta image may still be queued in a magick batch
+            self.renderer.flush_magick_batch()
+            frame.meta = to_8_bit(read_png(self._get_mask_path(frame)))
 
-                if rot == 1:
-                    x, y = (-y,  x)
-                if rot == 2:
-                    x, y = (-x, -y)
-                if rot == 3:
-                    x, y = (y, -x)
+        return frame.meta
 
-                dx = -int((x * 32) - (y * 32))
-                dy = -int((y * 16) + (x * 16))
+    def _get_mask_path(self, frame):
+        return frame.get_merged_meta_output_path(self.renderer.reads_meta_in_process(frame))
 
-                output_info.offset_x += dx
-                output_info.offset_y += dy
+    # Gets the offsets of a sub tile of an oversized frame relative to the center of the frame
+    def _get_tile_offset(self, frame, i, j):
+        x, y = (i - (frame.width - 1) /
+                2), (j - (frame.length - 1) / 2)
 
-                output_info.offset_y -= self.renderer.lens_shift_y_offset
-                output_info.offset_y += self.renderer.context.scene.loco_graphics_helper_general_properties.y_offset
+        rot = round(frame.view_angle / 90) % 4
 
-                output_info.offset_x += frame.offset_x
-                output_info.offset_y += frame.offset_y
+        if rot == 1:
+            x, y = (-y,  x)
+        if rot == 2:
+            x, y = (-x, -y)
+        if rot == 3:
+            x, y = (y, -x)
 
-                output_infos.append(output_info)
+        dx = -int((x * 32) - (y * 32))
+        dy = -int((y * 16) + (x * 16))
 
-        frame.task.output_info += output_infos
+        return dx, dy
 
-    def _get_output_info_from_results(self, result, output_index, output_path):
+    def _get_output_info_from_results(self, frame, result, output_index, output_path, dx=0, dy=0):
+        offset_coords = result.split()
+        if len(offset_coords) != 2:
+            return self._create_output(frame, output_index, output_path, None, None, dx, dy)
+
+        return self._create_output(frame, output_index, output_path, float(offset_coords[0]), float(offset_coords[1]), dx, dy)
+
+    # Creates the output info from the trim offsets. All corrections to the sprite offsets are applied here. Without
+    # trim offsets the sprite starts at the origin, the other corrections are still applied
+    def _create_output(self, frame, output_index, output_path, trim_x, trim_y, dx=0, dy=0):
         output = Output()
         output.index = output_index
         output.path = output_path
 
-        if result[2:][:-1] is not "":
-            offset_coords = result[2:][:-1].split(" ")
-            output.offset_x = int(round(float(offset_coords[0])))
-            output.offset_y = int(round(float(offset_coords[1]))) + 15
+        if trim_x != None:
+            output.offset_x = int(round(trim_x))
+            output.offset_y = int(round(trim_y)) + 15
+
+        output.offset_x += dx
+        output.offset_y += dy
+
+        output.offset_y -= self.renderer.lens_shift_y_offset
+        output.offset_y += self.renderer.y_offset
+
+        output.offset_x += frame.offset_x
+        output.offset_y += frame.offset_y
 
         return output
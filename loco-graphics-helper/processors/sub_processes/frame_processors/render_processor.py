@@ -19,16 +19,37 @@ class RenderProcessor(SubProcessor):
         self.renderer = renderer
 
     def process(self, frame, callback):
-        frame.prepare_scene()
+        frame.prepare_scene(self.renderer.visibility_manager)
 
         meta_render_output_folder = frame.task.get_temporary_output_folder()
         meta_render_output_file = frame.get_meta_render_output_file_name("aa_")
+        naa_meta_render_output = frame.get_meta_render_output_file_name("naa_")
         render_output = frame.get_base_render_output_path()
 
+        # Render a meta image without anti-aliasing that we can use as a mask for the alpha later
+        # We can skip this step if the image is oversized as that will already render an un-aliased tile-index image
+        needs_aliased_silhouette = frame.maintain_aliased_silhouette and not frame.oversized
+
+        # The compositor can write the silhouette from the main render, so the frame only has to be rendered once
+        silhouette_from_main_render = needs_aliased_silhouette and self.renderer.silhouette_from_main_render and \
+            self.renderer.has_silhouette_output()
+
+        # The tile indices of multi-tile objects can be reconstructed from the depth, which replaces the aliased tile
+        # index render. The silhouette is used as its mask
+        depth_tile_indices = frame.oversized and self.renderer.uses_depth_tile_indices()
+
+        silhouette_output = None
+        if silhouette_from_main_render or depth_tile_indices:
+            silhouette_output = naa_meta_render_output
+
+        depth_output = None
+        if depth_tile_indices:
+            depth_output = frame.get_meta_render_output_file_name("depth_")
+
         # Render the main still and meta image
         self.renderer.set_layer(frame.layer)
         self.renderer.set_meta_output_path(
-            meta_render_output_folder, meta_render_output_file)
+            meta_render_output_folder, meta_render_output_file, silhouette_output, depth_output)
         self.renderer.set_output_path(render_output)
 
         self.renderer.set_override_material(None)
@@ -40,16 +61,21 @@ class RenderProcessor(SubProcessor):
 
         self.renderer.set_animation_frame(frame.animation_frame_index)
 
+        # The region is planned once the scene is set up for the frame, the other renders of the frame reuse it
+        if self.renderer.render_region_planner != None:
+            frame.render_region = self.renderer.render_region_planner.plan(
+                frame)
+        self.renderer.set_render_region(frame.render_region)
+
         self.renderer.render(True, callback)
 
-        # Render a meta image without anti-aliasing that we can use as a mask for the alpha later
-        # We can skip this step if the image is oversized as that will already render an un-aliased tile-index image
-        if frame.maintain_aliased_silhouette and not frame.oversized:
+        if depth_tile_indices:
+            frame.camera_projection = self.renderer.get_camera_projection()
+
+        if needs_aliased_silhouette and not silhouette_from_main_render:
             self.renderer.set_aa(False)
             self.renderer.set_layer(frame.layer)
 
-            naa_meta_render_output = frame.get_meta_render_output_file_name(
-                "naa_")
             self.renderer.set_meta_output_path(
                 meta_render_output_folder, naa_meta_render_output)
 
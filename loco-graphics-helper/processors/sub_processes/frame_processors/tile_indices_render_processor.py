@@ -27,12 +27,14 @@ class TileIndicesRenderProcessor(SubProcessor):
             return False
 
         if self.with_anti_aliasing:
-            return frame.use_anti_aliasing
+            # The anti-aliased tile indices can be derived from the aliased ones instead
+            return frame.use_anti_aliasing and self.renderer.anti_aliased_tile_indices != "DERIVE"
         else:
-            return True
+            # The aliased tile indices can be reconstructed from the depth of the main render instead
+            return not self.renderer.uses_depth_tile_indices()
 
     def process(self, frame, callback):
-        frame.prepare_scene()
+        frame.prepare_scene(self.renderer.visibility_manager)
 
         output_suffix = "ti_"
 
@@ -57,5 +59,6 @@ class TileIndicesRenderProcessor(SubProcessor):
             self.renderer.world_position_material)
 
         self.renderer.set_animation_frame(frame.animation_frame_index)
+        self.renderer.set_render_region(frame.render_region)
 
         self.renderer.render(False, callback)
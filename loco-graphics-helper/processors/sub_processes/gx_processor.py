@@ -13,6 +13,7 @@ import os
 import subprocess
 
 from .sub_processor import SubProcessor
+from ...timings import count_subprocess, trace_span
 
 # Processor for creating the GX image .dat file
 
@@ -35,8 +36,10 @@ class GXProcessor(SubProcessor):
         gx_file_path = os.path.join(
             task.get_output_folder(), "images.dat")
 
-        result = str(subprocess.check_output(
-            "gxc build \"" + gx_file_path + "\" \"" + manifest_file_path + "\"", shell=True))
+        count_subprocess()
+        with trace_span("gxc build", "gx"):
+            result = str(subprocess.check_output(
+                "gxc build \"" + gx_file_path + "\" \"" + manifest_file_path + "\"", shell=True))
 
         if not os.path.exists(gx_file_path):
             raise Exception(
@@ -54,8 +57,10 @@ class GXProcessor(SubProcessor):
         opengraphics_repo_path = os.path.abspath(
             addon_prefs.opengraphics_directory)
 
-        result = str(subprocess.check_output(
-            "node build.mjs", shell=True, cwd=opengraphics_repo_path))
+        count_subprocess()
+        with trace_span("Asset pack build", "gx"):
+            result = str(subprocess.check_output(
+                "node build.mjs", shell=True, cwd=opengraphics_repo_path))
 
         parkap_file_name = "openrct2.graphics.opengraphics.parkap"
         parkap_file = os.path.abspath(os.path.join(
@@ -15,6 +15,7 @@ import shutil
 import zipfile
 
 from .sub_processor import SubProcessor
+from ...timings import trace_span
 
 # Processor for creating a .parkobj file
 
@@ -101,7 +102,8 @@ class ParkobjProcessor(SubProcessor):
         parkobj_file_name = info.get("object_id") + ".parkobj"
         parkobj_file = os.path.join(file_path, parkobj_file_name)
 
-        with zipfile.ZipFile(parkobj_file, 'w', zipfile.ZIP_DEFLATED) as parkobj:
+        with trace_span("parkobj zip", "parkobj", {"file": parkobj_file_name}), \
+                zipfile.ZipFile(parkobj_file, 'w', zipfile.ZIP_DEFLATED) as parkobj:
             parkobj.write(os.path.join(
                 file_path, "object.json"), "object.json")
 
@@ -115,11 +117,18 @@ class ParkobjProcessor(SubProcessor):
                 parkobj.write(os.path.join(
                     file_path, "images.dat"), "images.dat")
             else:
+                # Deduplicated sprites share their image file, which is only added once
+                written_paths = set()
+
                 for image in info.get("images"):
 
                     if isinstance(image, str):
                         continue
 
+                    if image.get("path") in written_paths:
+                        continue
+                    written_paths.add(image.get("path"))
+
                     image_file = os.path.join(file_path, image.get("path"))
 
                     if not os.path.exists(image_file):
@@ -0,0 +1,45 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+from .sub_processor import SubProcessor
+from ...render_cache import FrameFingerprinter, RenderCache
+
+# Processor for storing the fingerprints of the rendered frames, so the next render can skip the unchanged ones
+
+
+class RenderCacheProcessor(SubProcessor):
+    def __init__(self, renderer):
+        super().__init__()
+
+        self.renderer = renderer
+
+    def applicable(self, master_context):
+        return self.renderer.incremental_rendering
+
+    def process(self, master_context, callback=None):
+        task = master_context.task
+
+        outputs_by_index = {}
+        for output in task.output_info:
+            outputs_by_index[output.index] = output
+
+        # The frames were not fingerprinted yet when their sprites were rendered by render shards
+        fingerprinter = FrameFingerprinter(self.renderer)
+
+        frames = []
+        for frame in task.frames:
+            if frame.fingerprint == None:
+                frame.fingerprint = fingerprinter.get_fingerprint(frame)
+
+            outputs = [outputs_by_index[index]
+                       for index in frame.output_indices if index in outputs_by_index]
+            if len(outputs) == len(frame.output_indices):
+                frames.append((frame.fingerprint, outputs))
+
+        RenderCache(task.get_output_folder()).save(frames)
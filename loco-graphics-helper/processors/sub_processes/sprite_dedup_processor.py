@@ -0,0 +1,100 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import hashlib
+import os
+
+from .sub_processor import SubProcessor
+from ...imaging.png import read_png, to_8_bit
+
+shared_sprite_prefix = "shared_"
+
+# Processor for storing identical sprites only once. Sprites with the same pixels are moved to a shared file named
+# after their content, which all their manifest entries point to. Every entry keeps its own offsets. gxc has no way
+# to refer to another entry, so the GX file still stores the pixels of every sprite.
+
+
+class SpriteDedupProcessor(SubProcessor):
+    def __init__(self, renderer):
+        super().__init__()
+
+        self.renderer = renderer
+
+    def applicable(self, master_context):
+        return self.renderer.deduplicate_sprites
+
+    def process(self, master_context, callback=None):
+        task = master_context.task
+        sprites_folder = os.path.join(task.get_output_folder(), "sprites")
+
+        groups = {}
+        for output in task.output_info:
+            if output.path == "" or not os.path.exists(output.path):
+                continue
+            groups.setdefault(self._get_content_hash(
+                output.path), []).append(output)
+
+        removed_files = 0
+        removed_bytes = 0
+
+        for content_hash, outputs in groups.items():
+            if len(outputs) < 2:
+                continue
+
+            shared_path = os.path.join(sprites_folder, "{}{}.png".format(
+                shared_sprite_prefix, content_hash[:16]))
+
+            # Shared files are named after their content, so sprites that are rendered again never overwrite them
+            for output in outputs:
+                if output.path == shared_path:
+                    continue
+
+                if not os.path.exists(shared_path):
+                    os.replace(output.path, shared_path)
+                elif os.path.exists(output.path) and not self._is_shared(output.path):
+                    removed_bytes += os.path.getsize(output.path)
+                    removed_files += 1
+                    os.remove(output.path)
+
+                output.path = shared_path
+
+        self._remove_unused_shared_sprites(task, sprites_folder)
+
+        print("Sprite deduplication: {} sprites use {} unique images, removed {} duplicate files ({} bytes)".format(
+            len(task.output_info), len(groups), removed_files, removed_bytes))
+
+    # Hashes the pixels rather than the file, so metadata written by ImageMagick does not hide duplicates
+    def _get_content_hash(self, path):
+        hash = hashlib.sha1()
+        try:
+            image = to_8_bit(read_png(path))
+        except Exception:
+            with open(path, "rb") as image_file:
+                hash.update(image_file.read())
+            return hash.hexdigest()
+
+        # The color of fully transparent pixels does not matter
+        image[image[:, :, 3] == 0] = 0
+
+        hash.update("{}x{};".format(image.shape[1], image.shape[0]).encode())
+        hash.update(image.tobytes())
+        return hash.hexdigest()
+
+    def _is_shared(self, path):
+        return os.path.basename(path).startswith(shared_sprite_prefix)
+
+    # Shared files from earlier renders that no sprite refers to anymore
+    def _remove_unused_shared_sprites(self, task, sprites_folder):
+        used_paths = set(os.path.normcase(output.path)
+                         for output in task.output_info)
+
+        for file_name in os.listdir(sprites_folder):
+            path = os.path.join(sprites_folder, file_name)
+            if self._is_shared(path) and not os.path.normcase(path) in used_paths:
+                os.remove(path)
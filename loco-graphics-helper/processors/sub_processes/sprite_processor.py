@@ -16,12 +16,16 @@ import zipfile
 from collections import OrderedDict
 
 from .sub_processor import SubProcessor
+from .frame_pipeline import FramePipeline
 
 from .frame_processors.post_processor import PostProcessor
 from .frame_processors.merge_masks_processor import MergeMasksProcessor
 from .frame_processors.render_processor import RenderProcessor
 from .frame_processors.tile_indices_render_processor import TileIndicesRenderProcessor
 from ...renderer import Renderer
+from ...magick_command import MagickBatch
+from ...render_cache import FrameFingerprinter, RenderCache
+from ...frame_scheduler import FrameScheduler
 
 # Context container for the render task process
 
@@ -42,17 +46,27 @@ class SpriteProcessor(SubProcessor):
         super().__init__()
         self.renderer = renderer
 
-        self.processes = [
+        self.render_processes = [
             RenderProcessor(self.renderer),
             TileIndicesRenderProcessor(self.renderer, False),
-            TileIndicesRenderProcessor(self.renderer, True),
+            TileIndicesRenderProcessor(self.renderer, True)
+        ]
+
+        # Processes that only work on the rendered files, these can run in the background when pipelining
+        self.post_processes = [
             MergeMasksProcessor(self.renderer),
             PostProcessor(self.renderer)
         ]
 
+        self.processes = self.render_processes + self.post_processes
+
         self.prioritize_final_output = True
         self.cleanup_afterwards = True
 
+        self.frame_pipeline = None
+
+        self.frame_scheduler = FrameScheduler()
+
     def process(self, master_context, callback):
         def finalize(task_process_context):
             self._finalize(task_process_context)
@@ -60,22 +74,73 @@ class SpriteProcessor(SubProcessor):
             if callback != None:
                 callback()
 
-        if not os.path.exists(master_context.task.get_output_folder()):
-            os.mkdir(master_context.task.get_output_folder())
+        self.renderer.validate_compositor(master_context.task.frames)
+
+        # Render shards may create the folders at the same time
+        os.makedirs(os.path.join(
+            master_context.task.get_output_folder(), "sprites"), exist_ok=True)
 
-        if not os.path.exists(os.path.join(master_context.task.get_output_folder(), "sprites")):
-            os.mkdir(os.path.join(
-                master_context.task.get_output_folder(), "sprites"))
+        if self.renderer.pipelined_post_processing:
+            self.frame_pipeline = FramePipeline(
+                self.renderer, self.renderer.post_processing_workers)
+        elif self.renderer.magick_execution != "SEPARATE":
+            self.renderer.magick_batch = MagickBatch(self.renderer.magick_path, os.path.join(
+                master_context.task.get_temporary_output_folder(), "batch.mgk"), self.renderer.magick_execution == "STDIN")
+
+        if self.renderer.schedule_frames:
+            self._schedule_frames(master_context.task)
+
+        if self.renderer.incremental_rendering:
+            self._restore_cached_frames(master_context.task)
 
         task_process_context = SpriteProcessContext(master_context, finalize)
 
         self._step(task_process_context)
 
+    # Renders the frames in the order that needs the fewest scene changes, the output indices stay the same
+    def _schedule_frames(self, task):
+        task.frames = self.frame_scheduler.schedule(task.frames)
+
+        print("Frame scheduling: {} scene state changes instead of {}, saved {}".format(
+            self.frame_scheduler.transitions_after, self.frame_scheduler.transitions_before,
+            self.frame_scheduler.transitions_saved))
+
+    # Restores the sprites of the frames that are unchanged since the previous build, those frames are skipped
+    def _restore_cached_frames(self, task):
+        # Fingerprints are taken before rendering starts, as rendering temporarily changes the scene settings
+        fingerprinter = FrameFingerprinter(self.renderer)
+        render_cache = RenderCache(task.get_output_folder())
+
+        for frame in task.frames:
+            frame.fingerprint = fingerprinter.get_fingerprint(frame)
+
+            outputs = render_cache.get_outputs(frame.fingerprint)
+            if outputs != None:
+                frame.output_info = outputs
+                frame.cached = True
+
+        cached_frames = len([frame for frame in task.frames if frame.cached])
+        print("Skipping {} of {} frames that are unchanged since the last render".format(
+            cached_frames, len(task.frames)))
+
     def _step(self, task_process_context):
         while task_process_context.sub_process_index < len(self.processes) and task_process_context.frame_index < len(task_process_context.task.frames):
             current_process = self.processes[task_process_context.sub_process_index]
             current_frame = task_process_context.task.frames[task_process_context.frame_index]
 
+            if current_frame.cached:
+                self._proceed_task_process_context(task_process_context)
+                continue
+
+            # Hand the post processing of the frame to the pipeline and move on to rendering the next frame
+            if self.frame_pipeline != None and current_process in self.post_processes:
+                self.frame_pipeline.submit(current_frame, [
+                    process for process in self.post_processes if process.applicable(current_frame)])
+
+                task_process_context.sub_process_index = len(self.processes) - 1
+                self._proceed_task_process_context(task_process_context)
+                continue
+
             is_async = current_process.is_async
             frame_process_callback = None
 
@@ -87,7 +152,8 @@ class SpriteProcessor(SubProcessor):
 
             print("Starting process: {}".format(
                 type(current_process).__name__))
-            current_process.process(current_frame, frame_process_callback)
+            with task_process_context.task.timings.measure_frame(current_frame, type(current_process).__name__):
+                current_process.process(current_frame, frame_process_callback)
             print("Finished process: {}".format(
                 type(current_process).__name__))
 
@@ -146,10 +212,36 @@ class SpriteProcessor(SubProcessor):
             current_process = self.processes[task_process_context.sub_process_index]
             current_frame = task_process_context.task.frames[task_process_context.frame_index]
 
-            if current_process.applicable(current_frame):
+            if not current_frame.cached and current_process.applicable(current_frame):
                 break
 
+    def shutdown(self):
+        if self.frame_pipeline != None:
+            self.frame_pipeline.shutdown()
+            self.frame_pipeline = None
+
+        if self.renderer.magick_batch != None:
+            self.renderer.magick_batch.close()
+            self.renderer.magick_batch = None
+
     def _finalize(self, task_process_context):
+        if self.frame_pipeline != None:
+            self.frame_pipeline.finish()
+            self.frame_pipeline = None
+
+        if self.renderer.render_region_planner != None:
+            print("Render regions: rendered {}% of the frame pixels".format(
+                round(self.renderer.render_region_planner.get_rendered_fraction() * 100)))
+
+        # Run the queued magick commands before the temporary files are removed
+        self.renderer.flush_magick_batch()
+        self.renderer.magick_batch = None
+
+        # Collect the sprites in frame order, regardless of the order in which the frames were rendered or finished
+        task = task_process_context.task
+        for frame in sorted(task.frames, key=lambda frame: frame.frame_index):
+            task.output_info += frame.output_info
+
         # Clean up
         if self.cleanup_afterwards:
             self._cleanup(task_process_context)
@@ -17,5 +17,13 @@ class SubProcessor:
     def applicable(self, context):
         return True
 
+    # Called on the main thread before the process is handed to a post processing worker
+    def prepare(self, context):
+        pass
+
+    # Stops anything the process left running when the render is aborted
+    def shutdown(self):
+        pass
+
     def process(self, context, callback=None):
         print("Invalid processor. Processor does not implement a process method.")
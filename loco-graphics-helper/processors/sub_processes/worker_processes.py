@@ -0,0 +1,121 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import os
+import pickle
+import queue
+import subprocess
+
+from ...timings import count_subprocess, trace_span
+
+worker_script_path = os.path.join(os.path.dirname(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__)))), "post_processing_worker.py")
+
+# Seconds a worker gets to exit after its input is closed before it is killed
+worker_exit_timeout = 5
+
+# Long-lived Python processes that run the CPU heavy parts of post processing, like dithering, outside of Blender's
+# interpreter. Blender's interpreter can not start multiprocessing workers reliably, so the workers are started as
+# plain scripts with the Python that ships with Blender and are fed jobs over stdin, like the persistent magick process.
+# Every job is handed to a free worker, the calling thread waits for the result without holding the interpreter lock.
+
+
+class WorkerProcesses:
+    def __init__(self, python_path, count):
+        self.python_path = python_path
+
+        self.processes = []
+        self.idle = queue.Queue()
+
+        # Set when a worker stopped unexpectedly, the remaining jobs fail with it
+        self.error = None
+
+        try:
+            for _ in range(count):
+                process = self._start_process()
+                self.processes.append(process)
+                self.idle.put(process)
+        except Exception:
+            self.close(True)
+            raise
+
+    # Runs the function of the worker script with the arguments in a free worker and returns its result. The
+    # arguments and the result are pickled, so they have to be plain values and NumPy arrays
+    def run(self, function_name, *arguments):
+        process = self.idle.get()
+        try:
+            if self.error != None:
+                raise Exception(self.error)
+
+            with trace_span(function_name, "worker", {"pid": process.pid}):
+                try:
+                    pickle.dump((function_name, arguments),
+                                process.stdin, pickle.HIGHEST_PROTOCOL)
+                    process.stdin.flush()
+                    status, result = pickle.load(process.stdout)
+                except (OSError, EOFError, pickle.UnpicklingError) as e:
+                    self.error = "Post processing worker {} stopped unexpectedly: {}".format(
+                        process.pid, e)
+                    raise Exception(self.error)
+        finally:
+            self.idle.put(process)
+
+        if status == "error":
+            raise Exception(
+                "Post processing worker {} failed:\n{}".format(process.pid, result))
+
+        return result
+
+    # Stops the workers. Workers finish their current job first, unless they are killed
+    def close(self, kill=False):
+        for process in self.processes:
+            if kill:
+                process.kill()
+            else:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        for process in self.processes:
+            try:
+                process.wait(worker_exit_timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+            process.stdout.close()
+            if not process.stdin.closed:
+                try:
+                    process.stdin.close()
+                except OSError:
+                    pass
+
+        self.processes = []
+
+    def _start_process(self):
+        count_subprocess()
+        process = subprocess.Popen(
+            [self.python_path, worker_script_path], stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+
+        # The worker reports when it is ready, or why it could not load the post processing code
+        try:
+            status, result = pickle.load(process.stdout)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            status, result = "error", "The worker exited before it was ready."
+
+        if status != "ready":
+            process.kill()
+            process.wait()
+            process.stdin.close()
+            process.stdout.close()
+            raise Exception("Could not start a post processing worker with {}:\n{}".format(
+                self.python_path, result))
+
+        return process
@@ -53,6 +53,33 @@ class GeneralProperties(bpy.types.PropertyGroup):
         description="The image is anti-aliased against the background, but is masked using the aliased silhoutte.",
         default=False)
 
+    silhouette_from_main_render = bpy.props.BoolProperty(
+        name="Single Render Silhouette",
+        description="Take the aliased silhouette from the anti-aliased render by thresholding its alpha, instead of rendering every frame a second time without anti-aliasing. Faster, but the silhouette can differ from the aliased render along the edges.",
+        default=False)
+
+    tile_indices_source = bpy.props.EnumProperty(
+        name="Tile Indices",
+        items=(
+            ("RENDER", "Render",
+             "Render the tile index mask of multi-tile objects with the WorldPosition material.", 1),
+            ("DEPTH", "From Depth",
+             "Reconstruct the tile index mask from the depth of the main render, saves a render per frame. Pixels close to a tile border can end up on the neighbouring tile. Requires the scene to be repaired once.", 2)
+        ),
+        default="RENDER")
+
+    anti_aliased_tile_indices = bpy.props.EnumProperty(
+        name="Anti-Aliased Tile Indices",
+        items=(
+            ("RENDER", "Render",
+             "Render the anti-aliased tile index mask of multi-tile objects.", 1),
+            ("DERIVE", "Derive",
+             "Derive the anti-aliased tile index mask from the aliased one, saves a render per frame. Edge pixels can end up on a different tile than in the rendered mask, use Derive and Validate to check.", 2),
+            ("VALIDATE", "Derive and Validate",
+             "Derive the mask, but also render it and report the pixels that differ. Meant for debugging.", 3)
+        ),
+        default="RENDER")
+
     out_start_index = bpy.props.IntProperty(
         name="Output Starting Index",
         description="Number to start counting from for the output file names.",
@@ -137,6 +164,104 @@ class GeneralProperties(bpy.types.PropertyGroup):
         description="Copy the generated .parkobj file to the ORCT2 objects folder. Linking your OpenRCT2 Documents folder is required in the add-on preferences.",
         default=False)
 
+    post_processing_backend = bpy.props.EnumProperty(
+        name="Post Processing",
+        items=(
+            ("MAGICK", "ImageMagick",
+             "Dither the sprites by calling ImageMagick for every frame.", 1),
+            ("NUMPY", "In-process",
+             "Dither the sprites inside Blender using NumPy. Avoids starting ImageMagick processes for every frame.", 2)
+        ),
+        default="MAGICK")
+
+    validate_post_processing = bpy.props.BoolProperty(
+        name="Validate against ImageMagick",
+        description="Also dither every frame with ImageMagick and report the pixels that differ from the in-process result. Slow, meant for debugging.",
+        default=False)
+
+    # The dither caches the nearest palette color per cell of 4x4x4 color values. Without a lookup table the color
+    # nearest to the first pixel that falls in a cell is used for the whole cell, like ImageMagick does. With a lookup
+    # table it is the color nearest to the center of the cell, which is known up front and does not depend on the
+    # order of the pixels. A pixel can then get a color up to about 7 color values farther away than its exact nearest
+    # color, so the sprites are not identical with and without the tables
+    palette_lookup_tables = bpy.props.BoolProperty(
+        name="Use Palette Lookup Tables",
+        description="Find the nearest palette colors using precomputed lookup tables. Much faster, but a pixel can get a palette color that is a few color values farther away than the one ImageMagick picks. The tables are cached on disk.",
+        default=True)
+
+    magick_execution = bpy.props.EnumProperty(
+        name="ImageMagick Execution",
+        items=(
+            ("SEPARATE", "Per Command",
+             "Start a magick process for every frame, layer and tile.", 1),
+            ("SCRIPT", "Batch Script",
+             "Collect all magick commands of a render into a script and run it with a single magick process.", 2),
+            ("STDIN", "Persistent Process",
+             "Stream all magick commands of a render to one long-lived magick process.", 3)
+        ),
+        default="SEPARATE")
+
+    pipelined_post_processing = bpy.props.BoolProperty(
+        name="Pipelined Post Processing",
+        description="Keep rendering while finished frames are merged and post processed in the background.",
+        default=False)
+
+    post_processing_workers = bpy.props.IntProperty(
+        name="Workers",
+        description="Maximum number of frames that are post processed at the same time. The NumPy post processing starts a Python process for every worker.",
+        default=4,
+        min=1,
+        max=64)
+
+    auto_resolution = bpy.props.BoolProperty(
+        name="Automatic Resolution",
+        description="Render at the smallest resolution that fits the objects in every frame. Changes the render resolution of the scene while rendering, it is restored afterwards.",
+        default=False)
+
+    render_object_region = bpy.props.BoolProperty(
+        name="Render Object Region Only",
+        description="Only render the part of the frame covered by the bounding box of the rendered objects, the rest of every render is left empty.",
+        default=False)
+
+    render_region_margin = bpy.props.IntProperty(
+        name="Margin",
+        description="Pixels to render around the projected bounding box, covers the anti-aliasing filter.",
+        default=4,
+        min=0,
+        max=64)
+
+    schedule_frames = bpy.props.BoolProperty(
+        name="Minimize Scene Changes",
+        description="Render the frames grouped by object, layer and animation frame, so the scene has to be updated less often. The sprites keep their indices.",
+        default=True)
+
+    incremental_rendering = bpy.props.BoolProperty(
+        name="Skip Unchanged Frames",
+        description="Only render the frames whose objects, materials, lights or settings changed since the last render to the output folder. The sprites and offsets of the other frames are reused.",
+        default=False)
+
+    deduplicate_sprites = bpy.props.BoolProperty(
+        name="Deduplicate Sprites",
+        description="Store sprites with identical pixels in one shared_<hash>.png file that all their entries in the sprites manifest point to. Only makes the sprites folder and a .parkobj built without GX smaller, the GX file (images.dat) still stores every sprite.",
+        default=False)
+
+    render_shards = bpy.props.IntProperty(
+        name="Render Processes",
+        description="Number of background Blender processes to split the frames over. The scene is saved to a temporary copy that the processes render from.",
+        default=1,
+        min=1,
+        max=64)
+
+    shard_mode = bpy.props.EnumProperty(
+        name="Frame Distribution",
+        items=(
+            ("CONTIGUOUS", "Contiguous",
+             "Give every process a consecutive block of frames.", 1),
+            ("INTERLEAVED", "Interleaved",
+             "Deal the frames out to the processes in turn, evens out the work when some angles are more expensive.", 2)
+        ),
+        default="CONTIGUOUS")
+
 
 def register_general_properties():
     bpy.types.Scene.loco_graphics_helper_general_properties = bpy.props.PointerProperty(
@@ -98,6 +98,10 @@ class GraphicsHelperPanel(bpy.types.Panel):
             row = box.row()
             row.prop(properties, "maintain_aliased_silhouette")
 
+            if properties.maintain_aliased_silhouette:
+                row = box.row()
+                row.prop(properties, "silhouette_from_main_render")
+
         row = layout.row()
         row.separator()
 
@@ -118,6 +122,53 @@ class GraphicsHelperPanel(bpy.types.Panel):
                                           index=i, text=details["title"])
                 i += 1
 
+        row = layout.row()
+        row.label("Post Processing:")
+
+        row = layout.row()
+        row.prop(properties, "post_processing_backend", text="")
+
+        if properties.post_processing_backend == "NUMPY":
+            box = layout.box()
+            box.prop(properties, "palette_lookup_tables")
+            box.prop(properties, "validate_post_processing")
+
+        row = layout.row()
+        row.prop(properties, "magick_execution", text="")
+
+        row = layout.row()
+        row.prop(properties, "pipelined_post_processing")
+
+        if properties.pipelined_post_processing:
+            box = layout.box()
+            box.prop(properties, "post_processing_workers")
+
+        row = layout.row()
+        row.prop(properties, "auto_resolution")
+
+        row = layout.row()
+        row.prop(properties, "render_object_region")
+
+        if properties.render_object_region:
+            box = layout.box()
+            box.prop(properties, "render_region_margin")
+
+        row = layout.row()
+        row.prop(properties, "schedule_frames")
+
+        row = layout.row()
+        row.prop(properties, "incremental_rendering")
+
+        row = layout.row()
+        row.prop(properties, "deduplicate_sprites")
+
+        row = layout.row()
+        row.prop(properties, "render_shards")
+
+        if properties.render_shards > 1:
+            box = layout.box()
+            box.prop(properties, "shard_mode")
+
         row = layout.row()
         row.label("Object Type:")
 
@@ -166,6 +217,13 @@ class GraphicsHelperPanel(bpy.types.Panel):
         row.prop(properties, "object_width")
         row.prop(properties, "object_length")
 
+        if properties.object_width > 1 or properties.object_length > 1:
+            row = layout.row()
+            row.prop(general_properties, "tile_indices_source", text="")
+
+            row = layout.row()
+            row.prop(general_properties, "anti_aliased_tile_indices", text="")
+
         row = layout.row()
         if properties.object_width > 1 or properties.object_length > 1:
             row.prop(properties, "invert_tile_positions")
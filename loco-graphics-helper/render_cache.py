@@ -0,0 +1,299 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import bpy
+import hashlib
+import json
+import os
+
+import numpy as np
+
+from .processors.sub_processes.frame_processors.post_processor import Output
+
+# Incremental rendering. Every frame gets a fingerprint of everything that affects its sprites, the fingerprints and
+# the sprites they produced are stored in a manifest in the output folder. Frames whose fingerprint is unchanged and
+# whose sprite files are untouched since the last build are not rendered again.
+
+manifest_file_name = "render_cache.json"
+manifest_version = 1
+
+# Frame attributes that affect the rendered sprites
+frame_attributes = [
+    "frame_index", "output_indices", "view_angle", "bank_angle", "vertical_angle", "mid_angle", "width", "length",
+    "invert_tile_positions", "recolorables", "layer", "animation_frame_index", "occlusion_layers",
+    "use_anti_aliasing", "anti_alias_with_background", "maintain_aliased_silhouette", "cast_shadows", "offset_x",
+    "offset_y"
+]
+
+# Renderer settings that affect the post processed sprites
+renderer_attributes = [
+    "floyd_steinberg_diffusion", "lens_shift_y_offset", "y_offset", "post_processing_backend",
+    "palette_lookup_tables", "silhouette_from_main_render", "tile_indices_source", "anti_aliased_tile_indices"
+]
+
+render_settings_attributes = [
+    "resolution_x", "resolution_y", "resolution_percentage", "use_antialiasing", "antialiasing_samples",
+    "pixel_filter_type", "filter_size", "alpha_mode", "use_shadows", "use_raytrace"
+]
+
+
+# Hashes the simple properties of a Blender struct, such as a material, lamp or camera
+def _hash_rna(hash, struct):
+    if struct == None:
+        hash.update(b"None")
+        return
+
+    for prop in struct.bl_rna.properties:
+        if prop.identifier == "rna_type" or prop.type in ("POINTER", "COLLECTION"):
+            continue
+
+        value = getattr(struct, prop.identifier, None)
+        if prop.type in ("FLOAT", "INT", "BOOLEAN") and prop.array_length > 0:
+            value = list(value)
+        elif prop.type == "ENUM" and prop.is_enum_flag:
+            value = sorted(value)
+
+        hash.update("{}={};".format(prop.identifier, value).encode())
+
+
+def _hash_matrix(hash, matrix):
+    hash.update(np.array(matrix, np.float64).tobytes())
+
+
+class FrameFingerprinter:
+    def __init__(self, renderer):
+        self.renderer = renderer
+
+        # Objects, meshes and materials are shared by many frames, their hashes are only computed once per render
+        self.object_hashes = {}
+        self.material_hashes = {}
+        self.scene_hash = None
+
+    def get_fingerprint(self, frame):
+        hash = hashlib.sha1()
+
+        for attribute in frame_attributes:
+            hash.update("{}={};".format(
+                attribute, getattr(frame, attribute)).encode())
+
+        hash.update(self._get_palette_hash(frame.base_palette))
+        for i in range(frame.recolorables):
+            hash.update(self._get_palette_hash(
+                self.renderer.palette_manager.get_recolor_palette(i)))
+
+        hash.update(self._get_scene_hash())
+
+        # Every object that ends up in the render, with the same visibility rules the frame is rendered with
+        objects = self.renderer.visibility_manager.get_rendered_objects(
+            frame.target_object, frame.layer)
+
+        for object in sorted(objects, key=lambda o: o.name):
+            # The camera and lamps move with the rig, their placement relative to the rig is part of the scene hash
+            if object.type in ("CAMERA", "LAMP"):
+                hash.update("{}={};".format(object.type, object.name).encode())
+                continue
+
+            hash.update(self._get_object_hash(object))
+
+        return hash.hexdigest()
+
+    def _get_palette_hash(self, palette):
+        if palette == None:
+            return b"None"
+        return hashlib.sha1(palette.get_colors().tobytes()).digest()
+
+    # Hashes the render settings, the camera and the lamps, which are the same for all frames
+    def _get_scene_hash(self):
+        if self.scene_hash != None:
+            return self.scene_hash
+
+        hash = hashlib.sha1()
+        hash.update("version={};".format(manifest_version).encode())
+
+        for attribute in renderer_attributes:
+            hash.update("{}={};".format(
+                attribute, getattr(self.renderer, attribute)).encode())
+
+        render = self.renderer.context.scene.render
+        for attribute in render_settings_attributes:
+            hash.update("{}={};".format(
+                attribute, getattr(render, attribute, None)).encode())
+
+        _hash_rna(hash, self.renderer.context.scene.world)
+
+        for object in sorted(self.renderer.context.scene.objects, key=lambda o: o.name):
+            if not object.type in ("CAMERA", "LAMP"):
+                continue
+
+            # The rig is rotated for every frame, so only the placement relative to the rig is fixed. Whether they are
+            # rendered differs per frame and is part of the frame hash
+            hash.update(object.name.encode())
+            _hash_matrix(hash, object.matrix_local)
+            _hash_rna(hash, object.data)
+
+        self.scene_hash = hash.digest()
+        return self.scene_hash
+
+    # Hashes the placement, data, modifiers, animation and materials of an object
+    def _get_object_hash(self, object):
+        if object.name in self.object_hashes:
+            return self.object_hashes[object.name]
+
+        hash = hashlib.sha1()
+        hash.update(object.name.encode())
+        hash.update(object.type.encode())
+        _hash_matrix(hash, object.matrix_world)
+        _hash_rna(hash, object.loco_graphics_helper_object_properties)
+
+        if object.type == "MESH":
+            mesh = object.data
+
+            coordinates = np.empty(len(mesh.vertices) * 3, np.float32)
+            mesh.vertices.foreach_get("co", coordinates)
+            hash.update(coordinates.tobytes())
+
+            polygon_vertices = np.empty(len(mesh.loops), np.int32)
+            mesh.loops.foreach_get("vertex_index", polygon_vertices)
+            hash.update(polygon_vertices.tobytes())
+
+            material_indices = np.empty(len(mesh.polygons), np.int32)
+            mesh.polygons.foreach_get("material_index", material_indices)
+            hash.update(material_indices.tobytes())
+
+            for uv_layer in mesh.uv_layers:
+                uvs = np.empty(len(uv_layer.data) * 2, np.float32)
+                uv_layer.data.foreach_get("uv", uvs)
+                hash.update(uvs.tobytes())
+        elif object.data != None:
+            # Curves, text and other object data are hashed by their properties
+            _hash_rna(hash, object.data)
+
+        for modifier in object.modifiers:
+            _hash_rna(hash, modifier)
+
+        for slot in object.material_slots:
+            hash.update(self._get_material_hash(slot.material))
+
+        # Keyframes, so animated objects are rendered again when their animation changes
+        if object.animation_data != None and object.animation_data.action != None:
+            for fcurve in object.animation_data.action.fcurves:
+                hash.update("{}[{}]".format(
+                    fcurve.data_path, fcurve.array_index).encode())
+                for keyframe in fcurve.keyframe_points:
+                    hash.update("{};{};{};".format(
+                        tuple(keyframe.co), tuple(keyframe.handle_left), tuple(keyframe.handle_right)).encode())
+
+        self.object_hashes[object.name] = hash.digest()
+        return self.object_hashes[object.name]
+
+    def _get_material_hash(self, material):
+        if material == None:
+            return b"None"
+
+        if material.name in self.material_hashes:
+            return self.material_hashes[material.name]
+
+        hash = hashlib.sha1()
+        _hash_rna(hash, material)
+
+        for texture_slot in material.texture_slots:
+            if texture_slot == None or texture_slot.texture == None:
+                continue
+
+            _hash_rna(hash, texture_slot)
+            _hash_rna(hash, texture_slot.texture)
+
+            # Image textures are only referenced by path, so their modification time is hashed as well
+            image = getattr(texture_slot.texture, "image", None)
+            if image != None:
+                image_path = bpy.path.abspath(image.filepath)
+                hash.update(image_path.encode())
+                if os.path.exists(image_path):
+                    hash.update(str(os.path.getmtime(image_path)).encode())
+
+        self.material_hashes[material.name] = hash.digest()
+        return self.material_hashes[material.name]
+
+
+# The manifest of the frames rendered by the previous build of an output folder
+class RenderCache:
+    def __init__(self, output_folder):
+        self.output_folder = output_folder
+        self.path = os.path.join(output_folder, manifest_file_name)
+
+        self.frames = self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+
+        try:
+            with open(self.path, "r") as manifest_file:
+                manifest = json.load(manifest_file)
+        except (OSError, ValueError):
+            return {}
+
+        if manifest.get("version") != manifest_version:
+            return {}
+
+        return manifest.get("frames", {})
+
+    # Gets the sprites of the frame from the previous build, or None when the frame has to be rendered again
+    def get_outputs(self, fingerprint):
+        entry = self.frames.get(fingerprint)
+        if entry == None:
+            return None
+
+        outputs = []
+        for item in entry:
+            path = os.path.join(self.output_folder, item["path"])
+
+            # The sprite has to be exactly the file that was written by the previous build
+            if not os.path.exists(path):
+                return None
+            stat = os.stat(path)
+            if stat.st_size != item["size"] or stat.st_mtime != item["mtime"]:
+                return None
+
+            output = Output()
+            output.path = path
+            output.index = item["index"]
+            output.offset_x = item["x"]
+            output.offset_y = item["y"]
+            outputs.append(output)
+
+        return outputs
+
+    # Replaces the manifest with the frames of the current build
+    def save(self, frames):
+        manifest_frames = {}
+        for fingerprint, outputs in frames:
+            items = []
+            for output in outputs:
+                if not os.path.exists(output.path):
+                    break
+                stat = os.stat(output.path)
+                items.append({
+                    "path": os.path.relpath(output.path, self.output_folder),
+                    "index": output.index,
+                    "x": output.offset_x,
+                    "y": output.offset_y,
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime
+                })
+            else:
+                manifest_frames[fingerprint] = items
+
+        temporary_path = "{}.{}.tmp".format(self.path, os.getpid())
+        with open(temporary_path, "w") as manifest_file:
+            json.dump({"version": manifest_version,
+                       "frames": manifest_frames}, manifest_file, indent=4)
+        os.replace(temporary_path, self.path)
+
+        self.frames = manifest_frames
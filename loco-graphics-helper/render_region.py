@@ -0,0 +1,113 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import math
+
+import bpy
+from bpy_extras.object_utils import world_to_camera_view
+from mathutils import Vector
+
+from .vehicle import get_bound_box_corners_with_children, bound_box_object_types
+
+# Plans the part of the frame that has to be rendered. The bounding boxes of the rendered objects are projected
+# through the camera, and only that region plus a margin for anti-aliasing is rendered using border rendering. The
+# rendered images keep their full size, so trimming and the sprite offsets are not affected.
+
+
+# Gets the world space bounding box corners of the objects that are rendered for the frame
+def get_rendered_corners(scene, frame):
+    if frame.target_object != None:
+        return get_bound_box_corners_with_children(frame.target_object)
+
+    # Without a target object every object on the render layer of the frame is rendered
+    render_layer = scene.render.layers[frame.layer]
+    corners = []
+    for o in scene.objects:
+        if o.hide_render or not o.type in bound_box_object_types:
+            continue
+        if not any(a and b for a, b in zip(o.layers, render_layer.layers)):
+            continue
+        corners += [o.matrix_world * Vector(corner) for corner in o.bound_box]
+    return corners
+
+
+class RenderRegion:
+    def __init__(self, min_x, min_y, max_x, max_y, width, height):
+        self.min_x = min_x
+        self.min_y = min_y
+        self.max_x = max_x
+        self.max_y = max_y
+
+        self.width = width
+        self.height = height
+
+    def get_pixels(self):
+        return (self.max_x - self.min_x) * (self.max_y - self.min_y)
+
+    def is_full_frame(self):
+        return self.get_pixels() >= self.width * self.height
+
+
+class RenderRegionPlanner:
+    def __init__(self, scene, margin):
+        self.scene = scene
+        self.margin = margin
+
+        self.rendered_pixels = 0
+        self.frame_pixels = 0
+
+    # Gets the region to render for the frame. Has to be called once the scene is set up for the frame, so the rig,
+    # the camera and the animation are in place
+    def plan(self, frame):
+        width, height = self._get_resolution()
+        full_frame = RenderRegion(0, 0, width, height, width, height)
+
+        region = full_frame
+
+        # The shadow is cast onto the ground outside of the bounding box of the object
+        if frame.layer != 'Top Down Shadow':
+            corners = get_rendered_corners(self.scene, frame)
+
+            if len(corners) > 0:
+                region = self._project(corners, width, height)
+
+        if region.get_pixels() <= 0:
+            region = full_frame
+
+        self.rendered_pixels += region.get_pixels()
+        self.frame_pixels += width * height
+
+        return region
+
+    def get_rendered_fraction(self):
+        if self.frame_pixels == 0:
+            return 1
+        return self.rendered_pixels / self.frame_pixels
+
+    def _get_resolution(self):
+        render = self.scene.render
+        scale = render.resolution_percentage / 100
+        return int(render.resolution_x * scale), int(render.resolution_y * scale)
+
+    def _project(self, corners, width, height):
+        camera = self.scene.camera
+
+        xs = []
+        ys = []
+        for corner in corners:
+            view = world_to_camera_view(self.scene, camera, corner)
+            xs.append(view.x * width)
+            ys.append(view.y * height)
+
+        min_x = max(0, int(math.floor(min(xs))) - self.margin)
+        min_y = max(0, int(math.floor(min(ys))) - self.margin)
+        max_x = min(width, int(math.ceil(max(xs))) + self.margin)
+        max_y = min(height, int(math.ceil(max(ys))) + self.margin)
+
+        return RenderRegion(min_x, min_y, max_x, max_y, width, height)
@@ -10,6 +10,8 @@ RCT Graphics Helper is licensed under the GNU General Public License version 3.
 import bpy
 import os
 
+from .timings import Timings
+
 # A collection of frames that are to be rendered and processed
 
 
@@ -19,11 +21,24 @@ class RenderTask:
         self.frames = []
         self.output_info = []
 
+        self.output_folder = None
+
+        # Overridden for render shards, which each use a private temporary folder
+        self.temporary_output_folder = None
+
+        self.timings = Timings()
+
     def get_temporary_output_folder(self):
+        if self.temporary_output_folder != None:
+            return self.temporary_output_folder
         return os.path.join(self.get_output_folder(), ".temp")
 
     def get_output_folder(self):
-        return os.path.join(bpy.path.abspath(self.context.scene.loco_graphics_helper_general_properties.output_directory))
+        # Resolved once, as the output folder is also requested from post processing worker threads
+        if self.output_folder == None:
+            self.output_folder = os.path.join(bpy.path.abspath(
+                self.context.scene.loco_graphics_helper_general_properties.output_directory))
+        return self.output_folder
 
     def add_frame(self, frame):
         self.frames.append(frame)
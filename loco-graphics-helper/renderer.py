@@ -9,12 +9,18 @@ RCT Graphics Helper is licensed under the GNU General Public License version 3.
 
 import faulthandler
 import os
+import subprocess
 import threading
 import bpy
+from collections import OrderedDict
 
 from .builders.materials_builder import MaterialsBuilder
 
 from .palette_manager import PaletteManager
+from .imaging.tile_indices import CameraProjection
+from .visibility_manager import VisibilityManager
+from .render_region import RenderRegionPlanner
+from .timings import count_subprocess, trace_span
 
 
 def find_material_by_name(material_name):
@@ -30,6 +36,92 @@ def find_node_by_label(tree, node_to_find):
             return node
     return None
 
+
+render_layer_names = ["Editor", "Braking Lights", "Top Down Shadow"]
+
+# Compositor nodes the renderer controls, with the error reported when they are missing. The silhouette threshold is
+# optional, scenes initialized with an older version of the addon render the silhouette separately
+compositor_nodes = OrderedDict([
+    ("input_layer", "The compositing node tree does not contain an input layer node."),
+    ("aa_with_backgound_switch",
+     "The compositing node tree does not contain a mix node for anti-aliasing with the background."),
+    ("meta_output", "The compositing node tree does not contain an output node for the material index."),
+    ("width", "Width composite node could not be found, please click repair"),
+    ("length", "Length composite node could not be found, please click repair"),
+    ("silhouette_threshold", None)
+])
+
+# Handles to the compositor nodes and render layers the renderer changes for every frame. They are looked up once and
+# only looked up again when the node tree or the render layers change
+
+
+class CompositorHandles:
+    def __init__(self, scene):
+        self.scene = scene
+
+        self.nodes = {}
+        self.layers = {}
+
+        self.signature = None
+        self.tree_hash = None
+
+    def get_node(self, label):
+        self._update()
+        return self.nodes.get(label)
+
+    def get_layer(self, name):
+        self._update()
+        return self.layers[name]
+
+    # Checks the whole tree rather than only the number of nodes, meant to be called once before a render starts
+    def validate(self):
+        self._update()
+
+        if self._get_tree_hash() != self.tree_hash:
+            self._build()
+
+    def get_missing_nodes(self):
+        self._update()
+        return [label for label in compositor_nodes if not label in self.nodes]
+
+    def get_missing_layers(self):
+        self._update()
+        return [name for name in render_layer_names if not name in self.layers]
+
+    def _get_signature(self):
+        tree = self.scene.node_tree
+        if tree == None:
+            return None
+        return (tree.as_pointer(), len(tree.nodes), len(self.scene.render.layers))
+
+    def _get_tree_hash(self):
+        tree = self.scene.node_tree
+        if tree == None:
+            return None
+        return hash(tuple((node.name, node.label, node.bl_idname) for node in tree.nodes))
+
+    def _update(self):
+        if self._get_signature() != self.signature:
+            self._build()
+
+    def _build(self):
+        self.nodes = {}
+        self.layers = {}
+
+        tree = self.scene.node_tree
+        if tree != None:
+            for node in tree.nodes:
+                if node.label in compositor_nodes and not node.label in self.nodes:
+                    self.nodes[node.label] = node
+
+        for name in render_layer_names:
+            layer = self.scene.render.layers.get(name)
+            if layer != None:
+                self.layers[name] = layer
+
+        self.signature = self._get_signature()
+        self.tree_hash = self._get_tree_hash()
+
 # Model for controlling the render settings, and starting render processes
 
 
@@ -38,6 +130,9 @@ class Renderer:
         self.context = context
 
         self.magick_path = "magick"
+
+        # Python interpreter that ships with Blender, used to start the post processing worker processes
+        self.python_path = bpy.app.binary_path_python
         self.floyd_steinberg_diffusion = 5
 
         self.palette_manager = palette_manager
@@ -59,6 +154,40 @@ class Renderer:
 
         self.started_with_anti_aliasing = context.scene.render.use_antialiasing
 
+        general_props = context.scene.loco_graphics_helper_general_properties
+        self.post_processing_backend = general_props.post_processing_backend
+        self.validate_post_processing = general_props.validate_post_processing
+        self.palette_lookup_tables = general_props.palette_lookup_tables
+        self.silhouette_from_main_render = general_props.silhouette_from_main_render
+        self.anti_aliased_tile_indices = general_props.anti_aliased_tile_indices
+        self.tile_indices_source = general_props.tile_indices_source
+        self.magick_execution = general_props.magick_execution
+        self.pipelined_post_processing = general_props.pipelined_post_processing
+        self.post_processing_workers = general_props.post_processing_workers
+        self.y_offset = general_props.y_offset
+        self.incremental_rendering = general_props.incremental_rendering
+        self.schedule_frames = general_props.schedule_frames
+        self.deduplicate_sprites = general_props.deduplicate_sprites
+
+        # Per thread state, post processing may run on worker threads
+        self.thread_state = threading.local()
+
+        # Worker processes for the in-process post processing, started by the frame pipeline
+        self.worker_processes = None
+
+        # Object visibility of the frame that was rendered last
+        self.visibility_manager = VisibilityManager()
+
+        self.compositor = CompositorHandles(context.scene)
+
+        self.render_region_planner = None
+        if general_props.render_object_region:
+            self.render_region_planner = RenderRegionPlanner(
+                context.scene, general_props.render_region_margin)
+        self.render_region = None
+
+        self.layer = None
+
         bpy.app.handlers.render_complete.append(self._render_finished)
         bpy.app.handlers.render_cancel.append(self._render_reset)
 
@@ -68,7 +197,16 @@ class Renderer:
 
         self._render_started()
 
-        bpy.ops.render.render(write_still=output_still)  # "INVOKE_DEFAULT"
+        self._apply_render_region()
+
+        render = self.context.scene.render
+        with trace_span("Render", "render", {
+            "still": output_still,
+            "layer": self.layer,
+            "anti_aliasing": render.use_antialiasing,
+            "border": render.use_border
+        }):
+            bpy.ops.render.render(write_still=output_still)  # "INVOKE_DEFAULT"
 
     def _render_started(self):
         if self.rendering:
@@ -100,6 +238,8 @@ class Renderer:
         self.rendering = False
 
         self.set_aa(self.started_with_anti_aliasing)
+        if self.render_region_planner != None:
+            self.context.scene.render.use_border = False
         self.set_aa_with_background(False)
         self.set_override_material(None)
         self.set_layer("Editor")
@@ -117,18 +257,83 @@ class Renderer:
         palette.prepare(self)
         return palette.path
 
+    # Batch that magick commands of the current thread are queued in instead of being run directly, if set
+    @property
+    def magick_batch(self):
+        return getattr(self.thread_state, "magick_batch", None)
+
+    @magick_batch.setter
+    def magick_batch(self, magick_batch):
+        self.thread_state.magick_batch = magick_batch
+
+    # Runs a magick command writing to the output, or queues it if a batch is active.
+    # The callback receives the info output of the command, which contains the offsets of trim operations
+    def run_magick_command(self, command, output, callback=None):
+        if self.magick_batch != None:
+            self.magick_batch.add(command, output, callback)
+            return
+
+        command_string = command.get_command_string(self.magick_path, output)
+
+        count_subprocess()
+        with trace_span("magick", "magick", {"command_size": len(command_string), "output": os.path.basename(output)}):
+            result = subprocess.check_output(
+                command_string, shell=True).decode("utf-8")
+
+        if callback != None:
+            callback(result)
+
+    # Whether the post processing of the frame reads the merged meta image in-process. Frames that produce multiple
+    # sprites, oversized tiles or occlusion layers, are always split in-process
+    def reads_meta_in_process(self, frame):
+        return self.post_processing_backend == "NUMPY" or frame.oversized or frame.occlusion_layers > 0
+
+    # Runs the queued magick commands so their output files can be read
+    def flush_magick_batch(self):
+        if self.magick_batch != None:
+            self.magick_batch.execute()
+
     # Enabled or disables anti-aliasing for the next render
     def set_aa(self, aa):
         self.context.scene.render.use_antialiasing = aa
 
+    # Checks the compositor nodes and render layers needed for the frames before anything is rendered, so a scene that
+    # has to be repaired is reported once instead of failing halfway through a render
+    def validate_compositor(self, frames):
+        self.compositor.validate()
+
+        missing_layers = self.compositor.get_missing_layers()
+        if len(missing_layers) > 0:
+            raise Exception("The scene is missing the render layers {}, please click repair".format(
+                ", ".join(missing_layers)))
+
+        oversized = any(frame.oversized for frame in frames)
+
+        errors = []
+        for label in self.compositor.get_missing_nodes():
+            if label in ("width", "length") and not oversized:
+                continue
+
+            if compositor_nodes[label] == None:
+                print("The compositing node tree does not contain the optional {} node, please click repair".format(
+                    label))
+            else:
+                errors.append(compositor_nodes[label])
+
+        if len(errors) > 0:
+            raise Exception(" ".join(errors))
+
+    # Gets a compositor node the renderer controls, raises the missing node error if it does not exist
+    def _get_compositor_node(self, label):
+        node = self.compositor.get_node(label)
+        if node == None:
+            raise Exception(compositor_nodes[label])
+        return node
+
     # Enabled or disables anti-aliasing with the background
     def set_aa_with_background(self, aa_with_background):
-        aa_with_backgound_mix_node = find_node_by_label(
-            self.context.scene.node_tree, "aa_with_backgound_switch")
-
-        if aa_with_backgound_mix_node == None:
-            raise Exception(
-                "The compositing node tree does not contain a mix node for anti-aliasing with the background.")
+        aa_with_backgound_mix_node = self._get_compositor_node(
+            "aa_with_backgound_switch")
 
         if aa_with_background:
             aa_with_backgound_mix_node.inputs[0].default_value = 1
@@ -137,41 +342,46 @@ class Renderer:
 
     # Sets the global override material that the scene is rendered with
     def set_override_material(self, material):
-        self.context.scene.render.layers["Editor"].material_override = material
-        self.context.scene.render.layers["Braking Lights"].material_override = material
-        self.context.scene.render.layers["Top Down Shadow"].material_override = material
+        for layer in render_layer_names:
+            self.compositor.get_layer(layer).material_override = material
 
     def set_multi_tile_size(self, width, length):
-        width_node = None
-        length_node = None
-        for key, value in self.context.scene.node_tree.nodes.items():
-            if value.label == "width":
-                width_node = value
-                value.outputs[0].default_value = width
-            if value.label == "length":
-                length_node = value
-                value.outputs[0].default_value = length
-        if width_node is None:
-            raise Exception("Width composite node could not be found, please click repair")
-        if length_node is None:
-            raise Exception("Length composite node could not be found, please click repair")
+        self._get_compositor_node("width").outputs[0].default_value = width
+        self._get_compositor_node("length").outputs[0].default_value = length
 
     # Sets the active render layer
     def set_layer(self, layer_name):
-        layers = ["Editor", "Braking Lights", "Top Down Shadow"]
+        for layer in render_layer_names:
+            self.compositor.get_layer(layer).use = layer == layer_name
 
-        for layer in layers:
-            self.context.scene.render.layers[layer].use = False
-        self.context.scene.render.layers[layer_name].use = True
+        input_layer_node = self._get_compositor_node("input_layer")
+        input_layer_node.layer = layer_name
 
-        input_layer_node = find_node_by_label(
-            self.context.scene.node_tree, "input_layer")
+        self.layer = layer_name
 
-        if input_layer_node == None:
-            raise Exception(
-                "The compositing node tree does not contain an input layer node.")
+    # Sets the region of the frame that the following renders are limited to, None renders the full frame
+    def set_render_region(self, region):
+        self.render_region = region
 
-        input_layer_node.layer = layer_name
+    def _apply_render_region(self):
+        # Leave the border settings of the scene alone when the render regions are not planned
+        if self.render_region_planner == None:
+            return
+
+        render = self.context.scene.render
+        region = self.render_region
+
+        if region == None or region.is_full_frame():
+            render.use_border = False
+            return
+
+        # Keep the full image size, so the render region does not change the trim offsets
+        render.use_border = True
+        render.use_crop_to_border = False
+        render.border_min_x = region.min_x / region.width
+        render.border_max_x = region.max_x / region.width
+        render.border_min_y = region.min_y / region.height
+        render.border_max_y = region.max_y / region.height
 
     def set_animation_frame(self, animation_frame_index):
         self.context.scene.frame_set(animation_frame_index)
@@ -183,16 +393,46 @@ class Renderer:
     def set_output_path(self, path):
         self.context.scene.render.filepath = path
 
-    # Sets the meta (material and tile mask) render output path
-    def set_meta_output_path(self, base, path):
+    # Sets the output of the meta image. The hard silhouette meta image and the depth are written to silhouette_path
+    # and depth_path if given, otherwise next to the meta image so no earlier output is overwritten
+    def set_meta_output_path(self, base, path, silhouette_path=None, depth_path=None):
         # Find the file output node in the compositor to set the output file name and path
-        material_index_output_node = find_node_by_label(
-            self.context.scene.node_tree, "meta_output")
-
-        if material_index_output_node == None:
-            raise Exception(
-                "The compositing node tree does not contain an output node for the material index.")
+        material_index_output_node = self._get_compositor_node("meta_output")
 
         # Set the file name and output path for the mask
         material_index_output_node.base_path = base
         material_index_output_node.file_slots[0].path = path
+
+        if len(material_index_output_node.file_slots) > 1:
+            if silhouette_path == None:
+                silhouette_path = path + "silhouette_"
+            material_index_output_node.file_slots[1].path = silhouette_path
+
+        if len(material_index_output_node.file_slots) > 2:
+            if depth_path == None:
+                depth_path = path + "depth_"
+            material_index_output_node.file_slots[2].path = depth_path
+
+    # Whether the compositor writes the hard silhouette meta image alongside the anti-aliased one. Scenes initialized
+    # with an older version of the addon lack the output until they are repaired
+    def has_silhouette_output(self):
+        return self._get_meta_output_slot_count() > 1
+
+    # Whether the tile indices of multi-tile objects are reconstructed from the depth of the main render
+    def uses_depth_tile_indices(self):
+        return self.tile_indices_source == "DEPTH" and self._get_meta_output_slot_count() > 2
+
+    # Gets the projection of the camera, used to reconstruct world positions from the depth of the last render
+    def get_camera_projection(self):
+        camera_object = self.context.scene.camera
+        camera = camera_object.data
+
+        return CameraProjection(camera_object.matrix_world, camera.ortho_scale, camera.shift_x, camera.shift_y,
+                                camera.clip_end)
+
+    def _get_meta_output_slot_count(self):
+        material_index_output_node = self.compositor.get_node("meta_output")
+
+        if material_index_output_node == None:
+            return 0
+        return len(material_index_output_node.file_slots)
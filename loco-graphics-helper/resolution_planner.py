@@ -0,0 +1,80 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import math
+
+from bpy_extras.object_utils import world_to_camera_view
+from mathutils import Vector
+
+from .render_region import get_rendered_corners
+
+# Finds the smallest square render resolution that contains the rendered objects of every frame of a render task. The
+# orthographic scale follows the resolution, so a pixel always covers the same part of the world. The resolution is
+# rounded up to a multiple of 32 pixels, which keeps the lens shift a whole number of pixels and the pixel grid
+# aligned, so the sprites and their offsets do not change.
+
+
+class ResolutionPlanner:
+    def __init__(self, scene, margin=2, step=32, max_resolution=4096):
+        self.scene = scene
+        self.margin = margin
+        self.step = step
+        self.max_resolution = max_resolution
+
+    def get_resolution(self, frames):
+        scene = self.scene
+        camera = scene.camera
+
+        resolution = scene.render.resolution_x
+        shift_y = camera.data.shift_y
+
+        original_frame = scene.frame_current
+        animation_frame_index = None
+
+        required = self.step
+        try:
+            for frame in sorted(frames, key=lambda frame: frame.animation_frame_index):
+                if frame.animation_frame_index != animation_frame_index:
+                    animation_frame_index = frame.animation_frame_index
+                    scene.frame_set(animation_frame_index)
+
+                frame.prepare_rig()
+                scene.update()
+
+                for corner in self._get_corners(frame):
+                    view = world_to_camera_view(scene, camera, corner)
+
+                    # Pixel offset of the corner from the center of the frame, the horizontal lens shift is a constant
+                    # fraction of a pixel and can be ignored
+                    x = (view.x - 0.5) * resolution
+                    y = (view.y - 0.5) * resolution
+
+                    required = max(required, 2 * (abs(x) + self.margin))
+
+                    # The vertical lens shift moves the center of the frame by a fraction of the resolution, relative to
+                    # the center of the camera the corner stays at the same pixel offset
+                    y += shift_y * resolution
+                    required = max(required, (y + self.margin) / (0.5 + shift_y))
+                    if shift_y < 0.5:
+                        required = max(
+                            required, (self.margin - y) / (0.5 - shift_y))
+        finally:
+            scene.frame_set(original_frame)
+
+        return min(int(math.ceil(required / self.step)) * self.step, self.max_resolution)
+
+    def _get_corners(self, frame):
+        corners = get_rendered_corners(self.scene, frame)
+
+        # The top down shadow is cast straight down onto the ground
+        if frame.layer == 'Top Down Shadow':
+            corners = corners + [Vector((corner.x, corner.y, 0))
+                                 for corner in corners]
+
+        return corners
@@ -0,0 +1,29 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+# Divides the frames of a render task over the render shards, see sharding.py. Kept apart from the shard coordinator,
+# which needs Blender, so the split can be used and tested on its own.
+
+
+# Gets the frame indices for each shard, either as contiguous blocks or interleaved
+def split_frames(frame_count, shards, mode="CONTIGUOUS"):
+    shards = max(1, min(shards, frame_count))
+
+    if mode == "INTERLEAVED":
+        return [list(range(i, frame_count, shards)) for i in range(shards)]
+
+    split = []
+    start = 0
+    for i in range(shards):
+        size = frame_count // shards
+        if i < frame_count % shards:
+            size += 1
+        split.append(list(range(start, start + size)))
+        start += size
+    return split
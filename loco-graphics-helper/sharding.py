@@ -0,0 +1,152 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import json
+import os
+import shutil
+import subprocess
+
+import bpy
+
+from .processors.sub_processes.frame_processors.post_processor import Output
+from .timings import count_subprocess
+from .shard_frames import split_frames
+
+# Splits the frames of a render task over multiple background Blender processes. Every worker opens a copy of the
+# scene, renders its share of the frames into a private temporary folder and reports the sprites it produced. The
+# sprites manifest, GX and parkobj files are built once by the coordinator afterwards.
+
+
+class ShardCoordinator:
+    def __init__(self, context, operator_id, shards, mode):
+        self.context = context
+        self.operator_id = operator_id
+        self.shards = shards
+        self.mode = mode
+
+    # Renders the sprites of the task in the worker processes and adds their output info to the task
+    def render_sprites(self, task):
+        shard_folder = os.path.join(task.get_temporary_output_folder(), "shards")
+        os.makedirs(shard_folder, exist_ok=True)
+
+        # Workers can not see unsaved changes, so they open a copy of the current scene
+        scene_path = os.path.join(shard_folder, "scene.blend")
+        bpy.ops.wm.save_as_mainfile(
+            filepath=scene_path, copy=True, relative_remap=True)
+
+        workers = []
+        for i, frame_indices in enumerate(split_frames(len(task.frames), self.shards, self.mode)):
+            spec_path = os.path.join(shard_folder, "shard_{}.json".format(i))
+            result_path = os.path.join(
+                shard_folder, "shard_{}_result.json".format(i))
+
+            spec = {
+                "shard": i,
+                "frames": frame_indices,
+                "output_folder": task.get_output_folder(),
+                "temporary_folder": os.path.join(shard_folder, "temp_{}".format(i)),
+                "result": result_path
+            }
+
+            with open(spec_path, "w") as spec_file:
+                json.dump(spec, spec_file, indent=4)
+
+            print("Starting render shard {} with {} frames".format(
+                i, len(frame_indices)))
+            count_subprocess()
+            workers.append((i, result_path, subprocess.Popen(
+                self._get_worker_command(scene_path, spec_path))))
+
+        failed_shards = []
+        for i, result_path, worker in workers:
+            if worker.wait() != 0 or not os.path.exists(result_path):
+                failed_shards.append(i)
+
+        if len(failed_shards) > 0:
+            raise Exception("Render shards {} failed, see the console output of the workers.".format(
+                ", ".join(str(shard) for shard in failed_shards)))
+
+        # Merge in shard order, the manifest is sorted by sprite index afterwards
+        for i, result_path, _ in workers:
+            with open(result_path, "r") as result_file:
+                result = json.load(result_file)
+
+            for item in result["outputs"]:
+                task.output_info.append(output_from_dict(item))
+
+            task.timings.merge(result["timings"], "Render shard {}".format(i), {
+                               "shard": i})
+
+        shutil.rmtree(shard_folder, ignore_errors=True)
+        try:
+            os.rmdir(task.get_temporary_output_folder())
+        except OSError:
+            pass
+
+    def _get_worker_command(self, scene_path, spec_path):
+        expression = "import importlib; importlib.import_module('{}.sharding').run_worker('{}')".format(
+            __package__, self.operator_id)
+        return [bpy.app.binary_path, "-b", scene_path, "--python-exit-code", "1",
+                "--python-expr", expression, "--", spec_path]
+
+
+# Entry point of a worker process, runs the render operator for the frames of the shard given on the command line
+def run_worker(operator_id):
+    import sys
+    from .cli import _ensure_registered
+
+    spec_path = sys.argv[sys.argv.index("--") + 1]
+
+    _ensure_registered()
+
+    module_name, operator_name = operator_id.split(".")
+    operator = getattr(getattr(bpy.ops, module_name), operator_name)
+
+    general_properties = bpy.context.scene.loco_graphics_helper_general_properties
+    general_properties.rendering = False
+
+    operator(shard_spec=spec_path)
+
+    if general_properties.rendering:
+        sys.exit(1)
+
+
+# Restricts the task to the frames of the shard and points it at the private temporary folder of the shard
+def apply_shard_spec(task, spec):
+    task.frames = [task.frames[i] for i in spec["frames"]]
+    task.output_folder = spec["output_folder"]
+    task.temporary_output_folder = spec["temporary_folder"]
+
+
+def write_shard_result(task, spec):
+    result = {
+        "outputs": [output_to_dict(output) for output in task.output_info],
+        "timings": task.timings.to_dict()
+    }
+
+    with open(spec["result"], "w") as result_file:
+        json.dump(result, result_file, indent=4)
+
+
+def output_to_dict(output):
+    return {
+        "path": output.path,
+        "index": output.index,
+        "x": output.offset_x,
+        "y": output.offset_y
+    }
+
+
+def output_from_dict(item):
+    output = Output()
+    output.path = item["path"]
+    output.index = item["index"]
+    output.offset_x = item["x"]
+    output.offset_y = item["y"]
+    return output
@@ -0,0 +1,222 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+# Records how long the stages of a render task take. Every frame processor run and every task-level sub process is
+# measured with its wall time, CPU time and the number of subprocesses it started. All measurements, together with
+# finer spans such as renders and magick calls, are also kept as Chrome trace events.
+
+# Python 3.7+ can measure the CPU time of the current thread, older versions measure the whole process. The frames
+# that are post processed in parallel then also include the CPU time of the other workers.
+_cpu_time = getattr(time, "thread_time", time.process_time)
+
+# Spans that are open on the current thread, started subprocesses are counted towards all of them
+_open_spans = threading.local()
+
+
+# Used in place of a measurement where no timings are kept
+@contextmanager
+def no_measurement():
+    yield None
+
+
+# Counts a subprocess started by the current thread
+def count_subprocess():
+    counted = []
+    for timings, span in getattr(_open_spans, "spans", []):
+        span["subprocesses"] += 1
+
+        if not timings in counted:
+            counted.append(timings)
+            with timings.lock:
+                timings.subprocesses += 1
+
+
+# Records a trace span for the code in the with block. It is added to the timings of the innermost measurement that is
+# open on the current thread, outside of a measurement nothing is recorded
+@contextmanager
+def trace_span(name, category, args=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        add_trace_span(name, category, start, args)
+
+
+# Records a trace span that started at the given time.perf_counter() value and ends now
+def add_trace_span(name, category, start, args=None):
+    spans = getattr(_open_spans, "spans", [])
+    if len(spans) == 0:
+        return
+
+    timings = spans[-1][0]
+    timings.add_trace_event(name, category, start,
+                            time.perf_counter() - start, args)
+
+
+class Timings:
+    def __init__(self):
+        self.lock = threading.Lock()
+
+        self.start = time.perf_counter()
+        self.start_cpu = _cpu_time()
+
+        # Trace timestamps are based on the wall clock, so the traces of render shards line up with the coordinator
+        self.start_epoch = time.time()
+
+        self.frames = []
+        self.tasks = []
+
+        self.subprocesses = 0
+
+        self.trace_events = []
+        self.thread_names = {}
+        self.process_names = {os.getpid(): "Blender"}
+
+    # Measures a frame processor run on a frame
+    def measure_frame(self, frame, stage):
+        return self._measure(self.frames, OrderedDict([("frame", frame.frame_index), ("stage", stage)]), "frame")
+
+    # Measures a task-level sub process
+    def measure_task(self, stage):
+        return self._measure(self.tasks, OrderedDict([("stage", stage)]), "task")
+
+    def add_trace_event(self, name, category, start, duration, args=None):
+        thread = threading.current_thread()
+
+        event = OrderedDict()
+        event["name"] = name
+        event["cat"] = category
+        event["ph"] = "X"
+        event["ts"] = (self.start_epoch + start - self.start) * 1000000
+        event["dur"] = duration * 1000000
+        event["pid"] = os.getpid()
+        event["tid"] = thread.ident
+        if args != None:
+            event["args"] = args
+
+        with self.lock:
+            self.trace_events.append(event)
+            self.thread_names[(event["pid"], thread.ident)] = thread.name
+
+    # Gets the measurements in a form that can be handed to another process
+    def to_dict(self):
+        with self.lock:
+            return {
+                "frames": self.frames,
+                "subprocesses": self.subprocesses,
+                "trace_events": self.trace_events,
+                "thread_names": [[pid, tid, name] for (pid, tid), name in self.thread_names.items()],
+                "pid": os.getpid()
+            }
+
+    # Adds the frame measurements and trace events of another process, such as a render shard
+    def merge(self, timings, process_name, extra_fields=None):
+        if extra_fields != None:
+            for record in timings["frames"]:
+                record.update(extra_fields)
+
+        with self.lock:
+            self.frames += timings["frames"]
+            self.subprocesses += timings["subprocesses"]
+
+            self.trace_events += timings["trace_events"]
+            for pid, tid, name in timings["thread_names"]:
+                self.thread_names[(pid, tid)] = name
+            self.process_names[timings["pid"]] = process_name
+
+    @contextmanager
+    def _measure(self, records, span, category):
+        span["thread"] = threading.current_thread().name
+        span["start"] = time.perf_counter() - self.start
+        span["subprocesses"] = 0
+
+        spans = getattr(_open_spans, "spans", None)
+        if spans == None:
+            spans = _open_spans.spans = []
+
+        entry = (self, span)
+        spans.append(entry)
+
+        start = time.perf_counter()
+        start_cpu = _cpu_time()
+        try:
+            yield span
+        finally:
+            span["wall"] = time.perf_counter() - start
+            span["cpu"] = _cpu_time() - start_cpu
+            spans.remove(entry)
+
+            args = OrderedDict()
+            if "frame" in span:
+                args["frame"] = span["frame"]
+            args["cpu"] = span["cpu"]
+            args["subprocesses"] = span["subprocesses"]
+            self.add_trace_event(
+                span["stage"], category, start, span["wall"], args)
+
+            with self.lock:
+                records.append(span)
+
+    def get_summary(self):
+        summary = OrderedDict()
+        summary["wall"] = time.perf_counter() - self.start
+        summary["cpu"] = _cpu_time() - self.start_cpu
+        summary["frames"] = len(set(record["frame"] for record in self.frames))
+        summary["subprocesses"] = self.subprocesses
+        summary["frame_stages"] = self._get_stage_totals(self.frames)
+        summary["task_stages"] = self._get_stage_totals(self.tasks)
+        return summary
+
+    def _get_stage_totals(self, records):
+        totals = OrderedDict()
+        for record in records:
+            stage = totals.setdefault(record["stage"], OrderedDict(
+                [("count", 0), ("wall", 0), ("cpu", 0), ("subprocesses", 0)]))
+            stage["count"] += 1
+            stage["wall"] += record["wall"]
+            stage["cpu"] += record["cpu"]
+            stage["subprocesses"] += record["subprocesses"]
+        return totals
+
+    def write(self, path):
+        with self.lock:
+            timings = OrderedDict()
+            timings["summary"] = self.get_summary()
+            timings["tasks"] = self.tasks
+            timings["frames"] = sorted(
+                self.frames, key=lambda record: (record["frame"], record["start"]))
+
+        with open(path, "w") as timings_file:
+            json.dump(timings, timings_file, indent=4)
+
+    # Writes the trace events in the Chrome trace event format, which can be opened in Perfetto or chrome://tracing.
+    # Every process and thread gets its own track
+    def write_trace(self, path):
+        with self.lock:
+            events = []
+            for pid, name in self.process_names.items():
+                events.append({"name": "process_name", "ph": "M",
+                               "pid": pid, "args": {"name": name}})
+
+            for (pid, tid), name in self.thread_names.items():
+                events.append({"name": "thread_name", "ph": "M",
+                               "pid": pid, "tid": tid, "args": {"name": name}})
+
+            events += sorted(self.trace_events, key=lambda event: event["ts"])
+
+        with open(path, "w") as trace_file:
+            json.dump({"traceEvents": events,
+                       "displayTimeUnit": "ms"}, trace_file)
@@ -86,14 +86,10 @@ class VehicleComponent:
     def _get_min_max_axis_bound_box_corners_with_children(self, object, axis):
         mins = []
         maxs = []
-        min_x, max_x = self._get_min_max_axis_bound_box_corners(object, axis)
-        # This can happen if there are no dimensions to this object (or if its 0 width)
-        if min_x != max_x:
-            mins.append(min_x)
-            maxs.append(max_x)
-
-        for c in object.children:
-            min_x, max_x = self._get_min_max_axis_bound_box_corners_with_children(c, axis)
+        for _, corners in get_bound_boxes_with_children(object):
+            min_x = min([x[axis] for x in corners])
+            max_x = max([x[axis] for x in corners])
+            # This can happen if there are no dimensions to this object (or if its 0 width)
             if min_x != max_x:
                 mins.append(min_x)
                 maxs.append(max_x)
@@ -102,12 +98,6 @@ class VehicleComponent:
         
         return (min(mins), max(maxs))
 
-    def _get_min_max_axis_bound_box_corners(self, object, axis):
-        bbox_corners = [object.matrix_world * Vector(corner) for corner in object.bound_box]
-        min_x = min([x[axis] for x in bbox_corners])
-        max_x = max([x[axis] for x in bbox_corners])
-        return (min_x, max_x)
-
     def get_half_width(self):
         mins = []
         maxs = []
@@ -160,6 +150,27 @@ class VehicleComponent:
         return int(anim_factor) + 64
 
 
+# Object types that have geometry and therefore a meaningful bounding box
+bound_box_object_types = ['MESH', 'CURVE', 'SURFACE', 'META', 'FONT']
+
+# Gets the world space bounding box corners of the object and all of its children, as an (object, corners) pair per
+# object
+def get_bound_boxes_with_children(object):
+    boxes = [(object, [object.matrix_world * Vector(corner) for corner in object.bound_box])]
+
+    for c in object.children:
+        boxes = boxes + get_bound_boxes_with_children(c)
+    return boxes
+
+# Gets the corners of the bounding boxes of the object and its children that have geometry
+def get_bound_box_corners_with_children(object):
+    corners = []
+    for o, box in get_bound_boxes_with_children(object):
+        if o.type in bound_box_object_types:
+            corners = corners + box
+    return corners
+
+
 def get_car_components(cars) -> List[VehicleComponent]:
     components = []
     for car in cars:
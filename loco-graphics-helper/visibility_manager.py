@@ -0,0 +1,82 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import bpy
+
+# Sets which objects are rendered for a frame. The visibility of every target object is computed once, and only the
+# objects whose visibility differs from the previous frame are written, as every write to hide_render can invalidate
+# the render data of the object.
+
+
+class VisibilityManager:
+    def __init__(self):
+        # Visibility per object name for every target object, and for the shadow light per layer
+        self.visibilities = {}
+
+        # Visibility that was last written per object name
+        self.applied = {}
+
+        self.writes = 0
+
+    def prepare(self, target_object, layer):
+        self._apply(self._get_frame_visibility(target_object, layer))
+
+    # Gets the objects that are rendered for a frame. Besides the objects the frame shows, that is every object the
+    # frame leaves alone that is not hidden from rendering, such as nested children of the target and scenery
+    def get_rendered_objects(self, target_object, layer):
+        visibility = self._get_frame_visibility(target_object, layer)
+        return [o for o in bpy.data.scenes[0].objects if not visibility.get(o.name, o.hide_render)]
+
+    def _get_frame_visibility(self, target_object, layer):
+        target_name = None
+        if target_object != None:
+            target_name = target_object.name
+
+        key = (target_name, layer == 'Top Down Shadow')
+        if not key in self.visibilities:
+            self.visibilities[key] = self._get_visibility(
+                target_object, layer)
+
+        return self.visibilities[key]
+
+    # Gets the objects to show and hide, the same way the frames always did: every helper object other than the target
+    # is hidden together with its children, then the target and its children are shown
+    def _get_visibility(self, target_object, layer):
+        visibility = {}
+
+        if target_object != None:
+            for o in bpy.data.scenes[0].objects:
+                if o == target_object:
+                    continue
+                if o.loco_graphics_helper_object_properties.object_type == 'NONE':
+                    continue
+                visibility[o.name] = True
+                for c in o.children:
+                    visibility[c.name] = True
+
+            visibility[target_object.name] = False
+            for c in target_object.children:
+                visibility[c.name] = False
+
+        # This is a little hacky...
+        visibility['AirplaneShadowLight'] = layer != 'Top Down Shadow'
+
+        return visibility
+
+    def _apply(self, visibility):
+        for name, hidden in visibility.items():
+            if self.applied.get(name) == hidden:
+                continue
+
+            object = bpy.data.objects[name]
+            if object.hide_render != hidden:
+                object.hide_render = hidden
+                self.writes += 1
+
+            self.applied[name] = hidden
@@ -0,0 +1,23 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import os
+import sys
+import types
+
+# The add-on folder is not a valid module name and its __init__ registers the add-on with Blender. The modules under
+# test only need NumPy, so the package is made importable as loco_graphics_helper without running its __init__.
+
+addon_path = os.path.join(os.path.dirname(
+    os.path.dirname(os.path.abspath(__file__))), "loco-graphics-helper")
+
+if not "loco_graphics_helper" in sys.modules:
+    package = types.ModuleType("loco_graphics_helper")
+    package.__path__ = [addon_path]
+    sys.modules["loco_graphics_helper"] = package
@@ -0,0 +1,199 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from loco_graphics_helper.imaging.exr import read_exr, is_supported_exr, UnsupportedExrException
+
+# Compression ids and the number of scanlines per chunk
+NONE, RLE, ZIPS, ZIP, PIZ = 0, 1, 2, 3, 4
+lines_per_chunk = {NONE: 1, RLE: 1, ZIPS: 1, ZIP: 16, PIZ: 32}
+
+# Pixel type ids and NumPy types
+HALF, FLOAT = 1, 2
+pixel_dtypes = {HALF: "<f2", FLOAT: "<f4"}
+
+
+def attribute(name, attribute_type, value):
+    return name.encode() + b"\0" + attribute_type.encode() + b"\0" + struct.pack("<i", len(value)) + value
+
+
+# Applies the byte splitting and delta predictor of the RLE and ZIP compressions
+def predict(data):
+    values = np.frombuffer(data, np.uint8)
+    split = np.concatenate([values[0::2], values[1::2]]).astype(np.int64)
+
+    predicted = split.copy()
+    predicted[1:] = (split[1:] - split[:-1] + 128) & 0xff
+    return predicted.astype(np.uint8).tobytes()
+
+
+# Run length encodes the data, runs of three or more bytes are repeated, everything else is stored as literals
+def encode_rle(data):
+    encoded = b""
+    position = 0
+    while position < len(data):
+        run = 1
+        while position + run < len(data) and run < 128 and data[position + run] == data[position]:
+            run += 1
+
+        if run >= 3:
+            encoded += struct.pack("b", run - 1) + data[position:position + 1]
+            position += run
+            continue
+
+        literal_end = position
+        while literal_end < len(data) and literal_end - position < 127:
+            if literal_end + 2 < len(data) and data[literal_end] == data[literal_end + 1] == data[literal_end + 2]:
+                break
+            literal_end += 1
+
+        encoded += struct.pack("b", -(literal_end - position)) + \
+            data[position:literal_end]
+        position = literal_end
+
+    return encoded
+
+
+def compress(data, compression):
+    if compression == RLE:
+        return encode_rle(predict(data))
+    if compression in (ZIPS, ZIP):
+        return zlib.compress(predict(data))
+    return data
+
+
+# Writes a single part scanline EXR file of the channels, a dict of channel name to (pixel type, values)
+def write_exr(path, channels, compression, y_min=0, version_flags=0):
+    names = sorted(channels.keys())
+    height, width = channels[names[0]][1].shape
+
+    channel_list = b""
+    for name in names:
+        channel_list += name.encode() + b"\0" + \
+            struct.pack("<iB3xii", channels[name][0], 0, 1, 1)
+    channel_list += b"\0"
+
+    window = struct.pack("<iiii", 0, y_min, width - 1, y_min + height - 1)
+
+    header = attribute("channels", "chlist", channel_list)
+    header += attribute("compression", "compression",
+                        bytes([compression]))
+    header += attribute("dataWindow", "box2i", window)
+    header += attribute("displayWindow", "box2i", window)
+    header += attribute("lineOrder", "lineOrder", b"\0")
+    header += attribute("pixelAspectRatio", "float", struct.pack("<f", 1))
+    header += b"\0"
+
+    chunk_lines = lines_per_chunk[compression]
+    chunk_count = (height + chunk_lines - 1) // chunk_lines
+
+    chunks = []
+    for chunk_index in range(chunk_count):
+        first_line = chunk_index * chunk_lines
+        data = b""
+        for y in range(first_line, min(first_line + chunk_lines, height)):
+            for name in names:
+                pixel_type, values = channels[name]
+                data += values[y].astype(pixel_dtypes[pixel_type]).tobytes()
+
+        compressed = compress(data, compression)
+
+        # Chunks that do not get smaller are stored as is
+        if len(compressed) >= len(data):
+            compressed = data
+
+        chunks.append(struct.pack("<ii", y_min + first_line,
+                                  len(compressed)) + compressed)
+
+    prefix = b"\x76\x2f\x31\x01" + \
+        struct.pack("<I", 2 | version_flags) + header
+
+    offsets = []
+    position = len(prefix) + 8 * chunk_count
+    for chunk in chunks:
+        offsets.append(position)
+        position += len(chunk)
+
+    with open(path, "wb") as exr_file:
+        exr_file.write(prefix)
+        exr_file.write(struct.pack("<{}Q".format(chunk_count), *offsets))
+        for chunk in chunks:
+            exr_file.write(chunk)
+
+
+# Smooth gradients with a flat area, so the compressions store runs as well as literals
+def sample_image(height, width):
+    y, x = np.mgrid[0:height, 0:width]
+    image = np.zeros((height, width, 4), np.float32)
+    image[:, :, 0] = x / width
+    image[:, :, 1] = y / height
+    image[:, :, 2] = np.where(x < width // 2, 0.25, (x * y) % 7 / 7)
+    image[:, :, 3] = (x + y) % 2
+    return image
+
+
+@pytest.mark.parametrize("compression", [NONE, RLE, ZIPS, ZIP])
+@pytest.mark.parametrize("pixel_type", [HALF, FLOAT])
+def test_read_exr(tmp_path, compression, pixel_type):
+    image = sample_image(37, 23)
+    path = str(tmp_path / "image.exr")
+    write_exr(path, {name: (pixel_type, image[:, :, index])
+                     for index, name in enumerate("RGBA")}, compression)
+
+    expected = image.astype(pixel_dtypes[pixel_type]).astype(np.float32)
+
+    result = read_exr(path)
+
+    assert result.dtype == np.float32
+    np.testing.assert_array_equal(result, expected)
+    assert is_supported_exr(path)
+
+
+def test_read_exr_with_offset_data_window(tmp_path):
+    image = sample_image(20, 4)
+    path = str(tmp_path / "image.exr")
+    write_exr(path, {name: (HALF, image[:, :, index])
+                     for index, name in enumerate("RGBA")}, ZIP, y_min=-5)
+
+    np.testing.assert_array_equal(read_exr(path), image.astype("<f2").astype(np.float32))
+
+
+def test_missing_alpha_is_opaque(tmp_path):
+    image = sample_image(5, 6)
+    path = str(tmp_path / "image.exr")
+    write_exr(path, {"R": (FLOAT, image[:, :, 0]), "G": (FLOAT, image[:, :, 1]),
+                     "B": (FLOAT, image[:, :, 2])}, ZIPS)
+
+    result = read_exr(path)
+
+    np.testing.assert_array_equal(result[:, :, :3], image[:, :, :3])
+    assert np.all(result[:, :, 3] == 1)
+
+
+def test_unsupported_compression(tmp_path):
+    path = str(tmp_path / "image.exr")
+    write_exr(path, {"R": (HALF, np.zeros((2, 2)))}, PIZ)
+
+    assert not is_supported_exr(path)
+    with pytest.raises(UnsupportedExrException):
+        read_exr(path)
+
+
+def test_tiled_files_are_unsupported(tmp_path):
+    path = str(tmp_path / "image.exr")
+    write_exr(path, {"R": (HALF, np.zeros((2, 2)))}, NONE, version_flags=0x200)
+
+    assert not is_supported_exr(path)
+    with pytest.raises(UnsupportedExrException):
+        read_exr(path)
@@ -0,0 +1,85 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+from types import SimpleNamespace
+
+from loco_graphics_helper.frame_scheduler import FrameScheduler, count_transitions
+
+
+def make_frame(frame_index, target_name, layer="Editor", animation_frame_index=0, view_angle=0):
+    target_object = None
+    if target_name != None:
+        target_object = SimpleNamespace(name=target_name)
+
+    return SimpleNamespace(frame_index=frame_index, target_object=target_object, layer=layer,
+                           animation_frame_index=animation_frame_index, view_angle=view_angle)
+
+
+# Frames in the order the vehicle task builder adds them: every view angle alternates between the animation frames
+# and the braking lights layer
+def vehicle_frames():
+    frames = []
+    for target_name in ["Body", "Bogie"]:
+        for view_angle in range(0, 360, 45):
+            for animation_frame_index in range(2):
+                frames.append(make_frame(len(frames), target_name,
+                                         animation_frame_index=animation_frame_index, view_angle=view_angle))
+            frames.append(make_frame(len(frames), target_name,
+                                     layer="Braking Lights", view_angle=view_angle))
+    return frames
+
+
+def test_count_transitions():
+    frames = [make_frame(0, "A"), make_frame(1, "A", layer="Braking Lights"),
+              make_frame(2, "B", animation_frame_index=1), make_frame(3, None)]
+
+    # Layer, then target, layer and animation frame, then target and animation frame
+    assert count_transitions(frames) == 1 + 3 + 2
+    assert count_transitions([]) == 0
+
+
+def test_schedule_groups_frames_by_scene_state():
+    frames = vehicle_frames()
+    scheduler = FrameScheduler()
+
+    scheduled = scheduler.schedule(frames)
+
+    assert sorted(frame.frame_index for frame in scheduled) == list(
+        range(len(frames)))
+
+    # Every combination of target, layer and animation frame is rendered in one go
+    states = [(frame.target_object.name, frame.layer, frame.animation_frame_index)
+              for frame in scheduled]
+    changes = [state for i, state in enumerate(states) if i == 0 or states[i - 1] != state]
+    assert len(changes) == len(set(states)) == 6
+
+    assert scheduler.transitions_before == count_transitions(frames)
+    assert scheduler.transitions_after == count_transitions(scheduled)
+    assert scheduler.transitions_saved > 0
+
+
+def test_schedule_keeps_the_view_angle_order_within_a_state():
+    frames = [make_frame(i, "A", view_angle=view_angle)
+              for i, view_angle in enumerate([90, 0, 90, 45])]
+
+    scheduled = FrameScheduler().schedule(frames)
+
+    assert [frame.frame_index for frame in scheduled] == [1, 3, 0, 2]
+
+
+def test_schedule_never_increases_transitions():
+    # Sorting by target name would split the frames of the lights layer, which are already grouped
+    frames = [make_frame(0, "B", layer="Braking Lights"), make_frame(1, "A", layer="Braking Lights"),
+              make_frame(2, "B"), make_frame(3, "A")]
+    scheduler = FrameScheduler()
+
+    scheduled = scheduler.schedule(frames)
+
+    assert scheduler.transitions_after <= scheduler.transitions_before
+    assert count_transitions(scheduled) == scheduler.transitions_after
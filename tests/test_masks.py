@@ -0,0 +1,77 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import numpy as np
+
+from loco_graphics_helper.imaging.masks import dilate_nearest
+
+
+def test_fills_the_target_from_the_nearest_known_pixel():
+    values = np.zeros((1, 7, 1))
+    values[0, 0] = 1
+    values[0, 6] = 2
+
+    known = np.zeros((1, 7), bool)
+    known[0, [0, 6]] = True
+    target = np.ones((1, 7), bool)
+
+    dilated, filled = dilate_nearest(values, known, target)
+
+    np.testing.assert_array_equal(dilated[0, :, 0], [1, 1, 1, 1, 2, 2, 2])
+    assert np.all(filled)
+
+
+def test_direct_neighbours_take_precedence():
+    values = np.zeros((3, 3, 1))
+    known = np.zeros((3, 3), bool)
+
+    # The center pixel has a diagonal and a direct known neighbour
+    values[0, 0] = 1
+    values[0, 1] = 2
+    known[0, 0] = known[0, 1] = True
+
+    target = np.zeros((3, 3), bool)
+    target[1, 1] = True
+
+    dilated, filled = dilate_nearest(values, known, target)
+
+    assert dilated[1, 1, 0] == 2
+    assert filled[1, 1]
+
+
+def test_only_target_pixels_are_filled():
+    values = np.zeros((5, 5, 3))
+    values[2, 2] = [0.1, 0.2, 0.3]
+    known = np.zeros((5, 5), bool)
+    known[2, 2] = True
+
+    target = np.zeros((5, 5), bool)
+    target[1:4, 1:4] = True
+
+    dilated, filled = dilate_nearest(values, known, target)
+
+    np.testing.assert_array_equal(filled, target)
+    np.testing.assert_array_equal(dilated[target], np.tile([0.1, 0.2, 0.3], (9, 1)))
+    assert np.all(dilated[~target] == 0)
+
+    # The inputs are not modified
+    assert np.count_nonzero(known) == 1
+
+
+def test_stops_after_max_iterations():
+    values = np.zeros((1, 6, 1))
+    values[0, 0] = 1
+    known = np.zeros((1, 6), bool)
+    known[0, 0] = True
+    target = np.ones((1, 6), bool)
+
+    dilated, filled = dilate_nearest(values, known, target, max_iterations=2)
+
+    np.testing.assert_array_equal(filled[0], [True, True, True, False, False, False])
+    np.testing.assert_array_equal(dilated[0, :, 0], [1, 1, 1, 0, 0, 0])
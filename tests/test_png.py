@@ -0,0 +1,182 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import struct
+import zlib
+
+import numpy as np
+import pytest
+
+from loco_graphics_helper.imaging.png import read_png, write_png, write_png8, to_8_bit
+
+
+# Reference implementation of the PNG scanline filters, see https://www.w3.org/TR/png/#9Filters
+def filter_scanline(line, previous, filter_type, unit):
+    line = line.astype(np.int64)
+    previous = previous.astype(np.int64)
+
+    filtered = np.zeros(len(line), np.int64)
+    for x in range(len(line)):
+        a = line[x - unit] if x >= unit else 0
+        b = previous[x]
+        c = previous[x - unit] if x >= unit else 0
+
+        if filter_type == 0:
+            predictor = 0
+        elif filter_type == 1:
+            predictor = a
+        elif filter_type == 2:
+            predictor = b
+        elif filter_type == 3:
+            predictor = (a + b) // 2
+        else:
+            p = a + b - c
+            pa, pb, pc = abs(p - a), abs(p - b), abs(p - c)
+            if pa <= pb and pa <= pc:
+                predictor = a
+            elif pb <= pc:
+                predictor = b
+            else:
+                predictor = c
+
+        filtered[x] = (line[x] - predictor) & 0xff
+
+    return bytes([filter_type]) + filtered.astype(np.uint8).tobytes()
+
+
+def write_chunk(data, chunk_type, chunk):
+    data += struct.pack(">I", len(chunk)) + chunk_type + chunk
+    data += struct.pack(">I", zlib.crc32(chunk_type + chunk) & 0xffffffff)
+    return data
+
+
+# Writes a PNG of the samples (height, width, channels), with the filter type of every row taken from filter_types
+def write_filtered_png(path, samples, bit_depth, color_type, filter_types):
+    height, width, channels = samples.shape
+
+    if bit_depth == 16:
+        raw = samples.astype(">u2").view(np.uint8).reshape(height, -1)
+    else:
+        raw = samples.astype(np.uint8).reshape(height, -1)
+
+    unit = max(1, bit_depth * channels // 8)
+
+    scanlines = b""
+    previous = np.zeros(raw.shape[1], np.uint8)
+    for y in range(height):
+        scanlines += filter_scanline(raw[y], previous,
+                                     filter_types[y % len(filter_types)], unit)
+        previous = raw[y]
+
+    data = b"\x89PNG\r\n\x1a\n"
+    data = write_chunk(data, b"IHDR", struct.pack(
+        ">IIBBBBB", width, height, bit_depth, color_type, 0, 0, 0))
+    data = write_chunk(data, b"IDAT", zlib.compress(scanlines))
+    data = write_chunk(data, b"IEND", b"")
+
+    with open(path, "wb") as png_file:
+        png_file.write(data)
+
+
+def random_samples(shape, bit_depth, seed=0):
+    maximum = (1 << bit_depth) - 1
+    return np.random.RandomState(seed).randint(0, maximum + 1, shape)
+
+
+@pytest.mark.parametrize("filter_type", [0, 1, 2, 3, 4])
+@pytest.mark.parametrize("bit_depth", [8, 16])
+def test_read_rgba_with_every_filter(tmp_path, filter_type, bit_depth):
+    samples = random_samples((7, 5, 4), bit_depth)
+    path = str(tmp_path / "image.png")
+    write_filtered_png(path, samples, bit_depth, 6, [filter_type])
+
+    image = read_png(path)
+
+    assert image.dtype == (np.uint16 if bit_depth == 16 else np.uint8)
+    np.testing.assert_array_equal(image, samples)
+
+
+@pytest.mark.parametrize("bit_depth", [8, 16])
+def test_read_mixed_filters(tmp_path, bit_depth):
+    samples = random_samples((10, 9, 4), bit_depth, seed=1)
+    path = str(tmp_path / "image.png")
+    write_filtered_png(path, samples, bit_depth, 6, [4, 3, 0, 1, 2])
+
+    np.testing.assert_array_equal(read_png(path), samples)
+
+
+@pytest.mark.parametrize("filter_type", [0, 1, 2, 3, 4])
+def test_read_rgb_and_grayscale(tmp_path, filter_type):
+    rgb = random_samples((4, 6, 3), 8, seed=2)
+    path = str(tmp_path / "rgb.png")
+    write_filtered_png(path, rgb, 8, 2, [filter_type])
+
+    image = read_png(path)
+    np.testing.assert_array_equal(image[:, :, :3], rgb)
+    assert np.all(image[:, :, 3] == 255)
+
+    gray = random_samples((4, 6, 1), 8, seed=3)
+    path = str(tmp_path / "gray.png")
+    write_filtered_png(path, gray, 8, 0, [filter_type])
+
+    image = read_png(path)
+    for channel in range(3):
+        np.testing.assert_array_equal(image[:, :, channel], gray[:, :, 0])
+    assert np.all(image[:, :, 3] == 255)
+
+
+def test_write_png_round_trip(tmp_path):
+    image = random_samples((6, 11, 4), 8, seed=4).astype(np.uint8)
+    path = str(tmp_path / "image.png")
+    write_png(path, image)
+
+    np.testing.assert_array_equal(read_png(path), image)
+
+
+def test_write_png8_round_trip(tmp_path):
+    colors = np.array([[0, 0, 0, 0], [255, 0, 0, 255], [
+                      0, 128, 255, 255], [10, 20, 30, 128]], np.uint8)
+    indices = np.random.RandomState(5).randint(0, len(colors), (8, 9))
+    image = colors[indices]
+
+    path = str(tmp_path / "image.png")
+    write_png8(path, image)
+
+    with open(path, "rb") as png_file:
+        header = png_file.read(33)
+    assert header[25] == 3  # Indexed color type
+
+    np.testing.assert_array_equal(read_png(path), image)
+
+
+def test_write_png8_falls_back_to_true_color(tmp_path):
+    image = np.zeros((1, 300, 4), np.uint8)
+    image[0, :, 0] = np.arange(300) % 256
+    image[0, :, 1] = np.arange(300) // 256
+    image[:, :, 3] = 255
+
+    path = str(tmp_path / "image.png")
+    write_png8(path, image)
+
+    with open(path, "rb") as png_file:
+        header = png_file.read(33)
+    assert header[25] == 6  # RGBA color type
+
+    np.testing.assert_array_equal(read_png(path), image)
+
+
+def test_to_8_bit_rounds():
+    image = np.array([0, 128, 129, 257 * 128, 65535], np.uint16)
+    expected = (image.astype(np.uint32) * 255 + 32767) // 65535
+
+    np.testing.assert_array_equal(to_8_bit(image), expected)
+    np.testing.assert_array_equal(to_8_bit(np.array([65535, 0], np.uint16)), [255, 0])
+
+    image_8_bit = np.array([1, 2, 3], np.uint8)
+    assert to_8_bit(image_8_bit) is image_8_bit
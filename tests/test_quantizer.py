@@ -0,0 +1,262 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import shutil
+import subprocess
+
+import numpy as np
+import pytest
+
+from loco_graphics_helper.magick_command import MagickCommand
+from loco_graphics_helper.imaging.png import read_png, write_png, to_8_bit
+from loco_graphics_helper.imaging.quantizer import Quantizer, count_differing_pixels
+from loco_graphics_helper.imaging.palette_lookup import build_lookup_table, PaletteLookupTable
+
+
+def make_palette(count, seed=0):
+    colors = np.random.RandomState(seed).randint(0, 256, (count, 4))
+    colors[:, 3] = 255
+    colors[0] = [0, 0, 0, 0]
+    return colors.astype(np.uint8)
+
+
+# Smooth shading with some noise, like a rendered sprite
+def make_render(height, width, seed=0):
+    y, x = np.mgrid[0:height, 0:width]
+    shading = np.stack([x * 200 / width + 30, y * 180 / height + 40, (x + y) * 90 / (width + height) + 60], axis=2)
+
+    image = np.empty((height, width, 4), np.uint8)
+    image[:, :, :3] = np.clip(shading + np.random.RandomState(seed).normal(0, 6, shading.shape), 0, 255)
+    image[:, :, 3] = 255
+    return image
+
+
+# Straightforward serpentine Floyd-Steinberg that pushes the error of every pixel to its neighbours, in the scan
+# direction of the row of that pixel, with the same 6 bit nearest color cache as ImageMagick or a lookup table
+def reference_dither(pixels, region, colors, diffusion, lookup_table=None):
+    height, width = region.shape
+    work = pixels.astype(np.float64).copy()
+    indices = np.zeros((height, width), np.intp)
+    cache = {}
+
+    for y in range(height):
+        direction = 1 if y % 2 == 0 else -1
+        columns = range(width) if direction == 1 else range(width - 1, -1, -1)
+
+        for x in columns:
+            if not region[y, x]:
+                continue
+
+            value = np.clip(work[y, x], 0, 255)
+
+            cell = tuple(int(channel + 0.5) >> 2 for channel in value)
+            if lookup_table != None:
+                cache[cell] = int(lookup_table.indices[cell])
+            elif not cell in cache:
+                cache[cell] = int(np.argmin(((colors - value) ** 2).sum(axis=1)))
+            indices[y, x] = cache[cell]
+
+            error = (value - colors[indices[y, x]]) * diffusion
+            for dx, dy, weight in [(direction, 0, 7), (-direction, 1, 3), (0, 1, 5), (direction, 1, 1)]:
+                if 0 <= x + dx < width and y + dy < height and region[y + dy, x + dx]:
+                    work[y + dy, x + dx] += error * weight / 16
+
+    return indices
+
+
+@pytest.mark.parametrize("diffusion", [100, 75])
+def test_dither_matches_serpentine_reference(diffusion):
+    palette = make_palette(24)
+    quantizer = Quantizer(palette, diffusion)
+
+    random = np.random.RandomState(1)
+    pixels = random.randint(0, 256, (19, 23, 3)).astype(np.float64)
+    region = random.rand(19, 23) > 0.15
+
+    expected = reference_dither(
+        pixels, region, quantizer.opaque_colors_float, diffusion / 100)
+
+    indices = quantizer.dither(pixels, region)
+
+    np.testing.assert_array_equal(indices[region], expected[region])
+
+
+def test_odd_rows_are_scanned_right_to_left():
+    # Two colors and a mid gray, the error of the first pixel of a row decides the pattern
+    palette = np.array([[0, 0, 0, 0], [0, 0, 0, 255], [255, 255, 255, 255]], np.uint8)
+    quantizer = Quantizer(palette, 100)
+
+    pixels = np.full((2, 5, 3), 127.0)
+    region = np.ones((2, 5), bool)
+
+    indices = quantizer.dither(pixels, region)
+    expected = reference_dither(
+        pixels, region, quantizer.opaque_colors_float, 1)
+
+    np.testing.assert_array_equal(indices, expected)
+    # The first pixel of the second row is its rightmost pixel
+    assert indices[1, 4] != indices[1, 3]
+
+
+def test_no_diffusion_picks_the_nearest_color():
+    palette = make_palette(16, seed=2)
+    quantizer = Quantizer(palette, 0)
+
+    pixels = np.random.RandomState(3).randint(0, 256, (8, 8, 3)).astype(np.float64)
+    region = np.random.RandomState(4).rand(8, 8) > 0.2
+    indices = quantizer.dither(pixels, region)
+
+    colors = quantizer.opaque_colors_float
+    distances = ((pixels[:, :, np.newaxis, :] - colors) ** 2).sum(axis=3)
+
+    np.testing.assert_array_equal(indices[region], np.argmin(distances, axis=2)[region])
+
+
+def test_no_diffusion_gathers_from_the_lookup_table():
+    palette = make_palette(16, seed=2)
+    opaque = palette[palette[:, 3] == 255][:, :3]
+    lookup_table = PaletteLookupTable(build_lookup_table(opaque, 6), 6)
+    quantizer = Quantizer(palette, 0, lookup_table)
+
+    pixels = np.random.RandomState(3).rand(8, 8, 3) * 255
+    indices = quantizer.dither(pixels, np.ones((8, 8), bool))
+
+    np.testing.assert_array_equal(indices, lookup_table.find_nearest(
+        pixels.reshape(-1, 3)).reshape(8, 8))
+
+
+def test_quantize_thresholds_alpha():
+    palette = make_palette(8, seed=4)
+    quantizer = Quantizer(palette, 100)
+
+    image = np.full((3, 4, 4), 200, np.uint8)
+    image[0, :, 3] = 0
+    image[1, :, 3] = 127
+    image[2, :, 3] = 128
+
+    result = quantizer.quantize(image)
+
+    # Below half coverage pixels become the transparent palette entry, the others are dithered as opaque
+    assert np.all(result[:2] == palette[0])
+    assert np.all(result[2, :, 3] == 255)
+    assert all(tuple(color) in set(map(tuple, palette)) for color in result[2])
+
+
+def test_quantize_region_only_dithers_the_region():
+    palette = make_palette(12, seed=5)
+    quantizer = Quantizer(palette, 100)
+
+    image = np.random.RandomState(6).randint(0, 256, (10, 10, 4)).astype(np.uint8)
+    image[:, :, 3] = 255
+
+    region = np.zeros((10, 10), bool)
+    region[3:7, 2:8] = True
+    region[4, 4] = False
+
+    result = quantizer.quantize_region(image, region)
+
+    # The region is dithered on its own, as if it was the whole image
+    window = image[3:7, 2:8]
+    window_region = region[3:7, 2:8]
+    expected = reference_dither(window[:, :, :3], window_region,
+                                quantizer.opaque_colors_float, 1)
+
+    assert result.shape == (np.count_nonzero(region), 4)
+    np.testing.assert_array_equal(
+        result, quantizer.opaque_colors[expected[window_region]])
+
+
+@pytest.mark.parametrize("diffusion", [100, 75])
+def test_dither_with_lookup_table_matches_reference(diffusion):
+    palette = make_palette(24)
+    opaque = palette[palette[:, 3] == 255][:, :3]
+    lookup_table = PaletteLookupTable(build_lookup_table(opaque, 6), 6)
+    quantizer = Quantizer(palette, diffusion, lookup_table)
+
+    random = np.random.RandomState(1)
+    pixels = random.randint(0, 256, (19, 23, 3)).astype(np.float64)
+    region = random.rand(19, 23) > 0.15
+
+    expected = reference_dither(pixels, region, quantizer.opaque_colors_float,
+                                diffusion / 100, lookup_table)
+
+    indices = quantizer.dither(pixels, region)
+
+    np.testing.assert_array_equal(indices[region], expected[region])
+
+
+def test_lookup_table_cells_round_like_the_dither_cache():
+    lookup_table = PaletteLookupTable(np.zeros((64, 64, 64), np.uint8), 6)
+
+    values = np.array([[0.0, 3.49, 3.5], [254.6, 255.0, 300.0], [-5.0, 7.4, 7.5]])
+
+    np.testing.assert_array_equal(lookup_table.get_cells(values), [
+        [0, 0, 1], [63, 63, 63], [0, 1, 2]])
+
+
+def test_lookup_table_cells_hold_the_color_nearest_to_their_center():
+    colors = np.array([[0, 0, 0], [4, 3, 3]], np.uint8)
+    indices = build_lookup_table(colors, 6)
+
+    # The first cell holds the values that round to 0 to 3, so its center is 1.5 and black is closer than (4, 3, 3).
+    # From the middle of the unrounded values, 2, it would be the other way around
+    assert indices[0, 0, 0] == 0
+    assert indices[1, 1, 1] == 1
+
+
+def test_lookup_table_is_used_for_nearest_colors():
+    palette = make_palette(20, seed=7)
+    opaque = palette[palette[:, 3] == 255][:, :3]
+    lookup_table = PaletteLookupTable(build_lookup_table(opaque, 6), 6)
+
+    quantizer = Quantizer(palette, 100, lookup_table)
+
+    values = np.random.RandomState(8).randint(0, 256, (50, 3)).astype(np.float64)
+    np.testing.assert_array_equal(
+        quantizer.find_nearest(values), lookup_table.find_nearest(values))
+
+
+def test_count_differing_pixels_ignores_transparent_colors():
+    a = np.zeros((2, 3, 4), np.uint8)
+    b = a.copy()
+    b[0, 0, :3] = 99
+
+    assert count_differing_pixels(a, b) == 0
+
+    b[1, 2] = [1, 2, 3, 255]
+    assert count_differing_pixels(a, b) == 1
+
+    assert count_differing_pixels(a, np.zeros((3, 3, 4), np.uint8)) == 6
+
+
+# Compares the result with the ImageMagick command that the quantizer replaces. ImageMagick only searches the part of
+# its color cube around a pixel for the nearest color, so a small share of the pixels is allowed to differ
+@pytest.mark.skipif(shutil.which("magick") == None, reason="ImageMagick is not installed")
+@pytest.mark.parametrize("diffusion", [100, 75])
+def test_matches_imagemagick_remap(tmp_path, diffusion):
+    palette = make_palette(48, seed=9)
+    palette_path = str(tmp_path / "palette.png")
+    write_png(palette_path, palette[np.newaxis])
+
+    image = make_render(64, 96, seed=10)
+    image_path = str(tmp_path / "render.png")
+    write_png(image_path, image)
+
+    output_path = str(tmp_path / "remapped.png")
+    command = MagickCommand(image_path)
+    command.quantize(palette_path, diffusion)
+    subprocess.check_call(command.get_command_string(
+        "magick", "PNG32:" + output_path), shell=True)
+
+    reference = to_8_bit(read_png(output_path))
+    result = Quantizer(palette, diffusion).quantize(image)
+
+    differing_pixels = count_differing_pixels(result, reference)
+    print("{} of {} pixels differ from ImageMagick".format(differing_pixels, image.shape[0] * image.shape[1]))
+    assert differing_pixels <= 0.01 * image.shape[0] * image.shape[1]
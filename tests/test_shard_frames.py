@@ -0,0 +1,39 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import pytest
+
+from loco_graphics_helper.shard_frames import split_frames
+
+
+@pytest.mark.parametrize("mode", ["CONTIGUOUS", "INTERLEAVED"])
+@pytest.mark.parametrize("frame_count, shards", [(10, 3), (9, 3), (2, 5), (1, 1), (7, 1)])
+def test_split_frames_covers_every_frame_once(mode, frame_count, shards):
+    split = split_frames(frame_count, shards, mode)
+
+    assert len(split) == min(shards, frame_count)
+    assert sorted(index for indices in split for index in indices) == list(
+        range(frame_count))
+
+    # Shards differ by at most one frame
+    sizes = [len(indices) for indices in split]
+    assert max(sizes) - min(sizes) <= 1
+
+
+def test_split_frames_contiguous():
+    assert split_frames(10, 3) == [[0, 1, 2, 3], [4, 5, 6], [7, 8, 9]]
+
+
+def test_split_frames_interleaved():
+    assert split_frames(10, 3, "INTERLEAVED") == [
+        [0, 3, 6, 9], [1, 4, 7], [2, 5, 8]]
+
+
+def test_split_without_frames():
+    assert split_frames(0, 4) == [[]]
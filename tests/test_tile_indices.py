@@ -0,0 +1,62 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import numpy as np
+
+from loco_graphics_helper.imaging.tile_indices import CameraProjection, get_axis_tile_index, get_tile_index_image
+
+
+# A camera at the origin looking straight down, so pixel x and y are world x and y
+def top_down_projection(ortho_scale, clip_end=100):
+    return CameraProjection(np.identity(4), ortho_scale, 0, 0, clip_end)
+
+
+def test_world_positions_of_a_top_down_camera():
+    depth = np.full((2, 4), 5.0)
+
+    positions, hits = top_down_projection(16).get_world_positions(depth)
+
+    # Pixel centers of a 16 unit wide view, the image is half as high
+    np.testing.assert_allclose(positions[0, :, 0], [-6, -2, 2, 6])
+    np.testing.assert_allclose(positions[:, 0, 1], [2, -2])
+    np.testing.assert_allclose(positions[:, :, 2], -5)
+    assert np.all(hits)
+
+
+def test_axis_tile_index_splits_the_object_into_equal_tiles():
+    # Mapped positions run from 8 - size / 2 to 8 + size / 2 over the object
+    np.testing.assert_array_equal(get_axis_tile_index(
+        np.array([6.6, 7.4, 7.6, 8.4, 8.6, 9.4]), 3), [0, 0, 1, 1, 2, 2])
+
+    # Positions outside of the object are clamped to the outer tiles
+    np.testing.assert_array_equal(get_axis_tile_index(
+        np.array([0.0, 16.0]), 2), [0, 1])
+
+
+def test_tile_index_image_of_a_two_by_two_object():
+    depth = np.full((4, 4), 10.0)
+
+    # A pixel that does not hit anything and a pixel outside of the silhouette
+    depth[3, 0] = 100
+    mask = np.ones((4, 4), bool)
+    mask[0, 3] = False
+
+    image = get_tile_index_image(depth, top_down_projection(16), 2, 2, mask)
+
+    # The x tile follows world y (rows, top is positive), the y tile follows world x (columns)
+    expected = np.array([[1, 1, 3, 3],
+                         [1, 1, 3, 3],
+                         [0, 0, 2, 2],
+                         [0, 0, 2, 2]])
+    visible = np.ones((4, 4), bool)
+    visible[3, 0] = visible[0, 3] = False
+
+    np.testing.assert_allclose(image[:, :, 1], np.where(visible, expected / 255, 0))
+    np.testing.assert_array_equal(image[:, :, 3], visible)
+    assert np.all(image[:, :, 0] == 0) and np.all(image[:, :, 2] == 0)
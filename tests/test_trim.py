@@ -0,0 +1,106 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import numpy as np
+
+from loco_graphics_helper.imaging.trim import get_alpha_bounds, trim, split_by_id
+
+
+def make_image(height, width, visible):
+    image = np.zeros((height, width, 4), np.uint8)
+    rows, columns = np.nonzero(visible)
+    image[rows, columns] = [10, 20, 30, 255]
+    image[rows, columns, 0] += (rows * width + columns).astype(np.uint8)
+    return image
+
+
+def test_trim_crops_to_visible_pixels():
+    visible = np.zeros((6, 8), bool)
+    visible[1:4, 2:5] = True
+    visible[2, 3] = False
+    image = make_image(6, 8, visible)
+
+    assert get_alpha_bounds(image) == (2, 1, 5, 4)
+
+    cropped, offset_x, offset_y = trim(image)
+
+    np.testing.assert_array_equal(cropped, image[1:4, 2:5])
+    # Same as ImageMagick's page.x - page.width / 2 and page.y - page.height / 2
+    assert (offset_x, offset_y) == (2 - 8 / 2, 1 - 6 / 2)
+
+
+def test_trim_odd_sizes():
+    visible = np.zeros((5, 7), bool)
+    visible[4, 6] = True
+    image = make_image(5, 7, visible)
+
+    cropped, offset_x, offset_y = trim(image)
+
+    assert cropped.shape == (1, 1, 4)
+    assert (offset_x, offset_y) == (6 - 3.5, 4 - 2.5)
+
+
+def test_trim_empty_image():
+    image = np.zeros((6, 8, 4), np.uint8)
+    image[:, :, :3] = 50
+
+    assert get_alpha_bounds(image) == None
+
+    cropped, offset_x, offset_y = trim(image)
+
+    # ImageMagick keeps a single transparent pixel just outside of the 1 pixel border it adds
+    np.testing.assert_array_equal(cropped, np.zeros((1, 1, 4)))
+    assert (offset_x, offset_y) == (-1 - 10 / 2, -1 - 8 / 2)
+
+
+def test_split_by_id_matches_trimming_each_id():
+    height, width = 12, 10
+    ids = np.zeros((height, width), np.uint8)
+    ids[0:7, 0:6] = 1
+    ids[4:12, 3:10] = 2
+    ids[9:12, 0:2] = 3
+
+    visible = np.ones((height, width), bool)
+    visible[5, :] = False
+    image = make_image(height, width, visible)
+
+    sprites = split_by_id(image, ids, [1, 2, 3, 4])
+
+    for id_value, (cropped, offset_x, offset_y) in zip([1, 2, 3, 4], sprites):
+        # Reference: mask everything but the id and trim the result
+        masked = image.copy()
+        masked[ids != id_value] = 0
+        expected, expected_x, expected_y = trim(masked)
+
+        np.testing.assert_array_equal(cropped, expected)
+        assert (offset_x, offset_y) == (expected_x, expected_y)
+
+
+def test_split_by_id_page_offsets():
+    ids = np.zeros((4, 6), np.uint8)
+    ids[:, 3:] = 7
+    image = make_image(4, 6, np.ones((4, 6), bool))
+
+    (left, left_x, left_y), (right, right_x, right_y) = split_by_id(
+        image, ids, [0, 7])
+
+    np.testing.assert_array_equal(left, image[:, :3])
+    np.testing.assert_array_equal(right, image[:, 3:])
+    assert (left_x, left_y) == (0 - 3, 0 - 2)
+    assert (right_x, right_y) == (3 - 3, 0 - 2)
+
+
+def test_split_by_id_without_pixels():
+    ids = np.zeros((4, 6), np.uint8)
+    image = np.zeros((4, 6, 4), np.uint8)
+
+    cropped, offset_x, offset_y = split_by_id(image, ids, [5])[0]
+
+    np.testing.assert_array_equal(cropped, np.zeros((1, 1, 4)))
+    assert (offset_x, offset_y) == (-1 - 8 / 2, -1 - 6 / 2)
@@ -0,0 +1,88 @@
+'''
+Copyright (c) 2024 Loco Graphics Helper developers
+
+For a complete list of all authors, please refer to the addon's meta info.
+Interested in contributing? Visit https://github.com/OpenLoco/Blender-Loco-Graphics
+
+Loco Graphics Helper is licensed under the GNU General Public License version 3.
+'''
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from loco_graphics_helper.imaging.png import write_png
+from loco_graphics_helper.imaging.quantizer import quantize_render
+from loco_graphics_helper.processors.sub_processes.worker_processes import WorkerProcesses
+
+from test_quantizer import make_palette, make_render
+
+
+@pytest.fixture
+def worker_processes():
+    workers = WorkerProcesses(sys.executable, 2)
+    yield workers
+    workers.close()
+
+
+# A render with a recolorable in the middle and the meta image that marks it
+@pytest.fixture
+def render_arguments(tmp_path):
+    render_path = os.path.join(str(tmp_path), "render.png")
+    write_png(render_path, make_render(48, 64))
+
+    meta = np.zeros((48, 64, 4), np.uint8)
+    meta[:, :, 3] = 255
+    meta[12:36, 16:48, 0] = 1
+
+    return (render_path, meta, make_palette(32), [make_palette(4, 1)], 5, False, True)
+
+
+def test_quantize_render_matches_in_process(worker_processes, render_arguments):
+    quantized = worker_processes.run("quantize_render", *render_arguments)
+
+    assert np.array_equal(quantized, quantize_render(*render_arguments))
+
+
+def test_jobs_run_on_every_worker(worker_processes, render_arguments):
+    expected = quantize_render(*render_arguments)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = list(executor.map(lambda _: worker_processes.run(
+            "quantize_render", *render_arguments), range(8)))
+
+    for quantized in results:
+        assert np.array_equal(quantized, expected)
+
+
+def test_job_errors_are_raised(worker_processes, render_arguments):
+    with pytest.raises(Exception, match="FileNotFoundError"):
+        worker_processes.run("quantize_render", "missing.png",
+                             *render_arguments[1:])
+
+    # The worker keeps running after a failed job
+    assert worker_processes.run(
+        "quantize_render", *render_arguments).shape == (48, 64, 4)
+
+
+def test_stopped_worker_fails_the_remaining_jobs(render_arguments):
+    workers = WorkerProcesses(sys.executable, 1)
+    try:
+        workers.processes[0].kill()
+        workers.processes[0].wait()
+
+        with pytest.raises(Exception, match="stopped unexpectedly"):
+            workers.run("quantize_render", *render_arguments)
+
+        with pytest.raises(Exception, match="stopped unexpectedly"):
+            workers.run("quantize_render", *render_arguments)
+    finally:
+        workers.close()
+
+
+def test_missing_interpreter_is_reported():
+    with pytest.raises(Exception):
+        WorkerProcesses(os.path.join("missing", "python"), 1)